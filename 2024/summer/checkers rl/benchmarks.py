@@ -0,0 +1,580 @@
+import os
+import sys
+import json
+import time
+import resource
+import argparse
+import subprocess
+from lazy import lazy_import
+
+# numpy is loaded on first use, so that the imports benchmark starts from a bare interpreter
+np = lazy_import("numpy")
+
+# Every benchmark runs its measurements in a fresh interpreter (see worker()),
+# so that start-up time and memory of one configuration never leak into another.
+
+def run_worker(name, *args, env=None):
+    """Run `benchmarks.py worker <name> <args>` in a new process and return the JSON it prints."""
+    command = [sys.executable, os.path.abspath(__file__), "worker", name] + [str(arg) for arg in args]
+    output = subprocess.run(command, capture_output=True, text=True, check=True, env=env,
+                            cwd=os.path.dirname(os.path.abspath(__file__))).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+def max_rss_mb():
+    """Peak resident set size of this process, in MB."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+# headless: construction/reset cost of EnvCheckers with and without a window
+def headless_worker(mode, num_envs, num_resets):
+    import io
+    import contextlib
+    from gym_checkers import EnvCheckers
+
+    headless = mode == "headless"
+    rss_before = max_rss_mb()
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        envs = [EnvCheckers(headless=headless) for _ in range(num_envs)]
+        construct = (time.perf_counter() - start) / num_envs
+
+        start = time.perf_counter()
+        for i in range(num_resets):
+            envs[i % num_envs].reset()
+        reset = (time.perf_counter() - start) / num_resets
+
+    return {"construct_ms": construct * 1e3, "reset_ms": reset * 1e3, "rss_mb": max_rss_mb() - rss_before}
+
+def bench_headless(args):
+    env = dict(os.environ)
+    env.setdefault("SDL_VIDEODRIVER", "dummy")  # lets the windowed mode run on a headless box
+    print(f"{'mode':>10} {'construct ms':>13} {'reset ms':>9} {'RSS MB':>7}   ({args.envs} envs, {args.resets} resets)")
+    for mode in ("window", "headless"):
+        result = run_worker("headless", mode, args.envs, args.resets, env=env)
+        print(f"{mode:>10} {result['construct_ms']:13.3f} {result['reset_ms']:9.3f} {result['rss_mb']:7.1f}")
+
+# movegen: the np.vstack move generator of functions.py against the preallocated buffers
+# (the vstack version is the one heuristics.py used before generate_next_into, kept as the baseline)
+def vstack_generate_branches(board, x, y):
+    bb = heuristics.compress(board)
+    if (board[x, y] >= 1 and x < 6):
+        temp_1 = board[x, y]
+        if (y < 6):
+            if (board[x+1, y+1] < 0 and board[x+2, y+2] == 0):
+                board[x+2, y+2] = board[x, y]
+                if (x+2 == 7):
+                    board[x+2, y+2] = 3
+                board[x, y] = 0
+                temp = board[x+1, y+1]
+                board[x+1, y+1] = 0
+                bb = np.vstack((bb, vstack_generate_branches(board, x+2, y+2)))
+                board[x+1, y+1] = temp
+                board[x, y] = temp_1
+                board[x+2, y+2] = 0
+        if (y > 1):
+            if (board[x+1, y-1] < 0 and board[x+2, y-2] == 0):
+                board[x+2, y-2] = board[x, y]
+                if (x+2 == 7):
+                    board[x+2, y-2] = 3
+                board[x, y] = 0
+                temp = board[x+1, y-1]
+                board[x+1, y-1] = 0
+                bb = np.vstack((bb, vstack_generate_branches(board, x+2, y-2)))
+                board[x+1, y-1] = temp
+                board[x, y] = temp_1
+                board[x+2, y-2] = 0
+    if (board[x, y] == 3 and x > 0):
+        if (y < 6):
+            if (board[x-1, y+1] < 0 and board[x-2, y+2] == 0):
+                board[x-2, y+2] = board[x, y]
+                board[x, y] = 0
+                temp = board[x-1, y+1]
+                board[x-1, y+1] = 0
+                bb = np.vstack((bb, vstack_generate_branches(board, x-2, y+2)))
+                board[x-1, y+1] = temp
+                board[x, y] = board[x-2, y+2]
+                board[x-2, y+2] = 0
+        if (y > 1):
+            if (board[x-1, y-1] < 0 and board[x-2, y-2] == 0):
+                board[x-2, y-2] = board[x, y]
+                board[x, y] = 0
+                temp = board[x-1, y-1]
+                board[x-1, y-1] = 0
+                bb = np.vstack((bb, vstack_generate_branches(board, x-2, y-2)))
+                board[x-1, y-1] = temp
+                board[x, y] = board[x-2, y-2]
+                board[x-2, y-2] = 0
+    return bb
+
+def vstack_generate_next(board):
+    bb = np.array([heuristics.get_board()])
+    for i in range(0, 8):
+        for j in range(0, 8):
+            if (board[i, j] > 0):
+                bb = np.vstack((bb, vstack_generate_branches(board, i, j)[1:]))
+    if (len(bb) > 1):
+        return bb[1:]
+    for i in range(0, 8):
+        for j in range(0, 8):
+            if (board[i, j] >= 1 and i < 7):
+                temp = board[i, j]
+                if (j < 7):
+                    if (board[i+1, j+1] == 0):
+                        board[i+1, j+1] = board[i, j]
+                        if (i+1 == 7):
+                            board[i+1, j+1] = 3
+                        board[i, j] = 0
+                        bb = np.vstack((bb, heuristics.compress(board)))
+                        board[i, j] = temp
+                        board[i+1, j+1] = 0
+                if (j > 0):
+                    if (board[i+1, j-1] == 0):
+                        board[i+1, j-1] = board[i, j]
+                        if (i+1 == 7):
+                            board[i+1, j-1] = 3
+                        board[i, j] = 0
+                        bb = np.vstack((bb, heuristics.compress(board)))
+                        board[i, j] = temp
+                        board[i+1, j-1] = 0
+            if (board[i, j] == 3 and i > 0):
+                if (j < 7):
+                    if (board[i-1, j+1] == 0):
+                        board[i-1, j+1] = board[i, j]
+                        board[i, j] = 0
+                        bb = np.vstack((bb, heuristics.compress(board)))
+                        board[i, j] = board[i-1, j+1]
+                        board[i-1, j+1] = 0
+                elif (j > 0):
+                    if (board[i-1, j-1] == 0):
+                        board[i-1, j-1] = board[i, j]
+                        board[i, j] = 0
+                        bb = np.vstack((bb, heuristics.compress(board)))
+                        board[i, j] = board[i-1, j-1]
+                        board[i-1, j-1] = 0
+    return bb[1:]
+
+def sample_positions(count, seed=0):
+    """Positions reached by random play from the initial board, seen by the player to move."""
+    import heuristics
+
+    rng = np.random.default_rng(seed)
+    boards = np.zeros((count, 32), dtype=np.int8)
+    board = heuristics.np_board()
+    for i in range(count):
+        children = heuristics.generate_next(heuristics.expand(board))
+        if len(children) == 0:
+            board = heuristics.np_board()
+            children = heuristics.generate_next(heuristics.expand(board))
+        boards[i] = board
+        board = -children[rng.integers(len(children))][::-1]
+    return boards
+
+def movegen_worker(method, count):
+    global heuristics
+    import tracemalloc
+    import heuristics
+
+    boards = sample_positions(count)
+    expanded = [heuristics.expand(board) for board in boards]
+    out = np.zeros((count * heuristics.MAX_MOVES, 32), dtype=np.int8)
+    parents = np.zeros(len(out), dtype=np.int64)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    if method == "vstack":
+        total = sum(len(vstack_generate_next(board)) for board in expanded)
+    elif method == "generate_next":
+        total = sum(len(heuristics.generate_next(board)) for board in expanded)
+    elif method == "into":
+        total = sum(heuristics.generate_next_into(board, out) for board in expanded)
+    else:
+        total = heuristics.generate_next_batch(boards, out, parents)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    # every method must produce the same successors
+    reference = np.vstack([vstack_generate_next(board) for board in expanded])
+    assert total == len(reference), (method, total, len(reference))
+    if method == "batch":
+        assert np.array_equal(out[:total], reference)
+
+    return {"boards_per_sec": total / elapsed, "us_per_position": elapsed / count * 1e6, "peak_kb": peak / 1024}
+
+def bench_movegen(args):
+    print(f"{'method':>14} {'successors/s':>13} {'us/position':>12} {'peak KB':>9}   ({args.positions} positions)")
+    for method in ("vstack", "generate_next", "into", "batch"):
+        result = run_worker("movegen", method, args.positions)
+        print(f"{method:>14} {result['boards_per_sec']:13,.0f} {result['us_per_position']:12.1f} {result['peak_kb']:9.1f}")
+
+# metrics: get_metrics() one board at a time against get_metrics_batch()
+def metrics_worker(count, scalar_count):
+    import heuristics
+
+    positions = sample_positions(min(count, 10000))
+    boards = np.resize(positions, (count, 32))
+
+    start = time.perf_counter()
+    batch = heuristics.get_metrics_batch(boards)
+    batch_time = time.perf_counter() - start
+
+    scalar_count = min(count, scalar_count)
+    start = time.perf_counter()
+    scalar = np.array([heuristics.get_metrics(board) for board in boards[:scalar_count]])
+    scalar_time = (time.perf_counter() - start) / scalar_count * count
+    assert np.array_equal(scalar, batch[:scalar_count])
+
+    return {"batch_per_sec": count / batch_time, "scalar_per_sec": count / scalar_time, "speedup": scalar_time / batch_time}
+
+def bench_metrics(args):
+    print(f"{'N':>9} {'scalar boards/s':>16} {'batch boards/s':>15} {'speedup':>8}   (scalar timed on {args.scalar} boards)")
+    for count in args.sizes:
+        result = run_worker("metrics", count, args.scalar)
+        print(f"{count:9,d} {result['scalar_per_sec']:16,.0f} {result['batch_per_sec']:15,.0f} {result['speedup']:7.1f}x")
+
+# imports: start-up of an env worker process, from a bare interpreter to its first step.
+# "eager" also imports what functions.py used to load with get_metrics/draw_box1 (keras and pygame),
+# "lazy" is what importing gym_checkers costs now.
+def imports_worker(mode):
+    import io
+    import contextlib
+
+    start = time.perf_counter()
+    if mode == "eager":
+        from keras.models import Sequential, model_from_json
+        from keras.layers import Dense
+        from keras import regularizers
+        import pygame
+    from gym_checkers import EnvCheckers
+    imported = time.perf_counter() - start
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        env = EnvCheckers(headless=True)
+        env.step((1 * 8 + 5) * 64 + 0 * 8 + 4) # BLUE (1, 5) -> (0, 4)
+    ready = time.perf_counter() - start
+    # a module imported through lazy_import() stays a _LazyModule until it is first used
+    loaded = [name for name in ("keras", "pygame") if name in sys.modules and type(sys.modules[name]).__name__ != "_LazyModule"]
+    return {"import_s": imported, "first_step_s": ready, "rss_mb": max_rss_mb(), "loaded": loaded}
+
+def bench_imports(args):
+    env = dict(os.environ)
+    env.setdefault("SDL_VIDEODRIVER", "dummy")
+    print(f"{'mode':>6} {'import s':>9} {'first step s':>13} {'RSS MB':>7} {f'x{args.workers} GB':>8}   loaded")
+    for mode in ("eager", "lazy"):
+        results = [run_worker("imports", mode, env=env) for _ in range(args.repeats)]
+        best = min(results, key=lambda result: result["first_step_s"])
+        print(f"{mode:>6} {best['import_s']:9.3f} {best['first_step_s']:13.3f} {best['rss_mb']:7.1f} {best['rss_mb'] * args.workers / 1024:8.1f}   "
+              f"{', '.join(best['loaded']) or '-'}")
+
+# masking: transitions that move a piece, for a uniform policy over the whole action space
+# and for one that samples from env.action_masks()
+def masking_worker(policy, num_steps):
+    import io
+    import contextlib
+    from gym_checkers import EnvCheckers
+
+    rng = np.random.default_rng(0)
+    env = EnvCheckers(headless=True, compact=policy == "masked-compact")
+    useful = 0
+    with contextlib.redirect_stdout(io.StringIO()):
+        start = time.perf_counter()
+        for i in range(num_steps):
+            if policy == "random":
+                action = rng.integers(env.action_space.n)
+            else:
+                actions = np.flatnonzero(env.action_masks())
+                if len(actions) == 0:
+                    env.reset()
+                    continue
+                action = actions[rng.integers(len(actions))]
+            obs, reward, done, info = env.step(action)
+            useful += reward != -5
+            if done:
+                env.reset()
+        elapsed = time.perf_counter() - start
+    return {"steps_per_sec": num_steps / elapsed, "useful_fraction": useful / num_steps, "useful_per_sec": useful / elapsed}
+
+def bench_masking(args):
+    print(f"{'policy':>15} {'steps/s':>9} {'legal %':>8} {'useful/s':>9}   ({args.steps} steps)")
+    for policy in ("random", "masked", "masked-compact"):
+        result = run_worker("masking", policy, args.steps)
+        print(f"{policy:>15} {result['steps_per_sec']:9,.0f} {result['useful_fraction'] * 100:8.2f} {result['useful_per_sec']:9,.0f}")
+
+# tracking: per-step cost of EnvCheckers with its MoveTracker, which recomputes the legal moves around
+# each move, against recomputing every square after each move (a full board scan per step)
+def tracking_worker(mode, num_steps, bitboard):
+    import io
+    import cProfile
+    import pstats
+    import contextlib
+    from gym_checkers import EnvCheckers
+    from rules import MoveTracker
+
+    class RescanTracker(MoveTracker):
+        NEIGHBOURHOOD = [] # nothing is refreshed around the move, everything is refreshed after it
+
+        def move(self, start, end):
+            captured = MoveTracker.move(self, start, end)
+            for x in range(8):
+                for y in range(x % 2, 8, 2):
+                    self.refresh((x, y))
+            return captured
+
+    def play(env, rng):
+        for i in range(num_steps):
+            actions = np.flatnonzero(env.action_masks())
+            if len(actions) == 0 or env.step(actions[rng.integers(len(actions))])[2]:
+                env.reset()
+                if mode == "rescan":
+                    env.tracker = RescanTracker(env.game.board)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        env = EnvCheckers(headless=True, bitboard=bitboard == "bitboard")
+        if mode == "rescan":
+            env.tracker = RescanTracker(env.game.board)
+        start = time.perf_counter()
+        play(env, np.random.default_rng(0))
+        elapsed = time.perf_counter() - start
+
+        profiler = cProfile.Profile()
+        env.reset()
+        if mode == "rescan":
+            env.tracker = RescanTracker(env.game.board)
+        profiler.runcall(play, env, np.random.default_rng(0))
+    stats = pstats.Stats(profiler).stats
+    calls = sum(entry[1] for (path, line, name), entry in stats.items() if name == "legal_moves")
+    top = sorted(stats.items(), key=lambda item: -item[1][2])[:4]
+    return {"us_per_step": elapsed / num_steps * 1e6, "legal_moves_per_step": calls / num_steps,
+            "top": [f"{name} {entry[2] / num_steps * 1e6:.1f}us" for (path, line, name), entry in top]}
+
+def bench_tracking(args):
+    print(f"{'board':>9} {'mode':>12} {'us/step':>8} {'legal_moves/step':>17}   top functions by own time per step (profiled)")
+    for bitboard in ("board", "bitboard"):
+        for mode in ("rescan", "incremental"):
+            result = run_worker("tracking", mode, args.steps, bitboard)
+            print(f"{bitboard:>9} {mode:>12} {result['us_per_step']:8.1f} {result['legal_moves_per_step']:17.1f}   {', '.join(result['top'])}")
+
+# logging: masked-random play with the per-step prints and one save_logs() JSON file per episode,
+# without any output, and with an EpisodeRecorder. The prints go to the pipe read by run_worker().
+def logging_worker(mode, num_steps):
+    import glob
+    import tempfile
+    from gym_checkers import EnvCheckers
+    from recorder import EpisodeRecorder
+
+    rng = np.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as directory:
+        os.chdir(directory)
+        recorder = EpisodeRecorder(directory) if mode == "recorder" else None
+        env = EnvCheckers(headless=True, verbose=2 if mode == "print" else 0, recorder=recorder)
+        episodes = 0
+        start = time.perf_counter()
+        for i in range(num_steps):
+            actions = np.flatnonzero(env.action_masks())
+            done = len(actions) == 0 or env.step(actions[rng.integers(len(actions))])[2]
+            # every other step is a random, usually illegal, action like an unmasked agent would play
+            if not done:
+                done = env.step(rng.integers(env.action_space.n))[2]
+            if done:
+                if mode == "print":
+                    env.save_logs()
+                env.reset()
+                episodes += 1
+        if recorder is not None:
+            recorder.close()
+        elapsed = time.perf_counter() - start
+        size = sum(os.path.getsize(path) for path in glob.glob(os.path.join(directory, "**", "*.*"), recursive=True))
+    return {"steps_per_sec": 2 * num_steps / elapsed, "episodes": episodes, "bytes_per_step": size / (2 * num_steps)}
+
+def bench_logging(args):
+    print(f"{'mode':>9} {'steps/s':>9} {'bytes/step':>11}   ({2 * args.steps} steps)")
+    for mode in ("print", "silent", "recorder"):
+        result = run_worker("logging", mode, args.steps)
+        print(f"{mode:>9} {result['steps_per_sec']:9,.0f} {result['bytes_per_step']:11.1f}")
+
+# observations: _get_obs() cost per step, the board decoded from the 64 squares of the Game's board
+# after every step (what every step did before) against the incrementally updated board array,
+# for each observation format, copied or as read-only views
+def observations_worker(mode, obs_format, num_steps):
+    from gym_checkers import EnvCheckers
+
+    env = EnvCheckers(headless=True, verbose=0, obs_format=obs_format, copy_obs=mode == "copy")
+    if mode == "decode":
+        env._get_obs = env._decode_board
+    rng = np.random.default_rng(0)
+    obs_time = 0.0
+    start = time.perf_counter()
+    for i in range(num_steps):
+        legal = np.flatnonzero(env.action_masks())
+        # every other action is random, usually illegal, like an unmasked agent would play
+        action = legal[rng.integers(len(legal))] if i % 2 == 0 and len(legal) else rng.integers(env.action_space.n)
+        if env.step(action)[2]:
+            env.reset()
+        t = time.perf_counter()
+        env._get_obs()
+        obs_time += time.perf_counter() - t
+    elapsed = time.perf_counter() - start - obs_time # without the extra _get_obs() calls
+    return {"us_per_obs": obs_time / num_steps * 1e6, "steps_per_sec": num_steps / elapsed}
+
+def bench_observations(args):
+    print(f"{'format':>7} {'mode':>7} {'us/obs':>8} {'steps/s':>9}   ({args.steps} steps, half of them illegal actions)")
+    for obs_format, mode in [("board", "decode"), ("board", "copy"), ("board", "view"), ("packed", "copy"), ("packed", "view"), ("planes", "copy"), ("planes", "view")]:
+        result = run_worker("observations", mode, obs_format, args.steps)
+        print(f"{obs_format:>7} {mode:>7} {result['us_per_obs']:8.2f} {result['steps_per_sec']:9,.0f}")
+
+# bitboard: Board against BitBoard through the Board API (legal_moves, location, the moves of a whole
+# position), random play with a MoveTracker, and masked-random EnvCheckers steps
+def bitboard_worker(kind, num_positions, num_steps):
+    import io
+    import random
+    import contextlib
+    from rules import Board, BitBoard, MoveTracker, RED, BLUE
+    from gym_checkers import EnvCheckers
+
+    board_class = BitBoard if kind == "bitboard" else Board
+    squares = [(x, y) for x in range(8) for y in range(x % 2, 8, 2)]
+
+    # positions of random games, replayed on the board under test
+    rng = random.Random(0)
+    games, plies = [], 0
+    while plies < num_positions:
+        board, turn, moves = Board(), BLUE, []
+        tracker = MoveTracker(board)
+        while tracker.has_legal_moves(turn) and len(moves) < 150:
+            start, ends = rng.choice(list(tracker.turn_moves(turn).items()))
+            moves.append((start, rng.choice(ends)))
+            tracker.move(*moves[-1])
+            turn = RED if turn == BLUE else BLUE
+        games.append(moves)
+        plies += len(moves)
+
+    legal_time = location_time = position_time = 0.0
+    calls = positions = 0
+    for moves in games:
+        board = board_class()
+        for start, end in moves:
+            t = time.perf_counter()
+            for pixel in squares:
+                board.location(pixel)
+            location_time += time.perf_counter() - t
+            t = time.perf_counter()
+            for pixel in squares:
+                board.legal_moves(pixel)
+            legal_time += time.perf_counter() - t
+            t = time.perf_counter()
+            MoveTracker(board) # the legal moves of every piece of the position
+            position_time += time.perf_counter() - t
+            calls += len(squares)
+            positions += 1
+            if abs(end[0] - start[0]) > 1:
+                board.remove_piece(((start[0] + end[0]) >> 1, (start[1] + end[1]) >> 1))
+            board.move_piece(start, end)
+
+    # random play: pick a move among the current player's, play it through the tracker
+    rng = random.Random(1)
+    played = 0
+    start_time = time.perf_counter()
+    while played < num_steps:
+        board, turn = board_class(), BLUE
+        tracker = MoveTracker(board)
+        for ply in range(200):
+            moves = tracker.turn_moves(turn)
+            if not moves:
+                break
+            start, ends = rng.choice(list(moves.items()))
+            tracker.move(start, rng.choice(ends))
+            turn = RED if turn == BLUE else BLUE
+            played += 1
+    random_rate = played / (time.perf_counter() - start_time)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        env = EnvCheckers(headless=True, verbose=0, bitboard=kind == "bitboard")
+        np_rng = np.random.default_rng(0)
+        start_time = time.perf_counter()
+        for i in range(num_steps):
+            actions = np.flatnonzero(env.action_masks())
+            if len(actions) == 0 or env.step(actions[np_rng.integers(len(actions))])[2]:
+                env.reset()
+        env_rate = num_steps / (time.perf_counter() - start_time)
+
+    return {"legal_moves_us": legal_time / calls * 1e6, "location_us": location_time / calls * 1e6,
+            "position_us": position_time / positions * 1e6, "random_per_sec": random_rate, "env_per_sec": env_rate}
+
+def bench_bitboard(args):
+    print(f"{'board':>9} {'legal_moves':>12} {'location':>9} {'position':>9} {'random play':>12} {'env steps':>10}")
+    print(f"{'':>9} {'us/call':>12} {'us/call':>9} {'us':>9} {'plies/s':>12} {'steps/s':>10}")
+    results = {}
+    for kind in ("board", "bitboard"):
+        results[kind] = result = run_worker("bitboard", kind, args.positions, args.steps)
+        print(f"{kind:>9} {result['legal_moves_us']:12.2f} {result['location_us']:9.2f} {result['position_us']:9.1f} "
+              f"{result['random_per_sec']:12,.0f} {result['env_per_sec']:10,.0f}")
+    board, bitboard = results["board"], results["bitboard"]
+    print(f"{'speedup':>9} {board['legal_moves_us'] / bitboard['legal_moves_us']:11.2f}x {board['location_us'] / bitboard['location_us']:8.2f}x "
+          f"{board['position_us'] / bitboard['position_us']:8.2f}x {bitboard['random_per_sec'] / board['random_per_sec']:11.2f}x "
+          f"{bitboard['env_per_sec'] / board['env_per_sec']:9.2f}x")
+
+WORKERS = {
+    "headless": lambda argv: headless_worker(argv[0], int(argv[1]), int(argv[2])),
+    "movegen": lambda argv: movegen_worker(argv[0], int(argv[1])),
+    "metrics": lambda argv: metrics_worker(int(argv[0]), int(argv[1])),
+    "imports": lambda argv: imports_worker(argv[0]),
+    "masking": lambda argv: masking_worker(argv[0], int(argv[1])),
+    "tracking": lambda argv: tracking_worker(argv[0], int(argv[1]), argv[2]),
+    "logging": lambda argv: logging_worker(argv[0], int(argv[1])),
+    "observations": lambda argv: observations_worker(argv[0], argv[1], int(argv[2])),
+    "bitboard": lambda argv: bitboard_worker(argv[0], int(argv[1]), int(argv[2])),
+}
+
+def main():
+    if len(sys.argv) > 2 and sys.argv[1] == "worker":
+        print(json.dumps(WORKERS[sys.argv[2]](sys.argv[3:])))
+        return
+
+    parser = argparse.ArgumentParser(description="Checkers performance benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    headless = commands.add_parser("headless", help="EnvCheckers construction/reset time and RSS, windowed vs headless")
+    headless.add_argument("--envs", type=int, default=16)
+    headless.add_argument("--resets", type=int, default=200)
+    headless.set_defaults(run=bench_headless)
+
+    movegen = commands.add_parser("movegen", help="np.vstack move generation vs preallocated buffers")
+    movegen.add_argument("--positions", type=int, default=2000)
+    movegen.set_defaults(run=bench_movegen)
+
+    metrics = commands.add_parser("metrics", help="get_metrics vs get_metrics_batch for N = 1e3..1e6 boards")
+    metrics.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000, 1000000])
+    metrics.add_argument("--scalar", type=int, default=1000, help="boards labelled by get_metrics, the rest is extrapolated")
+    metrics.set_defaults(run=bench_metrics)
+
+    imports = commands.add_parser("imports", help="env worker start-up time and RSS, eager keras/pygame imports vs lazy")
+    imports.add_argument("--repeats", type=int, default=3)
+    imports.add_argument("--workers", type=int, default=64, help="size of the worker pool the total RSS is printed for")
+    imports.set_defaults(run=bench_imports)
+
+    masking = commands.add_parser("masking", help="useful transitions/sec of EnvCheckers, random vs masked actions")
+    masking.add_argument("--steps", type=int, default=20000)
+    masking.set_defaults(run=bench_masking)
+
+    tracking = commands.add_parser("tracking", help="per-step profile of EnvCheckers, incremental legal moves vs full rescans")
+    tracking.add_argument("--steps", type=int, default=5000)
+    tracking.set_defaults(run=bench_tracking)
+
+    logging = commands.add_parser("logging", help="EnvCheckers steps/sec with per-step prints and JSON logs vs EpisodeRecorder")
+    logging.add_argument("--steps", type=int, default=20000)
+    logging.set_defaults(run=bench_logging)
+
+    observations = commands.add_parser("observations", help="_get_obs() cost, decoding the Game's board vs the incremental board array")
+    observations.add_argument("--steps", type=int, default=20000)
+    observations.set_defaults(run=bench_observations)
+
+    bitboard = commands.add_parser("bitboard", help="Board vs BitBoard: Board API calls, random play and EnvCheckers steps")
+    bitboard.add_argument("--positions", type=int, default=5000)
+    bitboard.add_argument("--steps", type=int, default=20000)
+    bitboard.set_defaults(run=bench_bitboard)
+
+    args = parser.parse_args()
+    args.run(args)
+
+if __name__ == "__main__":
+    main()
@@ -35,42 +35,42 @@ Funcitonalities include:
 
 Everest Witman - May 2014 - Marlboro College - Programming Workshop 
 """
-import math
-import pygame, sys
-from pygame.locals import *
-from functions import *
-
-pygame.font.init()
-
-##COLORS##
-#             R    G    B 
-WHITE    = (255, 255, 255)
-BLUE     = (  0,   0, 255)
-RED      = (255,   0,   0)
-BLACK    = (  0,   0,   0)
-GOLD     = (255, 215,   0)
-HIGH     = (160, 190, 255)
-
-##DIRECTIONS##
-NORTHWEST = "northwest"
-NORTHEAST = "northeast"
-SOUTHWEST = "southwest"
-SOUTHEAST = "southeast"
+import sys
+import time
+from lazy import lazy_import
+from rules import *
+from drawing import draw_box1
+
+# pygame is only loaded once a window is drawn, headless games never import it
+pygame = lazy_import("pygame")
 
 class Game:
 	"""
 	The main game control.
 	"""
 
-	def __init__(self):
-		self.graphics = Graphics()
-		self.board = Board()
+	def __init__(self, bitboard=False, headless=False):
+		# a headless game only runs the rules: no window, font or surface exists until graphics is used
+		self._graphics = None if headless else Graphics()
+		self.board = BitBoard() if bitboard else Board()
 		
 		self.turn = BLUE
 		self.round_number = 1
 		self.selected_piece = None # a board location. 
 		self.hop = False
 		self.selected_legal_moves = []
+		self.message = None
+
+	@property
+	def graphics(self):
+		"""
+		The Graphics of the game. A headless game creates them the first time they are needed.
+		"""
+		if self._graphics is None:
+			self._graphics = Graphics()
+			if self.message:
+				self._graphics.draw_message(self.message)
+		return self._graphics
 
 	def setup(self):
 		"""Draws the window and board at the beginning of the game"""
@@ -94,10 +94,10 @@ class Game:
 				self.selected_legal_moves = self.board.legal_moves(self.selected_piece, self.hop)
 
 			for event in pygame.event.get():
-				if event.type == QUIT:
+				if event.type == pygame.QUIT:
 					self.terminate_game()
 
-				if event.type == MOUSEBUTTONDOWN:
+				if event.type == pygame.MOUSEBUTTONDOWN:
 					if not self.hop:
 						if self.board.location(self.mouse_pos).occupant and self.board.location(self.mouse_pos).occupant.color == self.turn:
 							self.selected_piece = self.mouse_pos
@@ -161,21 +161,18 @@ class Game:
 
 		if self.check_for_endgame():
 			if self.turn == BLUE:
-				self.graphics.draw_message("RED WINS!")
+				self.message = "RED WINS!"
 			else:
-				self.graphics.draw_message("BLUE WINS!")
+				self.message = "BLUE WINS!"
+
+			if self._graphics is not None:
+				self._graphics.draw_message(self.message)
 
 	def check_for_endgame(self):
 		"""
 		Checks to see if a player has run out of moves or pieces. If so, then return True. Else return False.
 		"""
-		for x in range(8):
-			for y in range(8):
-				if self.board.location((x,y)).color == BLACK and self.board.location((x,y)).occupant != None and self.board.location((x,y)).occupant.color == self.turn:
-					if self.board.legal_moves((x,y)) != []:
-						return False
-
-		return True
+		return not self.board.has_legal_moves(self.turn)
 	
 	def move_piece_direct(self, start_pos, end_pos):
 		"""
@@ -206,6 +203,7 @@ class Graphics:
 		self.clock = pygame.time.Clock()
 
 		self.window_size = 600
+		pygame.font.init()
 		self.titlefont = pygame.font.Font(None, 36)
 		self.font = pygame.font.Font(None, 18)
 		self.start_time = time.time()
@@ -300,260 +298,12 @@ class Graphics:
 		self.text_rect_obj = self.text_surface_obj.get_rect()
 		self.text_rect_obj.center = (self.window_size >> 1, self.window_size >> 1)
 
-class Board:
-	def __init__(self):
-		self.matrix = self.new_board()
-
-	def new_board(self):
-		"""
-		Create a new board matrix.
-		"""
-
-		# initialize squares and place them in matrix
-
-		matrix = [[None] * 8 for i in range(8)]
-
-		# The following code block has been adapted from
-		# http://itgirl.dreamhosters.com/itgirlgames/games/Program%20Leaders/ClareR/Checkers/checkers.py
-		for x in range(8):
-			for y in range(8):
-				if (x % 2 != 0) and (y % 2 == 0):
-					matrix[y][x] = Square(WHITE)
-				elif (x % 2 != 0) and (y % 2 != 0):
-					matrix[y][x] = Square(BLACK)
-				elif (x % 2 == 0) and (y % 2 != 0):
-					matrix[y][x] = Square(WHITE)
-				elif (x % 2 == 0) and (y % 2 == 0): 
-					matrix[y][x] = Square(BLACK)
-
-		# initialize the pieces and put them in the appropriate squares
-
-		for x in range(8):
-			for y in range(3):
-				if matrix[x][y].color == BLACK:
-					matrix[x][y].occupant = Piece(RED)
-			for y in range(5, 8):
-				if matrix[x][y].color == BLACK:
-					matrix[x][y].occupant = Piece(BLUE)
-
-		return matrix
-
-	def board_string(self, board):
-		"""
-		Takes a board and returns a matrix of the board space colors. Used for testing new_board()
-		"""
-
-		board_string = [[None] * 8] * 8 
-
-		for x in range(8):
-			for y in range(8):
-				if board[x][y].color == WHITE:
-					board_string[x][y] = "WHITE"
-				else:
-					board_string[x][y] = "BLACK"
-
-
-		return board_string
-	
-	def rel(self, dir, pixel):
-		"""
-		Returns the coordinates one square in a different direction to (x,y).
-
-		===DOCTESTS===
-
-		>>> board = Board()
-
-		>>> board.rel(NORTHWEST, (1,2))
-		(0,1)
-
-		>>> board.rel(SOUTHEAST, (3,4))
-		(4,5)
-
-		>>> board.rel(NORTHEAST, (3,6))
-		(4,5)
-
-		>>> board.rel(SOUTHWEST, (2,5))
-		(1,6)
-		"""
-		x = pixel[0]
-		y = pixel[1]
-		if dir == NORTHWEST:
-			return (x - 1, y - 1)
-		elif dir == NORTHEAST:
-			return (x + 1, y - 1)
-		elif dir == SOUTHWEST:
-			return (x - 1, y + 1)
-		elif dir == SOUTHEAST:
-			return (x + 1, y + 1)
-		else:
-			return 0
-
-	def adjacent(self, pixel):
-		"""
-		Returns a list of squares locations that are adjacent (on a diagonal) to (x,y).
-		"""
-		x = pixel[0]
-		y = pixel[1]
-
-		return [self.rel(NORTHWEST, (x,y)), self.rel(NORTHEAST, (x,y)),self.rel(SOUTHWEST, (x,y)),self.rel(SOUTHEAST, (x,y))]
-
-	def location(self, pixel):
-		"""
-		Takes a set of coordinates as arguments and returns self.matrix[x][y]
-		This can be faster than writing something like self.matrix[coords[0]][coords[1]]
-		"""
-		x = pixel[0]
-		y = pixel[1]
-
-		return self.matrix[x][y]
-
-	def blind_legal_moves(self, pixel):
-		"""
-		Returns a list of blind legal move locations from a set of coordinates (x,y) on the board. 
-		If that location is empty, then blind_legal_moves() return an empty list.
-		"""
-
-		x = pixel[0]
-		y = pixel[1]
-		if self.matrix[x][y].occupant != None:
-			
-			if self.matrix[x][y].occupant.king == False and self.matrix[x][y].occupant.color == BLUE:
-				blind_legal_moves = [self.rel(NORTHWEST, (x,y)), self.rel(NORTHEAST, (x,y))]
-				
-			elif self.matrix[x][y].occupant.king == False and self.matrix[x][y].occupant.color == RED:
-				blind_legal_moves = [self.rel(SOUTHWEST, (x,y)), self.rel(SOUTHEAST, (x,y))]
-
-			else:
-				blind_legal_moves = [self.rel(NORTHWEST, (x,y)), self.rel(NORTHEAST, (x,y)), self.rel(SOUTHWEST, (x,y)), self.rel(SOUTHEAST, (x,y))]
-
-		else:
-			blind_legal_moves = []
-
-		return blind_legal_moves
-
-	def legal_moves(self, pixel, hop=False):
-		"""
-		Returns a list of legal move locations from a given set of coordinates (x,y) on the board.
-		If that location is empty, then legal_moves() returns an empty list.
-		"""
-		x = pixel[0]
-		y = pixel[1]
-		blind_legal_moves = self.blind_legal_moves((x,y))
-		legal_moves = []
-		capture_moves = []
-
-		for move in blind_legal_moves:
-			if self.on_board(move):
-				# Vérification des mouvements de capture
-				if self.location(move).occupant and self.location(move).occupant.color != self.location((x,y)).occupant.color:
-					capture_move = (move[0] + (move[0] - x), move[1] + (move[1] - y))
-					if self.on_board(capture_move) and self.location(capture_move).occupant == None:
-						capture_moves.append(capture_move)
-				elif not self.location(move).occupant:  # Mouvements normaux
-					legal_moves.append(move)
-		
-		# Si des mouvements de capture existent, les rendre obligatoires
-		if capture_moves:
-			return capture_moves
-		
-		return legal_moves
-
-	def remove_piece(self, pixel):
-		"""
-		Removes a piece from the board at position (x,y). 
-		"""
-		x = pixel[0]
-		y = pixel[1]
-		self.matrix[x][y].occupant = None
-
-	def move_piece(self, pixel_start, pixel_end):
-		"""
-		Move a piece from (start_x, start_y) to (end_x, end_y).
-		"""
-		start_x = pixel_start[0]
-		start_y = pixel_start[1]
-		end_x = pixel_end[0]
-		end_y = pixel_end[1]
-
-		self.matrix[end_x][end_y].occupant = self.matrix[start_x][start_y].occupant
-		self.remove_piece((start_x, start_y))
-
-		self.king((end_x, end_y))
-
-	def is_end_square(self, coords):
-		"""
-		Is passed a coordinate tuple (x,y), and returns true or 
-		false depending on if that square on the board is an end square.
-
-		===DOCTESTS===
-
-		>>> board = Board()
-
-		>>> board.is_end_square((2,7))
-		True
-
-		>>> board.is_end_square((5,0))
-		True
-
-		>>>board.is_end_square((0,5))
-		False
-		"""
-
-		if coords[1] == 0 or coords[1] == 7:
-			return True
-		else:
-			return False
-
-	def on_board(self, pixel):
-		"""
-		Checks to see if the given square (x,y) lies on the board.
-		If it does, then on_board() return True. Otherwise it returns false.
-
-		===DOCTESTS===
-		>>> board = Board()
-
-		>>> board.on_board((5,0)):
-		True
-
-		>>> board.on_board(-2, 0):
-		False
-
-		>>> board.on_board(3, 9):
-		False
-		"""
-
-		x = pixel[0]
-		y = pixel[1]
-		if x < 0 or y < 0 or x > 7 or y > 7:
-			return False
-		else:
-			return True
-
-
-	def king(self, pixel):
-		"""
-		Takes in (x,y), the coordinates of square to be considered for kinging.
-		If it meets the criteria, then king() kings the piece in that square and kings it.
-		"""
-		x = pixel[0]
-		y = pixel[1]
-		if self.location((x,y)).occupant != None:
-			if (self.location((x,y)).occupant.color == BLUE and y == 0) or (self.location((x,y)).occupant.color == RED and y == 7):
-				self.location((x,y)).occupant.king = True 
-
-class Piece:
-	def __init__(self, color, king = False):
-		self.color = color
-		self.king = king
-
-class Square:
-	def __init__(self, color, occupant = None):
-		self.color = color # color is either BLACK or WHITE
-		self.occupant = occupant # occupant is a Square object
-
 def main():
 	game = Game()
 	game.main()
 
 if __name__ == "__main__":
-	main()
\ No newline at end of file
+	if len(sys.argv) > 1 and sys.argv[1] == "crosscheck":
+		print("Board and BitBoard agree on {} positions".format(cross_check()))
+	else:
+		main()
\ No newline at end of file
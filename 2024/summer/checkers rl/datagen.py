@@ -0,0 +1,193 @@
+import os
+import json
+import time
+import argparse
+import multiprocessing
+import numpy as np
+from heuristics import np_board, expand, reverse, generate_next, generate_next_batch, get_metrics_batch, MAX_MOVES
+
+# Stand-alone data generation for the gen/disc models of train.py.
+# Every shard is produced by one worker from its own seed: a random opening of a few plies,
+# then the same breadth-first expansion as the training loop, then get_metrics_batch() labelling.
+# Positions are canonicalized and deduplicated before they are stored, so no position is labelled
+# (or trained on) twice within a shard.
+# Shards are written as pairs of .npy files (boards_XXXXX.npy, metrics_XXXXX.npy) that
+# iter_shards() reads back memory-mapped, so training never holds the whole dataset in RAM.
+
+BOARD_DTYPE = np.int8 # compressed 32-square boards
+METRICS_DTYPE = np.int16 # [label, 10 heuristic metrics] from get_metrics()
+
+# children of a board, seen by the player who moves next
+def next_boards(board):
+    return generate_next(reverse(expand(board)))
+
+# A compressed board does not say whose turn it is, and the training loop stores boards of both players,
+# so a placement can show up as a board and as its reverse -board[::-1] (colours swapped, board turned
+# around), the only symmetry of the rules: the left-right mirror puts pieces on light squares, and
+# the rules are not mirror-symmetric anyway (single and double corners, kings' backward steps).
+def canonical_batch(boards):
+    """Return the canonical form of (N, 32) boards: of a board and its reverse, the lexicographically smaller one."""
+    boards = np.asarray(boards)
+    reversed_boards = 0 - boards[:, ::-1] # not -boards, which turns the empty squares of float boards into -0.0
+    differ = boards != reversed_boards
+    first = np.argmax(differ, axis=1)
+    rows = np.arange(len(boards))
+    take = differ[rows, first] & (reversed_boards[rows, first] < boards[rows, first])
+    return np.where(take[:, None], reversed_boards, boards)
+
+class Deduplicator:
+    """Hash set of the positions seen so far: filter() drops the boards already seen, canonicalized first if canonical."""
+
+    def __init__(self, canonical=True):
+        self.canonical = canonical
+        self.keys = set()
+        self.seen = 0
+
+    def filter(self, boards, limit=None):
+        """
+        Return the boards of (N, 32) boards not seen before, in order (canonical forms if canonical).
+        With a limit, stops after limit new boards: the boards after them are not looked at.
+        """
+        boards = np.asarray(boards)
+        boards = boards[self.new_mask(boards, limit)]
+        return canonical_batch(boards) if self.canonical else boards
+
+    def new_mask(self, boards, limit=None):
+        """Like filter(), but return the (N,) boolean mask of the new boards, and record them as seen."""
+        boards = canonical_batch(boards) if self.canonical else np.asarray(boards)
+        keys = boards.astype(np.int8) # same keys for the int8 boards of datagen and the float boards of train.py
+        keep = np.zeros(len(boards), dtype=bool)
+        kept = examined = 0
+        for board in keys:
+            if limit is not None and kept == limit:
+                break
+            key = board.tobytes()
+            if key not in self.keys:
+                self.keys.add(key)
+                keep[examined] = True
+                kept += 1
+            examined += 1
+        self.seen += examined
+        return keep
+
+    def unique_ratio(self):
+        """Fraction of the boards passed to filter() that were kept."""
+        return len(self.keys) / self.seen if self.seen else 1.0
+
+# random opening, so that shards starting from different seeds explore different positions
+def random_opening(rng, max_plies):
+    board = np_board()
+    children = generate_next(expand(board))
+    for ply in range(rng.integers(0, max_plies + 1)):
+        board = children[rng.integers(len(children))]
+        children = next_boards(board)
+        if (len(children) == 0):
+            break
+    return board, children
+
+# breadth-first expansion from a random opening, until shard_size boards are collected.
+# Each level is expanded in batches of BATCH boards into one preallocated buffer.
+BATCH = 64
+
+def expand_positions(seed, shard_size, max_opening, dedup=None):
+    rng = np.random.default_rng(seed)
+    dedup = Deduplicator() if dedup is None else dedup
+    boards = np.zeros((shard_size, 32), dtype=BOARD_DTYPE)
+    out = np.zeros((BATCH * MAX_MOVES, 32), dtype=BOARD_DTYPE)
+    parents = np.zeros(len(out), dtype=np.int64)
+    count = 0
+
+    while (count < shard_size):
+        board, level = random_opening(rng, max_opening)
+        while (len(level) > 0 and count < shard_size):
+            new = dedup.new_mask(level, shard_size - count)
+            unique = canonical_batch(level[new]) if dedup.canonical else level[new]
+            n = len(unique)
+            boards[count:count + n] = unique
+            count += n
+
+            # only the new boards are expanded, as played (not canonicalized): the children of the others were
+            # reached already. The opponent moves next: reversing a compressed board is -board[::-1]
+            level = level[new]
+            if (n == 0):
+                break
+            next_level = []
+            needed = shard_size - count
+            for k in range(0, len(level), BATCH):
+                m = generate_next_batch(-level[k:k + BATCH, ::-1], out, parents)
+                next_level.append(out[:m].copy())
+                needed -= m
+                if (needed <= 0):
+                    break
+            level = np.concatenate(next_level)
+    return boards
+
+def label_positions(boards):
+    return get_metrics_batch(boards).astype(METRICS_DTYPE)
+
+def shard_paths(directory, index):
+    return (os.path.join(directory, f"boards_{index:05d}.npy"), os.path.join(directory, f"metrics_{index:05d}.npy"))
+
+# worker task: expand, label and write one shard
+def make_shard(task):
+    directory, index, seed, shard_size, max_opening = task
+    dedup = Deduplicator()
+    boards = expand_positions(seed, shard_size, max_opening, dedup)
+    metrics = label_positions(boards)
+    boards_path, metrics_path = shard_paths(directory, index)
+    np.save(boards_path, boards)
+    np.save(metrics_path, metrics)
+    return index, dedup.seen
+
+def generate(directory, num_shards, shard_size=1000, workers=None, seed=0, max_opening=20):
+    """
+    Writes num_shards shards of shard_size labelled positions to directory using a pool of worker processes.
+    Returns the number of positions per second and the unique-position ratio of the expansion.
+    """
+    os.makedirs(directory, exist_ok=True)
+    tasks = [(directory, i, seed * 1000003 + i, shard_size, max_opening) for i in range(num_shards)]
+
+    start = time.perf_counter()
+    seen = 0
+    with multiprocessing.Pool(workers) as pool:
+        for index, shard_seen in pool.imap_unordered(make_shard, tasks):
+            seen += shard_seen
+    elapsed = time.perf_counter() - start
+
+    unique_ratio = num_shards * shard_size / seen
+    with open(os.path.join(directory, "manifest.json"), "w") as manifest:
+        json.dump({"num_shards": num_shards, "shard_size": shard_size, "seed": seed, "max_opening": max_opening,
+                   "unique_ratio": unique_ratio}, manifest)
+    return num_shards * shard_size / elapsed, unique_ratio
+
+def iter_shards(directory):
+    """
+    Yields (boards, metrics) for every shard of directory as read-only memory-mapped arrays.
+    boards is (shard_size, 32) and metrics is (shard_size, 11), with the label in column 0.
+    """
+    with open(os.path.join(directory, "manifest.json")) as manifest:
+        num_shards = json.load(manifest)["num_shards"]
+    for index in range(num_shards):
+        boards_path, metrics_path = shard_paths(directory, index)
+        yield np.load(boards_path, mmap_mode="r"), np.load(metrics_path, mmap_mode="r")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate labelled checkers positions for the gen/disc models")
+    parser.add_argument("directory")
+    parser.add_argument("--shards", type=int, default=32)
+    parser.add_argument("--shard-size", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=None, help="default: all cores")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--scaling", action="store_true", help="time 1, 2, 4... workers up to --workers")
+    args = parser.parse_args()
+
+    if args.scaling:
+        workers = 1
+        while workers <= (args.workers or os.cpu_count()):
+            rate, unique_ratio = generate(args.directory, args.shards, args.shard_size, workers, args.seed)
+            print(f"{workers:3d} workers: {rate:10,.0f} positions/sec")
+            workers *= 2
+    else:
+        rate, unique_ratio = generate(args.directory, args.shards, args.shard_size, args.workers, args.seed)
+        print(f"{args.shards * args.shard_size} positions written to {args.directory} ({rate:,.0f} positions/sec, "
+              f"{unique_ratio:.1%} of the expanded positions were unique)")
@@ -0,0 +1,54 @@
+import time
+import math
+from lazy import lazy_import
+
+# pygame drawing helpers of the checkers window, pygame is loaded the first time something is drawn
+pygame = lazy_import("pygame")
+
+# time elapsed
+def get_time_elapsed(start_time):
+    elapsed_time = time.time() - start_time
+    minutes = int(elapsed_time // 60)
+    seconds = int(elapsed_time % 60)
+    return f"{minutes:02}:{seconds:02}"
+
+# round 
+def get_round():
+    global round_number
+    return round_number
+
+# box 1 (general information)
+def draw_box1(screen, font, font2, start_time, window_size, round, turn, color, color2, color3, background_color):
+    pygame.draw.rect(surface=screen, color=background_color, rect=(window_size, 0, 200, 150))
+    pygame.draw.rect(surface=screen, color=color, rect=(window_size, 0, 200, 150), width=2)
+    title_text = font.render("GENERAL", True, color)
+    screen.blit(title_text, (window_size + 10, 5))
+
+    # Players
+    if turn == color2:
+        current_player_text = "Current player: Blue"
+    else:
+        current_player_text = "Current player: Red"
+
+    player_blue = font2.render("Player in blue: EFE", True, color2)
+    player_red = font2.render("Player in red: EFE", True, color3)
+
+    current_player = font2.render(current_player_text, True, color2) if turn == color2 else font2.render(current_player_text, True, color3)
+    
+    screen.blit(player_blue, (window_size + 10, 50))
+    screen.blit(player_red, (window_size + 10, 65))
+    screen.blit(current_player, (window_size + 10, 80))
+
+    # Rule
+    checkers_shape = font2.render("Shape: (8*8)", True, color)
+    rule_text = font2.render("American rules", True, color)
+    screen.blit(rule_text, (window_size + 10, 95))
+    screen.blit(checkers_shape, (window_size + 10, 110))
+
+    # Round
+    round_text = font2.render(f"Round: {int(math.floor(round))}", True, color)
+    screen.blit(round_text, (window_size + 10, 125))
+
+    # Temps écoulé
+    time_text = font2.render("Time elapsed: {}".format(get_time_elapsed(start_time)), True, color)
+    screen.blit(time_text, (window_size + 10, 30))
@@ -0,0 +1,176 @@
+import time
+import argparse
+from itertools import combinations
+from math import comb
+import numpy as np
+from heuristics import compress, game_winner, generate_next_batch, MAX_MOVES, DARK_ROWS
+
+# Endgame table of every position with at most max_pieces pieces, solved by retrograde analysis
+# under the heuristics.py rules (those of generate_next(), which search, mcts and datagen play).
+#
+# A position is a compressed (32,) board seen by the player to move. Its index is a perfect hash of
+# the piece placement: positions with k pieces come after all those with fewer, then the occupied
+# squares are ranked with the combinatorial number system and the pieces, in square order, are
+# base-4 digits (man, king, opponent man, opponent king).
+#
+# The table is one uint8 per index, saved as .npy and opened memory-mapped:
+#   0     draw (neither side can force a win)
+#   255   not a position (no pieces, or a man on its own promotion row)
+#   v     the game ends after v - 1 plies of best play: odd v - 1 is a win for the player to move
+#         (fastest win), even v - 1 a loss (slowest loss); 1 means no legal move, a loss.
+
+DRAW, INVALID = 0, 255
+PIECE_VALUES = np.array([1, 3, -1, -3], dtype=np.int8)
+PIECE_CODES = np.zeros(7, dtype=np.int64) # indexed by value + 3
+PIECE_CODES[PIECE_VALUES + 3] = np.arange(4)
+
+# BINOMIALS[n, k] = C(n, k)
+BINOMIALS = np.array([[comb(n, k) for k in range(33)] for n in range(33)], dtype=np.int64)
+
+def table_size(max_pieces):
+    return sum(comb(32, k) * 4 ** k for k in range(max_pieces + 1))
+
+# far more than any table that can be solved, and the indices still fit in int64
+MAX_PIECES = 12
+OFFSETS = np.array([table_size(k - 1) if k else 0 for k in range(MAX_PIECES + 1)], dtype=np.int64)
+
+def index_batch(boards):
+    """Return the table indices of (N, 32) compressed boards."""
+    boards = np.asarray(boards)
+    occupied = boards != 0
+    order = np.cumsum(occupied, axis=1) - 1 # position of every piece among the pieces of its board
+    squares = np.broadcast_to(np.arange(32), boards.shape)
+    rank = np.where(occupied, BINOMIALS[squares, np.maximum(order + 1, 0)], 0).sum(axis=1)
+    digits = np.where(occupied, PIECE_CODES[boards.astype(np.int64) + 3] << (2 * np.maximum(order, 0)), 0).sum(axis=1)
+    pieces = occupied.sum(axis=1)
+    return OFFSETS[pieces] + (rank << (2 * pieces)) + digits
+
+def index(board):
+    return int(index_batch(np.asarray(board)[None])[0])
+
+def slice_boards(pieces):
+    """Return every valid compressed board with the given number of pieces."""
+    squares = np.array(list(combinations(range(32), pieces)), dtype=np.int64).reshape(-1, pieces)
+    codes = np.arange(4 ** pieces)
+    values = PIECE_VALUES[(codes[:, None] >> (2 * np.arange(pieces))) & 3] # (4^k, k)
+    boards = np.zeros((len(squares), len(codes), 32), dtype=np.int8)
+    boards[np.arange(len(squares))[:, None, None], np.arange(len(codes))[None, :, None], squares[:, None, :]] = values[None]
+    boards = boards.reshape(-1, 32)
+    # men are kinged on reaching the far row, so none can stand on it
+    rows = DARK_ROWS[None]
+    valid = ~np.any(((boards == 1) & (rows == 7)) | ((boards == -1) & (rows == 0)), axis=1)
+    return boards[valid]
+
+def successors(boards, chunk=256):
+    """
+    Return the successor edges of (N, 32) boards as (parents, indices): indices are the table indices
+    of the opponent's positions after every move, without duplicates.
+    """
+    out = np.zeros((chunk * MAX_MOVES, 32), dtype=np.int8)
+    parents = np.zeros(len(out), dtype=np.int64)
+    all_parents, all_indices = [], []
+    for start in range(0, len(boards), chunk):
+        count = generate_next_batch(boards[start:start + chunk], out, parents)
+        keys = np.unique(index_batch(-out[:count, ::-1]) * chunk + parents[:count])
+        all_parents.append(keys % chunk + start)
+        all_indices.append(keys // chunk)
+    return np.concatenate(all_parents), np.concatenate(all_indices)
+
+def solve(max_pieces, path="endgame.npy", verbose=True):
+    """Solve every position with at most max_pieces pieces and save the table to path."""
+    if not 1 <= max_pieces <= MAX_PIECES:
+        raise ValueError(f"max_pieces must be between 1 and {MAX_PIECES}, got {max_pieces}")
+    table = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8, shape=(table_size(max_pieces),))
+    table[:] = INVALID
+    longest = 0 # longest game of the slices solved so far, in plies
+    for pieces in range(1, max_pieces + 1):
+        start = time.perf_counter()
+        boards = slice_boards(pieces)
+        positions = index_batch(boards)
+        parents, targets = successors(boards)
+        degree = np.bincount(parents, minlength=len(boards))
+        plies = np.full(len(boards), -1, dtype=np.int64) # -1 until solved
+
+        # level by level: a position is a win in d plies if a move reaches a loss in d - 1 plies,
+        # a loss in d plies if every move reaches a win and the longest of them takes d - 1 plies
+        plies[degree == 0] = 0
+        table[positions] = np.where(plies >= 0, plies + 1, INVALID)
+        d = 1
+        while True:
+            target_plies = table[targets].astype(np.int64) - 1 # -1 for a draw or an unsolved position of this slice
+            target_plies[table[targets] == INVALID] = -1
+            unsolved = plies < 0
+            if d % 2:
+                found = np.zeros(len(boards), dtype=bool)
+                found[parents[target_plies == d - 1]] = True
+            else:
+                wins = np.bincount(parents[(target_plies >= 0) & (target_plies % 2 == 1) & (target_plies < d)], minlength=len(boards))
+                found = (wins == degree) & (degree > 0)
+            found &= unsolved
+            plies[found] = d
+            table[positions[found]] = d + 1
+            if d > 253:
+                raise ValueError("a game longer than 253 plies does not fit in the table")
+            if not found.any() and d > longest + 1:
+                break
+            d += 1
+        longest = max(longest, int(plies.max()))
+        table[positions[plies < 0]] = DRAW
+        if verbose:
+            wins, losses, draws = np.sum((plies >= 0) & (plies % 2 == 1)), np.sum((plies >= 0) & (plies % 2 == 0)), np.sum(plies < 0)
+            print(f"{pieces} pieces: {len(boards):10,d} positions, {len(parents):11,d} moves, {wins:10,d} wins, {losses:10,d} losses, "
+                  f"{draws:10,d} draws, longest {int(plies.max())} plies, {time.perf_counter() - start:.1f}s")
+    table.flush()
+    return table
+
+class EndgameTable:
+    """Exact results of the positions with few pieces, looked up in a table made by solve()."""
+
+    def __init__(self, path="endgame.npy"):
+        self.table = np.load(path, mmap_mode="r")
+        self.max_pieces = max(k for k in range(MAX_PIECES + 1) if table_size(k) <= len(self.table))
+
+    def probe_batch(self, boards):
+        """
+        Return (results, plies) for (N, 32) compressed boards, seen by the player to move: result 1 won,
+        -1 lost, 0 drawn and 2 for a board the table does not have; plies is the length of the game, -1 if none.
+        """
+        boards = np.asarray(boards)
+        known = np.sum(boards != 0, axis=1) <= self.max_pieces
+        values = np.full(len(boards), INVALID, dtype=np.int64)
+        values[known] = self.table[index_batch(boards[known])]
+        plies = values - 1
+        results = np.where(values == DRAW, 0, np.where(plies % 2 == 1, 1, -1))
+        results[values == INVALID] = 2
+        return results, np.where((values == DRAW) | (values == INVALID), -1, plies)
+
+    def probe(self, board):
+        """Return (result, plies) of a compressed board as probe_batch(), or None if the table does not have it."""
+        if np.count_nonzero(board) > self.max_pieces:
+            return None
+        value = int(self.table[index(board)])
+        if value == INVALID:
+            return None
+        if value == DRAW:
+            return 0, -1
+        return (1 if (value - 1) % 2 else -1), value - 1
+
+    def winner(self, board):
+        """
+        game_winner() on an expanded 8x8 board, the positive player to move, which also calls
+        won or lost positions of the table: 1 if the positive player wins, -1 if it loses, else 0.
+        """
+        found = self.probe(compress(board)[0])
+        if found is None or found[0] == 0:
+            return game_winner(board)
+        return found[0]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Solve the endgame table of the positions with few pieces")
+    parser.add_argument("--pieces", type=int, default=3)
+    parser.add_argument("--path", default="endgame.npy")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    solve(args.pieces, args.path)
+    print(f"{table_size(args.pieces):,d} entries written to {args.path} in {time.perf_counter() - start:.1f}s")
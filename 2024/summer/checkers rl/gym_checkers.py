@@ -1,12 +1,19 @@
 import gym
-import pygame
+from lazy import lazy_import
 import numpy as np
 from gym import spaces
 from checkers import Game
-from functions import get_metrics, draw_box1
+from rules import MoveTracker, BitBoard, PIXELS, bit_indices
+from heuristics import get_metrics, DARK_ROWS, DARK_COLS
+from drawing import draw_box1
+import time
 import uuid
 import os
 import json
+import argparse
+
+# pygame is only loaded by render() and close(), headless envs never import it
+pygame = lazy_import("pygame")
 
 # Color definitions
 RED = (255, 0, 0)
@@ -15,44 +22,128 @@ WHITE = (255, 255, 255)
 BLACK = (0, 0, 0)
 GOLD = (255, 215, 0)
 
+# Actions of the default action space: start square * 64 + end square, squares being x * 8 + y
+def encode_action(start_pos, end_pos):
+    """Return the 64*64 action moving the piece on start_pos to end_pos."""
+    return (start_pos[0] * 8 + start_pos[1]) * 64 + end_pos[0] * 8 + end_pos[1]
+
+def decode_action(action):
+    """Return the (start_pos, end_pos) of a 64*64 action."""
+    start_idx, end_idx = divmod(int(action), 64)
+    return (start_idx // 8, start_idx % 8), (end_idx // 8, end_idx % 8)
+
+# Actions of the compact action space: (square * 4 + direction) * 2 + kind, 32 * 4 * 2 = 256 actions.
+# Squares are the 32 dark squares numbered y * 4 + x // 2 like rules.square_bit(), directions are
+# NORTHWEST, NORTHEAST, SOUTHWEST, SOUTHEAST and kind is 0 for a step, 1 for a jump.
+COMPACT_DIRECTIONS = [(-1, -1), (1, -1), (-1, 1), (1, 1)]
+NUM_COMPACT_ACTIONS = 32 * 4 * 2
+
+def encode_compact(start_pos, end_pos):
+    """Return the compact action moving the piece on start_pos to end_pos, or None if it is not a diagonal step or jump from a dark square."""
+    dx = end_pos[0] - start_pos[0]
+    dy = end_pos[1] - start_pos[1]
+    distance = abs(dx)
+    if distance not in (1, 2) or abs(dy) != distance or (start_pos[0] + start_pos[1]) % 2 != 0:
+        return None
+    direction = COMPACT_DIRECTIONS.index((dx // distance, dy // distance))
+    square = start_pos[1] * 4 + start_pos[0] // 2
+    return (square * 4 + direction) * 2 + distance - 1
+
+def decode_compact(action):
+    """Return the (start_pos, end_pos) of a compact action. end_pos may be off the board."""
+    square, rest = divmod(int(action), 8)
+    direction, kind = divmod(rest, 2)
+    y = square // 4
+    x = (square % 4) * 2 + y % 2
+    dx, dy = COMPACT_DIRECTIONS[direction]
+    return (x, y), (x + dx * (kind + 1), y + dy * (kind + 1))
+
+# Observation formats, all int8 and computed from the env's 8x8 board array without Python loops:
+#   board   (8, 8) indexed [x][y]: 0 empty, 1 red, 2 blue, +2 for a king
+#   packed  (32,) in the order of heuristics.compress(), with RED as the positive player: 1 man, 3 king,
+#           -1/-3 for BLUE. Square k is (x, y) = (7 - DARK_COLS[k], DARK_ROWS[k]), see perft.py
+#   planes  (4, 8, 8) binary planes indexed [x][y]: red men, red kings, blue men, blue kings
+OBSERVATION_SPACES = {
+    "board": spaces.Box(low=0, high=4, shape=(8, 8), dtype=np.int8),
+    "packed": spaces.Box(low=-3, high=3, shape=(32,), dtype=np.int8),
+    "planes": spaces.Box(low=0, high=1, shape=(4, 8, 8), dtype=np.int8),
+}
+PACKED_X = 7 - DARK_COLS
+PACKED_Y = DARK_ROWS
+PACKED_VALUES = np.array([0, 1, -1, 3, -3], dtype=np.int8) # indexed by the board code
+PLANE_CODES = np.array([1, 3, 2, 4], dtype=np.int8)
+
 class EnvCheckers(gym.Env):
     """
     A checkers environment for reinforcement learning using OpenAI Gym.
     """
     metadata = {'render.modes': ['human']}
 
-    def __init__(self):
+    def __init__(self, bitboard=False, headless=False, compact=False, verbose=2, recorder=None, obs_format="board", copy_obs=True):
         super(EnvCheckers, self).__init__()
-        self.game = Game()
+        if obs_format not in OBSERVATION_SPACES:
+            raise ValueError(f"obs_format must be one of {', '.join(OBSERVATION_SPACES)}, got {obs_format!r}")
+        self.bitboard = bitboard
+        self.headless = headless  # rules only, the window is opened by the first render()
+        self.compact = compact  # 256 actions (square, direction, step/jump) instead of 64*64
+        self.verbose = verbose  # 0: no output, 1: illegal moves, 2: also the coordinates of every action
+        self.recorder = recorder  # recorder.EpisodeRecorder, replaces step_rewards and save_logs()
+        self.obs_format = obs_format  # see OBSERVATION_SPACES
+        self.copy_obs = copy_obs  # False: observations are read-only views, valid until the board changes
+        self.episode = None
+        self.window_open = False
         self.turn = BLUE
         self.round = 1
-        self.start_time = pygame.time.get_ticks()  # Start the timer
+        self.start_time = time.time()  # Start the timer
         self.total_reward = 0
         self.step_rewards = []
         
-        # Define the action space (64 start positions * 64 end positions)
-        self.action_space = spaces.Discrete(64 * 64)
+        # Define the action space (64 start positions * 64 end positions, or the compact encoding)
+        self.action_space = spaces.Discrete(NUM_COMPACT_ACTIONS if compact else 64 * 64)
         
-        # Define the observation space (8x8 board, values: 0=empty, 1=red, 2=blue, +2=kings)
-        self.observation_space = spaces.Box(low=0, high=4, shape=(8, 8), dtype=np.int8)
+        # Define the observation space (8x8 board, values: 0=empty, 1=red, 2=blue, +2=kings, or another format)
+        self.observation_space = OBSERVATION_SPACES[obs_format]
         self.reset()
 
     def reset(self):
         """Reset the game to its initial state."""
-        self.game = Game()
-        self.game.setup()
+        if self.recorder is not None:
+            if self.episode is not None and self.episode_steps > 0:
+                self._end_episode(finished=False)
+            self.episode = self.recorder.begin_episode()
+        self.episode_steps = 0
+        self.illegal_moves = 0
+        self.episode_start = time.time()
+        self.game = Game(bitboard=self.bitboard, headless=self.headless)
+        self.window_open = False
+        if not self.headless:
+            self.game.setup()
+            self.window_open = True
         self.turn = BLUE
         self.round = 1
         self.total_reward = 0  # Reset total reward
         self.step_rewards = []  # Clear previous rewards
+        self.tracker = MoveTracker(self.game.board)  # legal moves of every piece, updated around each move
+        self._legal = None  # legal moves and action mask of the current player, until the board changes
+        self._mask = None
+        self._board = self._decode_board()  # the board codes of the "board" format, updated by each move
+        self._obs = None  # observation of the current board, until it changes
         return self._get_obs()
 
-    def _get_obs(self):
-        """Return the current board state as an observation."""
+    def _decode_board(self):
+        """Return the board codes of every square, read from the Game's board."""
         board_matrix = np.zeros((8, 8), dtype=np.int8)
+        board = self.game.board
+        if isinstance(board, BitBoard):
+            # read the bitboards: the matrix property would build 64 Square objects
+            for code, pieces in ((1, board.red), (2, board.blue)):
+                for index in bit_indices(pieces):
+                    board_matrix[PIXELS[index]] = code + 2 * bool(board.kings >> index & 1)
+            return board_matrix
+        matrix = board.matrix
         for x in range(8):
             for y in range(8):
-                piece = self.game.board.matrix[x][y].occupant
+                piece = matrix[x][y].occupant
                 if piece is not None:
                     if piece.color == RED:
                         board_matrix[x][y] = 1  # Red piece
@@ -62,63 +153,94 @@ class EnvCheckers(gym.Env):
                         board_matrix[x][y] += 2  # King piece
         return board_matrix
 
+    def _update_board(self, start_pos, end_pos, captured_pos):
+        """Play a move that the Game's board just made on the board codes."""
+        piece = self.game.board.location(end_pos).occupant
+        self._board[start_pos] = 0
+        self._board[end_pos] = (1 if piece.color == RED else 2) + 2 * piece.king
+        if captured_pos is not None:
+            self._board[captured_pos] = 0
+        self._obs = None
+
+    def _get_obs(self):
+        """Return the current board state as an observation, in the env's obs_format."""
+        if self._obs is None:
+            if self.obs_format == "packed":
+                obs = PACKED_VALUES[self._board[PACKED_X, PACKED_Y]]
+            elif self.obs_format == "planes":
+                obs = (self._board[None] == PLANE_CODES[:, None, None]).astype(np.int8)
+            else:
+                obs = self._board.view()
+            obs.setflags(write=False)
+            self._obs = obs
+        return self._obs.copy() if self.copy_obs else self._obs
+
     def _get_legal_moves(self, start_pos):
         """Return all legal moves for a given position, considering mandatory captures."""
-        legal_moves = self.game.board.legal_moves(start_pos)
-        capture_moves = [move for move in legal_moves if abs(move[0] - start_pos[0]) > 1]  # Capture moves
+        # Board.legal_moves() only returns the captures of a piece that can capture
+        return self.tracker.moves.get(start_pos, [])
 
-        # If capture moves exist, return only those (capture is mandatory)
-        return capture_moves if capture_moves else legal_moves
+    def _get_turn_moves(self):
+        """
+        Return {start_pos: [end_pos, ...]} for the pieces of the current player that can move,
+        only the captures if one exists, and whether they are captures.
+        """
+        if self._legal is None:
+            self._legal = (self.tracker.turn_moves(self.turn), self.tracker.has_captures(self.turn))
+        return self._legal
 
-    def _get_mandatory_captures(self):
-        """Check if there are mandatory captures for the current player."""
-        mandatory_captures = []
-        for x in range(8):
-            for y in range(8):
-                piece = self.game.board.matrix[x][y].occupant
-                if piece and piece.color == self.turn:
-                    legal_moves = self._get_legal_moves((x, y))
-                    # Filter only capture moves
-                    capture_moves = [move for move in legal_moves if abs(move[0] - x) > 1]
-                    if capture_moves:
-                        mandatory_captures.append((x, y, capture_moves))
-        return mandatory_captures
+    def legal_actions(self):
+        """Return the actions of the current player that step() accepts, in the env's action encoding."""
+        encode = encode_compact if self.compact else encode_action
+        moves, _ = self._get_turn_moves()
+        return [encode(start_pos, end_pos) for start_pos, ends in moves.items() for end_pos in ends]
+
+    def action_masks(self):
+        """
+        Return a read-only boolean mask over the action space, True for the legal actions of the current player.
+        It is also returned as info["action_mask"] by step().
+        """
+        if self._mask is None:
+            mask = np.zeros(self.action_space.n, dtype=bool)
+            mask[self.legal_actions()] = True
+            mask.setflags(write=False)
+            self._mask = mask
+        return self._mask
 
     def step(self, action):
         """Apply an action and return the next state, reward, done, and info."""
-        start_idx = action // 64
-        end_idx = action % 64
-
-        start_pos = (start_idx // 8, start_idx % 8)
-        end_pos = (end_idx // 8, end_idx % 8)
+        start_pos, end_pos = decode_compact(action) if self.compact else decode_action(action)
 
-        print("Coordonnées de départ :", start_pos)
-        print("Coordonnées d'arrivée :", end_pos)
+        if self.verbose >= 2:
+            print("Coordonnées de départ :", start_pos)
+            print("Coordonnées d'arrivée :", end_pos)
 
-        legal_moves = self._get_legal_moves(start_pos)
         reward = 0  # Initialisation de la récompense
-        
+
         # Vérification des captures obligatoires avant de continuer
-        mandatory_captures = self._get_mandatory_captures()
-        
+        turn_moves, mandatory_captures = self._get_turn_moves()
+
         # Si des captures sont obligatoires et que l'action n'est pas une capture
         if mandatory_captures:
-            for capture in mandatory_captures:
-                if start_pos == (capture[0], capture[1]) and end_pos in capture[2]:
-                    break
-            else:
-                print("Une capture est obligatoire!")
+            if end_pos not in turn_moves.get(start_pos, ()):
+                if self.verbose >= 1:
+                    print("Une capture est obligatoire!")
                 reward -= 5  # Pénalité pour ne pas avoir effectué la capture obligatoire
-                self.step_rewards.append(reward)
-                return self._get_obs(), reward, False, {}
+                self.illegal_moves += 1
+                self._record_step(action, reward, False)
+                return self._get_obs(), reward, False, {"action_mask": self.action_masks()}
+            legal_moves = turn_moves[start_pos]
+        else:
+            legal_moves = self._get_legal_moves(start_pos)
 
         if end_pos in legal_moves:
-            self.game.board.move_piece(start_pos, end_pos)
+            captured_pos = self.tracker.move(start_pos, end_pos)
+            self._update_board(start_pos, end_pos, captured_pos)
+            self._legal = None
+            self._mask = None
 
             # Si un pion a été capturé
-            if abs(start_pos[0] - end_pos[0]) > 1:
-                captured_pos = ((start_pos[0] + end_pos[0]) // 2, (start_pos[1] + end_pos[1]) // 2)
-                self.game.board.remove_piece(captured_pos)
+            if captured_pos is not None:
                 reward += 10  # Récompense pour avoir capturé un pion
             else:
                 reward += 1  # Récompense pour avoir effectué un mouvement valide sans capture
@@ -127,27 +249,57 @@ class EnvCheckers(gym.Env):
             self.turn = RED if self.turn == BLUE else BLUE
             self.round += 0.5
         else:
-            print("Mouvement illégal!")
+            if self.verbose >= 1:
+                print("Mouvement illégal!")
             reward -= 5  # Pénalité pour mouvement illégal
+            self.illegal_moves += 1
 
-        # Vérifier la fin de la partie
-        done = self.game.check_for_endgame()
+        # Vérifier la fin de la partie: the player to move, whose moves action_masks() holds, has lost if it has none
+        # (the env never ends the Game's turn, so self.game.turn stays BLUE and check_for_endgame() cannot be used)
+        done = not self.tracker.has_legal_moves(self.turn)
 
         # Si la partie est terminée, ajouter une récompense/pénalité
         if done:
-            if self.turn == RED:
+            if self.turn == BLUE:
                 reward -= 20  # Pénalité pour le joueur Bleu s'il a perdu
             else:
                 reward += 20  # Récompense pour le joueur Bleu s'il a gagné
 
         self.total_reward += reward
-        self.step_rewards.append(reward)
+        self._record_step(action, reward, done)
+        if done and self.recorder is not None:
+            self._end_episode(finished=True)
         obs = self._get_obs()
 
-        return obs, reward, done, {}
+        return obs, reward, done, {"action_mask": self.action_masks()}
+
+    def _record_step(self, action, reward, done):
+        """Keep the reward of a step, in step_rewards or in the recorder."""
+        self.episode_steps += 1
+        if self.recorder is None:
+            self.step_rewards.append(reward)
+        else:
+            self.recorder.record_step(self.episode, action, reward, done)
+
+    def _end_episode(self, finished):
+        """Send the summary of the current episode to the recorder."""
+        self.recorder.end_episode({
+            "episode": self.episode,
+            "steps": self.episode_steps,
+            "total_reward": self.total_reward,
+            "illegal_moves": self.illegal_moves,
+            "round": self.round,
+            "winner": ("BLUE" if self.turn == RED else "RED") if finished else None,
+            "seconds": round(time.time() - self.episode_start, 3)
+        })
+        self.episode_steps = 0
 
     def render(self, mode='human'):
         """Render the current state of the game."""
+        if not self.window_open:
+            self.game.setup()
+            self.window_open = True
+
         self.game.graphics.update_display(self.game.board, self.game.selected_legal_moves, self.turn, self.round, self.game.selected_piece)
         
         # Box 1: General game information (round, turn, etc.)
@@ -158,8 +310,11 @@ class EnvCheckers(gym.Env):
                 self.close()
     
     def close(self):
-        """Close the game environment."""
-        pygame.quit()
+        """Close the game environment, and write what its recorder holds (the recorder may be shared: it stays open)."""
+        if self.recorder is not None:
+            self.recorder.flush()
+        if self.window_open:
+            pygame.quit()
     
     def save_logs(self):
         """Save logs in a folder with a unique identifier."""
@@ -167,7 +322,7 @@ class EnvCheckers(gym.Env):
             "total_reward": self.total_reward,
             "step_rewards": self.step_rewards,
             "round": self.round,
-            "winner": "RED" if self.turn == RED else "BLUE"
+            "winner": "BLUE" if self.turn == RED else "RED"
         }
         # Generate a unique file name using UUID
         log_filename = str(uuid.uuid4()) + ".json"
@@ -179,7 +334,8 @@ class EnvCheckers(gym.Env):
         with open(log_filepath, 'w') as log_file:
             json.dump(log_data, log_file, indent=4)
         
-        print(f"Logs saved to {log_filepath}")
+        if self.verbose >= 1:
+            print(f"Logs saved to {log_filepath}")
 
 def main():
     env = EnvCheckers()
@@ -187,16 +343,44 @@ def main():
     done = False
     while not done:
         env.render()
-        action = env.action_space.sample()
-        print("action", action)
+        action = env.action_space.sample(mask=env.action_masks().astype(np.int8))
         obs, reward, done, info = env.step(action)
-        print("obs: ", obs)
-        print("reward: ", reward)
-        print("done: ", done)
-        print("info: ", info)
+        if env.verbose >= 2:
+            print("action", action)
+            print("obs: ", obs)
+            print("reward: ", reward)
+            print("done: ", done)
+            print("info: ", info)
 
     # Save logs at the end of the game
     env.save_logs()
 
+def check_masked_games(num_games=300, max_steps=2000, seed=0):
+    """
+    Play num_games games of random legal actions and assert that the action mask is never empty while the game goes on.
+    Returns the number of games that ended within max_steps.
+    """
+    rng = np.random.default_rng(seed)
+    env = EnvCheckers(headless=True, verbose=0)
+    finished = 0
+    for game in range(num_games):
+        env.reset()
+        mask = env.action_masks()
+        for i in range(max_steps):
+            obs, reward, done, info = env.step(rng.choice(np.flatnonzero(mask)))
+            mask = info["action_mask"]
+            assert done or mask.any(), (game, i)
+            assert not done or not mask.any(), (game, i)
+            if done:
+                finished += 1
+                break
+    return finished
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Play a random game of EnvCheckers")
+    parser.add_argument("--check", action="store_true", help="check the action masks against done on random games instead")
+    args = parser.parse_args()
+    if args.check:
+        print(f"{check_masked_games()} of 300 random games finished, every empty action mask came with done=True")
+    else:
+        main()
\ No newline at end of file
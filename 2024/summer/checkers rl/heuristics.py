@@ -0,0 +1,455 @@
+import numpy as np
+
+# American checkers: wikipedia.org/wiki/English_draughts
+# on a 8x8 checkerboard, both players start with 12 men
+# Black plays the first move
+# all pieces can only move and capture diagonally
+# men can only move/capture diagonally forward
+# kings can move/capture in any diagonal direction
+# if a man reaches the other side of the board, the turn ends and it becomes a king
+# captures are made by moving any piece diagonally over an opponent's
+# if a capture can be made, it must be taken
+# mutliple captures can be made in a single turn and with a single piece
+# the game ends when a players captures all the opponent's pieces
+# a player also whens when the opponent can not make a legal move
+
+# number of opponent pieces captured (max = 12)
+def num_captured(board):
+    return 12 - np.sum(board < 0)
+
+# number of possible captures, helper function to calculate possible number of moves
+def num_branches(board, x, y):
+    count = 0
+    if (board[x, y] >= 1 and x < 6):
+        if (y < 6):
+            if (board[x+1, y+1] < 0 and board[x+2, y+2] == 0):
+                board[x+2, y+2] = board[x, y]
+                board[x, y] = 0
+                temp = board[x+1, y+1]
+                board[x+1, y+1] = 0
+                count += num_branches(board, x+2, y+2) + 1
+                board[x+1, y+1] = temp
+                board[x, y] = board[x+2, y+2]
+                board[x+2, y+2] = 0
+        if (y > 1):
+            if (board[x+1, y-1] < 0 and board[x+2, y-2] == 0):
+                board[x+2, y-2] = board[x, y]
+                board[x, y] = 0
+                temp = board[x+1, y-1]
+                board[x+1, y-1] = 0
+                count += num_branches(board, x+2, y-2) + 1
+                board[x+1, y-1] = temp
+                board[x, y] = board[x+2, y-2]
+                board[x+2, y-2] = 0
+    if (board[x, y] == 3 and x > 0):
+        if (y < 6):
+            if (board[x-1, y+1] < 0 and board[x-2, y+2] == 0):
+                board[x-2, y+2] = board[x, y]
+                board[x, y] = 0
+                temp = board[x-1, y+1]
+                board[x-1, y+1] = 0
+                count += num_branches(board, x-2, y+2) + 1
+                board[x-1, y+1] = temp
+                board[x, y] = board[x-2, y+2]
+                board[x-2, y+2] = 0
+        if (y > 1):
+            if (board[x-1, y-1] < 0 and board[x-2, y-2] == 0):
+                board[x-2, y-2] = board[x, y]
+                board[x, y] = 0
+                temp = board[x-1, y-1]
+                board[x-1, y-1] = 0
+                count += num_branches(board, x-2, y-2) + 1
+                board[x-1, y-1] = temp
+                board[x, y] = board[x-2, y-2]
+                board[x-2, y-2] = 0
+    return count
+
+# number of possible moves (lowest = 0)
+def possible_moves(board):
+    count = 0
+    for i in range(0, 8):
+        for j in range(0, 8):
+            if (board[i, j] > 0):
+                count += num_branches(board, i, j)
+    if (count > 0):
+        return count
+    for i in range(0, 8):
+        for j in range(0, 8):
+            if (board[i, j] >= 1 and i < 7):
+                if (j < 7):
+                    count += (board[i+1, j+1] == 0)
+                if (j > 0):
+                    count += (board[i+1, j-1] == 0)
+            if (board[i, j] == 3 and i > 0):
+                if (j < 7):
+                    count += (board[i-1, j+1] == 0)
+                elif (j > 0):
+                    count += (board[i-1, j-1] == 0)
+    return count
+
+# returns {White = -1, N/A = 0, Black = 1}
+def game_winner(board):
+    if (np.sum(board < 0) == 0):
+        return 1
+    elif (np.sum(board > 0) == 0):
+        return -1
+    if (possible_moves(board) == 0):
+        return -1
+    elif (possible_moves(reverse(board)) == 0):
+        return 1
+    else:
+        return 0
+
+# counts the number of your pieces in enemy rows
+def at_enemy(board):
+    count = 0
+    for i in range(5, 8):
+        count += np.sum(board[i] == 1) + np.sum(board[i] == 3)
+    return count
+
+# counts the number of your pieces in neutral rows
+def at_middle(board):
+    count = 0
+    for i in range(3, 5):
+        count += np.sum(board[i] == 1) + np.sum(board[i] == 3)
+    return count
+
+# counts the number of Men pieces you have
+def num_men(board):
+    return np.sum(board == 1)
+
+# counts the number of King pieces you have
+def num_kings(board):
+    return np.sum(board == 3)
+
+# counts the number of stranded opponent pieces
+def capturables(board):
+    count = 0
+    for i in range(1, 7):
+        for j in range(1, 7):
+            if (board[i, j] < 0):
+                count += (board[i+1, j+1] >= 0 and board[i+1, j-1] >= 0 and  board[i-1, j+1] >= 0 and board[i-1, j-1] >= 0)
+    return count
+
+# number of your pieces with at least one adjacent support
+def semicapturables(board):
+    return (12 - uncapturables(board) - capturables(reverse(board)))
+
+# number of your pieces that can't be captured next turn
+def uncapturables(board): 
+    count = 0
+    for i in range(1, 7):
+        for j in range(1, 7):
+            if (board[i, j] > 0):
+                count += ((board[i+1, j+1] > 0 < board[i+1, j-1]) or (board[i-1, j+1] > 0 < board[i-1, j-1]) or (board[i+1, j+1] > 0 < board[i-1, j+1]) or (board[i+1, j-1] > 0 < board[i-1, j-1]))
+    count += np.sum(board[0] == 1) + np.sum(board[0] == 3) + np.sum(board[1:7, 0] == 1) + np.sum(board[1:7, 0] == 3) + np.sum(board[7] == 1) + np.sum(board[7] == 3) + np.sum(board[1:7, 7] == 1) + np.sum(board[1:7, 7] == 3)
+    return count
+
+# helper function, reverses the board, used for generating game states
+def reverse(board):
+    b = -board
+    b = np.fliplr(b)
+    b = np.flipud(b)
+    return b
+
+ # returns [label, 10 labeling metrics]
+def get_metrics(board):
+    b = expand(board)
+
+    capped = num_captured(b) # number of enemy pieces captured
+    potential = possible_moves(b) - possible_moves(reverse(b)) # number of potential moves
+    men = num_men(b) - num_men(-b) # number of Men pieces
+    kings = num_kings(b) - num_kings(-b) # number of King pieces
+    caps = capturables(b) - capturables(reverse(b)) # number of stranded enemies
+    semicaps = semicapturables(b) # number of supported pieces (yours)
+    uncaps = uncapturables(b) - uncapturables(reverse(b)) # number of immune pieces (yours)
+    mid = at_middle(b) - at_middle(-b) # number of your pieces in middle rows
+    far = at_enemy(b) - at_enemy(reverse(b)) # number of your pieces in enemy rows
+    won = game_winner(b) # game's winner or 0, if not yet finished
+
+    score = 2*capped + potential + 2*men + 4*kings + caps + 2*semicaps + 3*uncaps + 2*mid + far + 100*won
+
+    # return the sign of the sum of all metrics as label. Treat 0 (neutral) as 1 (positive)
+    if (score < 0):
+        return np.array([0, capped, potential, men, kings, caps, semicaps, uncaps, mid, far, won])
+    else:
+        return np.array([1, capped, potential, men, kings, caps, semicaps, uncaps, mid, far, won])
+
+# batched get_metrics(): the same 11 columns for (N, 32) compressed boards, computed with array operations
+METRICS_CHUNK = 65536
+
+def expand_batch(boards):
+    b = np.zeros((len(boards), 8, 8), dtype='b')
+    b[:, DARK_ROWS, DARK_COLS] = boards
+    return b
+
+def reverse_batch(b):
+    return -b[:, ::-1, ::-1]
+
+# capture moves of the pieces on rows x (-1..7, -1 being the row 7 reached by wrapping around like num_branches()
+# does) and columns y of boards[k]: one (valid, landing row, landing column, captured row, captured column) per direction
+def jumps_batch(boards, k, x, y):
+    value = boards[k, x % 8, y]
+    jumps = []
+    for dx, dy in ((1, 1), (1, -1), (-1, 1), (-1, -1)):
+        if (dx == 1):
+            valid = (value >= 1) & (x < 6)
+        else:
+            valid = (value == 3) & (x > 0)
+        valid &= (y < 6) if dy == 1 else (y > 1)
+        over_x, land_x = (x + dx) % 8, (x + 2 * dx) % 8
+        over_y, land_y = np.clip(y + dy, 0, 7), np.clip(y + 2 * dy, 0, 7)
+        valid &= (boards[k, over_x, over_y] < 0) & (boards[k, land_x, land_y] == 0)
+        jumps.append((valid, x + 2 * dx, land_y, over_x, over_y))
+    return jumps
+
+# number of nodes of every capture tree, like summing num_branches() over all your pieces.
+# The trees are walked one level at a time; every node owns a copy of its board.
+def num_branches_batch(b):
+    counts = np.zeros(len(b), dtype=np.int64)
+    owner, x, y = np.nonzero(b > 0)
+    boards, k = b, owner
+    while (len(owner) > 0):
+        next_boards, next_owner, next_x, next_y = [], [], [], []
+        for valid, land_x, land_y, over_x, over_y in jumps_batch(boards, k, x, y):
+            parent = np.flatnonzero(valid)
+            if (len(parent) == 0):
+                continue
+            child = boards[k[parent]]
+            i = np.arange(len(parent))
+            child[i, land_x[parent] % 8, land_y[parent]] = child[i, x[parent] % 8, y[parent]]
+            child[i, x[parent] % 8, y[parent]] = 0
+            child[i, over_x[parent], over_y[parent]] = 0
+            np.add.at(counts, owner[parent], 1)
+            next_boards.append(child)
+            next_owner.append(owner[parent])
+            next_x.append(land_x[parent])
+            next_y.append(land_y[parent])
+        if (not next_owner):
+            break
+        boards = np.concatenate(next_boards)
+        owner = np.concatenate(next_owner)
+        x = np.concatenate(next_x)
+        y = np.concatenate(next_y)
+        k = np.arange(len(owner))
+    return counts
+
+def possible_moves_batch(b):
+    captures = num_branches_batch(b)
+    men = b >= 1
+    kings = b == 3
+    steps = np.sum(men[:, :7, :7] & (b[:, 1:, 1:] == 0), axis=(1, 2))
+    steps += np.sum(men[:, :7, 1:] & (b[:, 1:, :7] == 0), axis=(1, 2))
+    steps += np.sum(kings[:, 1:, :7] & (b[:, :7, 1:] == 0), axis=(1, 2))
+    steps += np.sum(kings[:, 1:, 7] & (b[:, :7, 6] == 0), axis=1) # possible_moves() only looks left on the last column
+    return np.where(captures > 0, captures, steps)
+
+def count_batch(b, values, rows=slice(None)):
+    return np.sum(np.isin(b[:, rows], values), axis=(1, 2))
+
+def capturables_batch(b):
+    inner = b[:, 1:7, 1:7] < 0
+    inner &= (b[:, 2:8, 2:8] >= 0) & (b[:, 2:8, 0:6] >= 0) & (b[:, 0:6, 2:8] >= 0) & (b[:, 0:6, 0:6] >= 0)
+    return np.sum(inner, axis=(1, 2))
+
+def uncapturables_batch(b):
+    se, sw = b[:, 2:8, 2:8] > 0, b[:, 2:8, 0:6] > 0
+    ne, nw = b[:, 0:6, 2:8] > 0, b[:, 0:6, 0:6] > 0
+    inner = (b[:, 1:7, 1:7] > 0) & ((se & sw) | (ne & nw) | (se & ne) | (sw & nw))
+    own = np.isin(b, (1, 3))
+    edges = np.sum(own[:, 0], axis=1) + np.sum(own[:, 1:7, 0], axis=1) + np.sum(own[:, 7], axis=1) + np.sum(own[:, 1:7, 7], axis=1)
+    return np.sum(inner, axis=(1, 2)) + edges
+
+def get_metrics_batch(boards):
+    boards = np.asarray(boards)
+    metrics = np.zeros((len(boards), 11), dtype=np.int64)
+    for start in range(0, len(boards), METRICS_CHUNK):
+        b = expand_batch(boards[start:start + METRICS_CHUNK])
+        r = reverse_batch(b)
+        moves, moves_r = possible_moves_batch(b), possible_moves_batch(r)
+        caps_r = capturables_batch(r)
+
+        capped = 12 - np.sum(b < 0, axis=(1, 2))
+        potential = moves - moves_r
+        men = count_batch(b, 1) - count_batch(b, -1)
+        kings = count_batch(b, 3) - count_batch(b, -3)
+        caps = capturables_batch(b) - caps_r
+        semicaps = 12 - uncapturables_batch(b) - caps_r
+        uncaps = uncapturables_batch(b) - uncapturables_batch(r)
+        mid = count_batch(b, (1, 3), slice(3, 5)) - count_batch(b, (-1, -3), slice(3, 5))
+        far = count_batch(b, (1, 3), slice(5, 8)) - count_batch(r, (1, 3), slice(5, 8))
+        won = np.select([np.sum(b < 0, axis=(1, 2)) == 0, np.sum(b > 0, axis=(1, 2)) == 0, moves == 0, moves_r == 0], [1, -1, -1, 1], 0)
+
+        score = 2*capped + potential + 2*men + 4*kings + caps + 2*semicaps + 3*uncaps + 2*mid + far + 100*won
+        metrics[start:start + len(b)] = np.stack([score >= 0, capped, potential, men, kings, caps, semicaps, uncaps, mid, far, won], axis=1)
+    return metrics
+
+def np_board():
+    return np.array(get_board())
+
+def get_board():
+    return [1, 1, 1, 1,  1, 1, 1, 1,  1, 1, 1, 1,  0, 0, 0, 0,  0, 0, 0, 0,  -1, -1, -1, -1,  -1, -1, -1, -1,  -1, -1, -1, -1]
+
+def expand(board):
+    b = np.zeros((8, 8), dtype='b')
+    for i in range(0, 8):
+        if (i%2 == 0):
+            b[i] = np.array([0, board[i*4], 0, board[i*4 + 1], 0, board[i*4 + 2], 0, board[i*4 + 3]])
+        else:
+            b[i] = np.array([board[i*4], 0, board[i*4 + 1], 0, board[i*4 + 2], 0, board[i*4 + 3], 0])
+    return b
+
+def compress(board):
+    b = np.zeros((1,32), dtype='b')
+    for i in range(0, 8):
+        if (i%2 == 0):
+            b[0, i*4 : i*4+4] = np.array([board[i, 1], board[i, 3], board[i, 5], board[i, 7]])
+        else:
+            b[0, i*4 : i*4+4] = np.array([board[i, 0], board[i, 2], board[i, 4], board[i, 6]])
+    return b
+
+# upper bound on the number of successor boards of one position (partial multi-captures included)
+MAX_MOVES = 256
+
+# (row, column) of the 32 dark squares, in the order used by compress()
+DARK_ROWS = np.repeat(np.arange(8), 4)
+DARK_COLS = np.array([1, 3, 5, 7, 0, 2, 4, 6] * 4)
+
+# writes the expanded 8x8 board into out (8x8), without allocating
+def expand_into(board, out):
+    out[DARK_ROWS, DARK_COLS] = board
+    return out
+
+# helper function to generate possible game states
+# writes every board reachable by capturing with the piece on (x, y) into out[count:], returns the new count
+def generate_branches_into(board, x, y, out, count):
+    if (board[x, y] >= 1 and x < 6):
+        temp_1 = board[x, y]
+        if (y < 6):
+            if (board[x+1, y+1] < 0 and board[x+2, y+2] == 0):
+                board[x+2, y+2] = board[x, y]
+                if (x+2 == 7):
+                    board[x+2, y+2] = 3
+                board[x, y] = 0
+                temp = board[x+1, y+1]
+                board[x+1, y+1] = 0
+                out[count] = board[DARK_ROWS, DARK_COLS]
+                count = generate_branches_into(board, x+2, y+2, out, count + 1)
+                board[x+1, y+1] = temp
+                board[x, y] = temp_1
+                board[x+2, y+2] = 0
+        if (y > 1):
+            if (board[x+1, y-1] < 0 and board[x+2, y-2] == 0):
+                board[x+2, y-2] = board[x, y]
+                if (x+2 == 7):
+                    board[x+2, y-2] = 3
+                board[x, y] = 0
+                temp = board[x+1, y-1]
+                board[x+1, y-1] = 0
+                out[count] = board[DARK_ROWS, DARK_COLS]
+                count = generate_branches_into(board, x+2, y-2, out, count + 1)
+                board[x+1, y-1] = temp
+                board[x, y] = temp_1
+                board[x+2, y-2] = 0
+    if (board[x, y] == 3 and x > 0):
+        if (y < 6):
+            if (board[x-1, y+1] < 0 and board[x-2, y+2] == 0):
+                board[x-2, y+2] = board[x, y]
+                board[x, y] = 0
+                temp = board[x-1, y+1]
+                board[x-1, y+1] = 0
+                out[count] = board[DARK_ROWS, DARK_COLS]
+                count = generate_branches_into(board, x-2, y+2, out, count + 1)
+                board[x-1, y+1] = temp
+                board[x, y] = board[x-2, y+2]
+                board[x-2, y+2] = 0
+        if (y > 1):
+            if (board[x-1, y-1] < 0 and board[x-2, y-2] == 0):
+                board[x-2, y-2] = board[x, y]
+                board[x, y] = 0
+                temp = board[x-1, y-1]
+                board[x-1, y-1] = 0
+                out[count] = board[DARK_ROWS, DARK_COLS]
+                count = generate_branches_into(board, x-2, y-2, out, count + 1)
+                board[x-1, y-1] = temp
+                board[x, y] = board[x-2, y-2]
+                board[x-2, y-2] = 0
+    return count
+
+# returns the board itself followed by every board reachable by capturing with the piece on (x, y)
+def generate_branches(board, x, y):
+    bb = np.zeros((MAX_MOVES, 32), dtype='b')
+    bb[0] = board[DARK_ROWS, DARK_COLS]
+    return bb[:generate_branches_into(board, x, y, bb, 1)].copy()
+
+# writes the next immediately possible game states into out (a (MAX_MOVES, 32) buffer), returns how many there are
+def generate_next_into(board, out):
+    count = 0
+    rows, cols = np.nonzero(board > 0) # own pieces, in the same row by row order as a full scan
+    pieces = list(zip(rows.tolist(), cols.tolist()))
+    for i, j in pieces:
+        count = generate_branches_into(board, i, j, out, count)
+    if (count > 0):
+        return count
+    for i, j in pieces:
+        if (board[i, j] >= 1 and i < 7):
+            temp = board[i, j]
+            if (j < 7):
+                if (board[i+1, j+1] == 0):
+                    board[i+1, j+1] = board[i, j]
+                    if (i+1 == 7):
+                        board[i+1, j+1] = 3
+                    board[i, j] = 0
+                    out[count] = board[DARK_ROWS, DARK_COLS]
+                    count += 1
+                    board[i, j] = temp
+                    board[i+1, j+1] = 0
+            if (j > 0):
+                if (board[i+1, j-1] == 0):
+                    board[i+1, j-1] = board[i, j]
+                    if (i+1 == 7):
+                        board[i+1, j-1] = 3
+                    board[i, j] = 0
+                    out[count] = board[DARK_ROWS, DARK_COLS]
+                    count += 1
+                    board[i, j] = temp
+                    board[i+1, j-1] = 0
+        if (board[i, j] == 3 and i > 0):
+            if (j < 7):
+                if (board[i-1, j+1] == 0):
+                    board[i-1, j+1] = board[i, j]
+                    board[i, j] = 0
+                    out[count] = board[DARK_ROWS, DARK_COLS]
+                    count += 1
+                    board[i, j] = board[i-1, j+1]
+                    board[i-1, j+1] = 0
+            elif (j > 0):
+                if (board[i-1, j-1] == 0):
+                    board[i-1, j-1] = board[i, j]
+                    board[i, j] = 0
+                    out[count] = board[DARK_ROWS, DARK_COLS]
+                    count += 1
+                    board[i, j] = board[i-1, j-1]
+                    board[i-1, j-1] = 0
+    return count
+
+# generates next immediately possible game states
+def generate_next(board):
+    bb = np.zeros((MAX_MOVES, 32), dtype='b')
+    return bb[:generate_next_into(board, bb)].copy()
+
+# expands many compressed (M, 32) boards at once: the successors of boards[p] are written to out
+# with parents set to p, and the total count is returned. Reverse the boards first (-boards[:, ::-1])
+# to generate the opponent's moves.
+def generate_next_batch(boards, out, parents, scratch=None):
+    if (scratch is None):
+        scratch = np.zeros((8, 8), dtype='b')
+    count = 0
+    for p in range(len(boards)):
+        if (len(out) - count < MAX_MOVES):
+            raise ValueError(f"output buffer full after {p} of {len(boards)} boards")
+        expand_into(boards[p], scratch)
+        n = generate_next_into(scratch, out[count:])
+        parents[count:count + n] = p
+        count += n
+    return count
@@ -0,0 +1,18 @@
+import sys
+import importlib.util
+
+# keras and pygame take seconds and hundreds of MB to import, which every env worker process
+# used to pay before its first step. lazy_import() returns the module right away and only
+# runs its code the first time one of its attributes is used.
+def lazy_import(name):
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    return module
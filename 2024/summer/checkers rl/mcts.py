@@ -0,0 +1,307 @@
+import os
+import time
+import argparse
+import numpy as np
+from heuristics import np_board
+from transposition import PositionCache
+from search import metrics_evaluator, load_disc_model
+from numpy_model import load_evaluator
+from endgame import EndgameTable
+
+# PUCT Monte Carlo tree search over the heuristics.py rules, for self-play.
+#
+# The tree lives in flat arrays indexed by node, and the children of a node are stored next to each
+# other, so selection scores all the children of a node with one NumPy expression. A node holds the
+# board as generate_next() returns it: seen by the player who just moved into it, whose pieces are
+# positive. Its visits and value sum are from that player's point of view too, which is what the
+# parent maximises when it selects a child.
+#
+# A search step selects up to batch_size leaves, adding a virtual loss along every path so that the
+# next selections spread over the tree. The children of all the selected leaves are then evaluated
+# with a single call to the evaluator (the disc model or any callable over (N, 32) boards, as in
+# search.py). Their values give the priors of the new children (softmax) and the value of the leaf
+# itself (minus the best child, since the opponent moves next), or its exact value when an
+# endgame.EndgameTable has it. A selection that reaches a leaf already picked for the batch is a
+# collision: it is dropped and does not count as a simulation.
+
+class MCTS:
+    """
+    PUCT search with batched leaf evaluation, virtual loss and tree reuse between moves.
+    evaluate(boards) returns, for (N, 32) boards, a score for the player whose pieces are positive;
+    scores are squashed to [-1, 1] with tanh(score / value_scale).
+    """
+
+    def __init__(self, evaluate=metrics_evaluator, c_puct=1.5, batch_size=32, value_scale=1.0,
+                 prior_temperature=1.0, virtual_loss=1.0, capacity=1 << 16, cache_size=1 << 18, endgame=None):
+        self.evaluate = evaluate
+        self.endgame = endgame
+        self.c_puct = c_puct
+        self.batch_size = batch_size
+        self.value_scale = value_scale
+        self.prior_temperature = prior_temperature
+        self.virtual_loss = virtual_loss
+        self.cache = PositionCache(cache_size)
+        self._allocate_arrays(capacity)
+        self.set_root(np_board())
+
+    def _allocate_arrays(self, capacity):
+        self.capacity = capacity
+        self.boards = np.zeros((capacity, 32), dtype=np.int8)
+        self.parent = np.full(capacity, -1, dtype=np.int32)
+        self.first_child = np.full(capacity, -1, dtype=np.int32)
+        self.num_children = np.zeros(capacity, dtype=np.int32)
+        self.expanded = np.zeros(capacity, dtype=bool)
+        self.prior = np.zeros(capacity, dtype=np.float32)
+        self.visits = np.zeros(capacity, dtype=np.float32)
+        self.value_sum = np.zeros(capacity, dtype=np.float32)
+        self.size = 0
+
+    def _grow(self, needed):
+        """Make room for needed more nodes, doubling the arrays."""
+        capacity = self.capacity
+        while self.size + needed > capacity:
+            capacity *= 2
+        if capacity != self.capacity:
+            for name in ("boards", "parent", "first_child", "num_children", "expanded", "prior", "visits", "value_sum"):
+                old = getattr(self, name)
+                new = np.zeros((capacity,) + old.shape[1:], dtype=old.dtype)
+                new[:self.size] = old[:self.size]
+                setattr(self, name, new)
+            self.parent[self.size:] = -1
+            self.first_child[self.size:] = -1
+            self.capacity = capacity
+
+    def _new_nodes(self, boards, parent):
+        """Append the children of parent and return the index of the first one."""
+        self._grow(len(boards))
+        first = self.size
+        last = first + len(boards)
+        self.boards[first:last] = boards
+        self.parent[first:last] = parent
+        self.first_child[first:last] = -1
+        self.num_children[first:last] = 0
+        self.expanded[first:last] = False
+        self.prior[first:last] = 0
+        self.visits[first:last] = 0
+        self.value_sum[first:last] = 0
+        self.size = last
+        return first
+
+    def set_root(self, board):
+        """Start a new tree from a compressed board seen by the player to move."""
+        self.size = 0
+        self.root = self._new_nodes(-np.asarray(board, dtype=np.int8)[None, ::-1], -1)
+
+    def root_board(self):
+        """The compressed board of the root, seen by the player to move."""
+        return -self.boards[self.root][::-1]
+
+    def children(self, node=None):
+        """Return the indices of the children of node (the root by default)."""
+        node = self.root if node is None else node
+        first = self.first_child[node]
+        return np.arange(first, first + self.num_children[node]) if self.expanded[node] else np.arange(0)
+
+    def _select(self):
+        """Walk from the root to a leaf by PUCT and return the path of node indices."""
+        node = self.root
+        path = [node]
+        while self.expanded[node] and self.num_children[node] > 0:
+            first = self.first_child[node]
+            last = first + self.num_children[node]
+            visits = self.visits[first:last]
+            q = np.where(visits > 0, self.value_sum[first:last] / np.maximum(visits, 1), 0)
+            u = self.c_puct * self.prior[first:last] * np.sqrt(max(self.visits[node], 1)) / (1 + visits)
+            node = first + int(np.argmax(q + u))
+            path.append(node)
+        return path
+
+    def _add_virtual_loss(self, path, sign):
+        self.visits[path] += sign * self.virtual_loss
+        self.value_sum[path] -= sign * self.virtual_loss
+
+    def _backup(self, path, value):
+        """Add value, seen by the player who moved into the last node of path, to every node of path."""
+        values = np.where(np.arange(len(path)) % 2 == (len(path) - 1) % 2, value, -value)
+        self.visits[path] += 1
+        self.value_sum[path] += values
+
+    def search(self, num_simulations):
+        """Run num_simulations simulations from the root and return statistics about them."""
+        start = time.perf_counter()
+        evaluations = batches = collisions = 0
+        done = 0
+        while done < num_simulations:
+            pending = {} # leaf -> path that reached it
+            terminal = []
+            for i in range(min(self.batch_size, num_simulations - done)):
+                path = self._select()
+                self._add_virtual_loss(path, 1)
+                leaf = path[-1]
+                if self.expanded[leaf]:
+                    terminal.append(path) # no move left: the player who moved into the leaf won
+                elif leaf in pending:
+                    # already being evaluated for this batch: dropped rather than counted twice
+                    self._add_virtual_loss(path, -1)
+                    collisions += 1
+                else:
+                    pending[leaf] = path
+
+            leaves = list(pending)
+            children = [self.cache.next_boards(-self.boards[leaf][::-1]) for leaf in leaves]
+            counts = [len(boards) for boards in children]
+            if sum(counts) > 0:
+                values = np.tanh(self.cache.evaluate(np.concatenate([boards for boards in children if len(boards)]), self.evaluate) / self.value_scale)
+                evaluations += len(values)
+                batches += 1
+            exact = np.full(len(leaves), 2)
+            if self.endgame is not None and leaves:
+                exact, plies = self.endgame.probe_batch(-self.boards[leaves][:, ::-1])
+            offset = 0
+            for leaf, boards, count, result in zip(leaves, children, counts, exact):
+                self.expanded[leaf] = True
+                self.num_children[leaf] = count
+                if count == 0:
+                    value = 1.0
+                else:
+                    child_values = values[offset:offset + count]
+                    offset += count
+                    logits = child_values / self.prior_temperature
+                    priors = np.exp(logits - logits.max())
+                    self.first_child[leaf] = self._new_nodes(boards, leaf)
+                    self.prior[self.first_child[leaf]:self.first_child[leaf] + count] = priors / priors.sum()
+                    value = -float(child_values.max())
+                if result != 2:
+                    value = -float(result)
+                self._add_virtual_loss(pending[leaf], -1)
+                self._backup(pending[leaf], value)
+            for path in terminal:
+                self._add_virtual_loss(path, -1)
+                self._backup(path, 1.0)
+            done += len(terminal) + len(pending)
+
+        elapsed = time.perf_counter() - start
+        return {"simulations": done, "seconds": elapsed, "simulations_per_sec": done / elapsed if elapsed > 0 else 0.0,
+                "evaluations": evaluations, "batches": batches, "collisions": collisions, "nodes": self.size}
+
+    def policy(self, temperature=1.0):
+        """
+        Return the children of the root (boards as played) and the probabilities of playing them,
+        both empty when the root has no legal move.
+        """
+        children = self.children()
+        if len(children) == 0:
+            return self.boards[children], np.zeros(0)
+        visits = self.visits[children].astype(np.float64)
+        if temperature == 0:
+            probabilities = (visits == visits.max()).astype(np.float64)
+        else:
+            probabilities = visits ** (1 / temperature)
+        return self.boards[children], probabilities / probabilities.sum()
+
+    def advance(self, child):
+        """
+        Make the child-th child of the root the new root, keeping its subtree and the statistics in it.
+        Returns the number of nodes kept.
+        """
+        old_root = self.children()[child]
+        old = {name: getattr(self, name) for name in ("boards", "first_child", "num_children", "expanded", "prior", "visits", "value_sum")}
+        self._allocate_arrays(self.capacity)
+
+        # breadth first, so every block of children is copied as a block
+        self.root = self._new_nodes(old["boards"][old_root][None], -1)
+        for name in ("expanded", "prior", "visits", "value_sum"):
+            getattr(self, name)[self.root] = old[name][old_root]
+        queue = [(old_root, self.root)]
+        for old_node, node in queue:
+            count = old["num_children"][old_node]
+            self.num_children[node] = count
+            if old["expanded"][old_node] and count > 0:
+                first = old["first_child"][old_node]
+                block = slice(first, first + count)
+                new_first = self._new_nodes(old["boards"][block], node)
+                new_block = slice(new_first, new_first + count)
+                for name in ("expanded", "prior", "visits", "value_sum"):
+                    getattr(self, name)[new_block] = old[name][block]
+                self.first_child[node] = new_first
+                queue.extend(zip(range(first, first + count), range(new_first, new_first + count)))
+        return self.size
+
+def self_play_game(mcts, simulations=200, temperature_moves=10, max_moves=200, reuse=True, rng=None):
+    """
+    Play one game of mcts against itself from the initial position.
+    Returns the boards seen by the player to move, shape (N, 32), and the result of every one of them
+    for that player: 1 won, -1 lost, 0 drawn or unfinished after max_moves. With an endgame table,
+    the game stops at the first position the table has.
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    mcts.set_root(np_board())
+    boards = []
+    winner = None # parity of the moves of the winner
+    for move in range(max_moves):
+        if mcts.endgame is not None:
+            found = mcts.endgame.probe(mcts.root_board())
+            if found is not None:
+                winner = None if found[0] == 0 else (move + (found[0] < 0)) % 2
+                break
+        mcts.search(simulations)
+        children, probabilities = mcts.policy(1.0 if move < temperature_moves else 0)
+        if len(children) == 0:
+            winner = (move + 1) % 2 # the player to move has lost
+            break
+        boards.append(mcts.root_board())
+        child = rng.choice(len(children), p=probabilities)
+        if reuse:
+            mcts.advance(child)
+        else:
+            mcts.set_root(-children[child][::-1])
+    results = np.zeros(len(boards), dtype=np.int8)
+    if winner is not None:
+        results[:] = np.where(np.arange(len(boards)) % 2 == winner, 1, -1)
+    return np.array(boards, dtype=np.int8).reshape(-1, 32), results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MCTS simulations/sec, tree reuse and self-play benchmark")
+    parser.add_argument("--simulations", type=int, default=800)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--moves", type=int, default=10, help="moves played for the tree reuse benchmark")
+    args = parser.parse_args()
+
+    if os.path.exists("disc.npz"):
+        evaluate, scale, name = load_evaluator("disc.npz"), 1.0, "disc model (NumPy, disc.npz)"
+    elif os.path.exists("disc.json") and os.path.exists("disc.h5"):
+        evaluate, scale, name = load_disc_model(), 1.0, "disc model (keras)"
+    else:
+        evaluate, scale, name = metrics_evaluator, 10.0, "get_metrics score (disc.json/disc.h5 not found)"
+    print(f"evaluator: {name}")
+    endgame = EndgameTable("endgame.npy") if os.path.exists("endgame.npy") else None
+
+    for batch_size in args.batch_sizes:
+        mcts = MCTS(evaluate, batch_size=batch_size, value_scale=scale)
+        stats = mcts.search(args.simulations)
+        print(f"batch {batch_size:4d}: {stats['simulations_per_sec']:8,.0f} simulations/sec, {stats['batches']:4d} evaluator calls, "
+              f"{stats['collisions']:4d} collisions, {stats['nodes']:6d} nodes")
+
+    for reuse in (False, True):
+        mcts = MCTS(evaluate, value_scale=scale)
+        rng = np.random.default_rng(0)
+        kept, simulations, seconds = 0, 0, 0.0
+        for move in range(args.moves):
+            stats = mcts.search(args.simulations - int(mcts.visits[mcts.root]) if reuse else args.simulations)
+            simulations += stats["simulations"]
+            seconds += stats["seconds"]
+            children, probabilities = mcts.policy(0)
+            if len(children) == 0:
+                break
+            child = int(np.argmax(probabilities))
+            if reuse:
+                kept += mcts.visits[mcts.children()[child]]
+                mcts.advance(child)
+            else:
+                mcts.set_root(-children[child][::-1])
+        print(f"reuse={reuse!s:5}: {simulations / seconds:8,.0f} simulations/sec, {simulations} simulations for "
+              f"{args.moves} moves of {args.simulations} visits, {kept / args.moves:.0f} visits kept per move")
+
+    start = time.perf_counter()
+    boards, results = self_play_game(MCTS(evaluate, value_scale=scale, endgame=endgame), simulations=100, max_moves=60, rng=np.random.default_rng(0))
+    print(f"self-play: {len(boards)} positions in {time.perf_counter() - start:.1f}s (100 simulations per move)")
@@ -0,0 +1,97 @@
+import time
+import argparse
+import numpy as np
+
+# The gen (10 -> 32 -> 16 -> 1) and disc (32 -> 64 -> 32 -> 16 -> 8 -> 1) models of train.py are small
+# Dense stacks, so their inference is a handful of matrix products. export_model() turns the keras
+# json/weights pair into a .npz of kernels, biases and activation names, and NumpyMLP runs it with
+# NumPy only: no keras or TensorFlow import, no per-call predict overhead.
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0),
+    "sigmoid": lambda x: 1 / (1 + np.exp(-x)),
+    "tanh": np.tanh,
+}
+
+def export_model(json_path, weights_path, npz_path):
+    """Write the Dense layers of a keras model saved as json + weights to npz_path."""
+    from keras.models import model_from_json
+
+    with open(json_path) as json_file:
+        model = model_from_json(json_file.read())
+    model.load_weights(weights_path)
+
+    arrays = {}
+    activations = []
+    for layer in model.layers:
+        if layer.__class__.__name__ != "Dense":
+            raise ValueError(f"layer {layer.name} ({layer.__class__.__name__}) is not a Dense layer")
+        activation = layer.get_config()["activation"]
+        if activation not in ACTIVATIONS:
+            raise ValueError(f"layer {layer.name} uses the unsupported activation {activation!r}")
+        kernel, bias = layer.get_weights()
+        arrays[f"kernel_{len(activations)}"] = kernel.astype(np.float32)
+        arrays[f"bias_{len(activations)}"] = bias.astype(np.float32)
+        activations.append(activation)
+    np.savez(npz_path, activations=np.array(activations), **arrays)
+    return model
+
+class NumpyMLP:
+    """A Dense stack exported by export_model(), evaluated with NumPy in float32 like keras."""
+
+    def __init__(self, kernels, biases, activations):
+        self.kernels = kernels
+        self.biases = biases
+        self.activations = [ACTIVATIONS[name] for name in activations]
+
+    @classmethod
+    def load(cls, npz_path):
+        with np.load(npz_path) as arrays:
+            activations = [str(name) for name in arrays["activations"]]
+            kernels = [arrays[f"kernel_{i}"] for i in range(len(activations))]
+            biases = [arrays[f"bias_{i}"] for i in range(len(activations))]
+        return cls(kernels, biases, activations)
+
+    def __call__(self, x):
+        x = np.asarray(x, dtype=np.float32)
+        for kernel, bias, activation in zip(self.kernels, self.biases, self.activations):
+            x = activation(x @ kernel + bias)
+        return x
+
+    # same call as the keras model, so NumpyMLP can replace it in existing code
+    predict_on_batch = __call__
+
+def load_evaluator(npz_path="disc.npz"):
+    """Return an exported disc model as an evaluator of (N, 32) boards, like search.load_disc_model()."""
+    model = NumpyMLP.load(npz_path)
+    return lambda boards: model(boards)[:, 0]
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export a keras gen/disc model to .npz and check the NumPy forward pass")
+    parser.add_argument("json_path", help="e.g. disc.json")
+    parser.add_argument("weights_path", help="e.g. disc.h5")
+    parser.add_argument("npz_path", help="e.g. disc.npz")
+    parser.add_argument("--samples", type=int, default=100000)
+    args = parser.parse_args()
+
+    model = export_model(args.json_path, args.weights_path, args.npz_path)
+
+    start = time.perf_counter()
+    exported = NumpyMLP.load(args.npz_path)
+    load_time = time.perf_counter() - start
+
+    # boards for the disc model, heuristic metrics for the gen model: both are small integers
+    inputs = np.random.default_rng(0).integers(-3, 4, size=(args.samples, model.input_shape[-1])).astype(np.float32)
+    start = time.perf_counter()
+    expected = np.asarray(model.predict_on_batch(inputs))
+    keras_time = time.perf_counter() - start
+    start = time.perf_counter()
+    outputs = exported(inputs)
+    numpy_time = time.perf_counter() - start
+
+    error = np.max(np.abs(outputs - expected))
+    print(f"{args.npz_path}: max abs difference {error:.2e} over {args.samples} inputs, load {load_time * 1e3:.1f} ms")
+    print(f"keras {args.samples / keras_time:,.0f} rows/sec, numpy {args.samples / numpy_time:,.0f} rows/sec")
+    if not np.allclose(outputs, expected, rtol=1e-4, atol=1e-5):
+        raise SystemExit("the NumPy forward pass does not match the keras model")
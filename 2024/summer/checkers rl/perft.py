@@ -0,0 +1,274 @@
+import time
+import random
+import argparse
+from collections import Counter
+import numpy as np
+from rules import Board, BitBoard, Piece, RED, BLUE
+from heuristics import expand, generate_next, DARK_ROWS, DARK_COLS
+
+# Perft (leaf count of the full move tree to a given depth) for the two move generators of the package:
+#   rules       checkers.Board / BitBoard, what EnvCheckers plays: a move is a single step or a single jump,
+#               a capture anywhere on the board is mandatory, colours alternate
+#   heuristics  generate_next() on 8x8 NumPy boards, what datagen, search and the training loop use:
+#               multi-jumps, and every partial multi-jump is a successor of its own
+# and a cross-check of their successor sets, position by position.
+#
+# Positions are written as 32 characters in the order of heuristics.compress(): m/k are men/kings of
+# the player to move, M/K the opponent's, "." an empty square. Square k of a compressed board is
+# (DARK_ROWS[k], DARK_COLS[k]) on the 8x8 board, that is x = 7 - column, y = row in checkers
+# coordinates, with the player to move playing RED (towards y = 7) and the opponent BLUE.
+
+POSITIONS = {
+    "standard": "mmmmmmmmmmmm........MMMMMMMMMMMM",
+    "kings": "....k.m..M..K.M....m.M..k....K..",
+    "edges": "...k.m.MM..m.K...k..M.M..m...K..",
+    "wrap": "M....k....m...K.....M....M......", # a king on row 1 next to an opponent on row 0
+}
+
+# perft of the standard position under the English draughts rules, multi-jumps included
+REFERENCE = {"standard": [7, 49, 302, 1469, 7361, 36768, 179740, 845931]}
+# depth up to which the rules engine, single jumps only, must match REFERENCE: the first multi-jump is at ply 7
+SINGLE_JUMP_DEPTH = {"standard": 6}
+
+VALUES = {".": 0, "m": 1, "k": 3, "M": -1, "K": -3}
+SYMBOLS = {value: symbol for symbol, value in VALUES.items()}
+
+def parse_position(text):
+    """Return the compressed (32,) board of a position string."""
+    if len(text) != 32 or any(symbol not in VALUES for symbol in text):
+        raise ValueError(f"a position is 32 characters among {''.join(VALUES)}, got {text!r}")
+    return np.array([VALUES[symbol] for symbol in text], dtype=np.int8)
+
+def format_position(board):
+    return "".join(SYMBOLS[int(value)] for value in board)
+
+# coordinates of compressed square k on the checkers board
+PIXELS = [(7 - int(DARK_COLS[k]), int(DARK_ROWS[k])) for k in range(32)]
+
+def to_rules_board(board, board_class=Board):
+    """Return a Board (or BitBoard) holding a compressed board, the player to move being RED."""
+    rules_board = board_class()
+    for k, pixel in enumerate(PIXELS):
+        value = int(board[k])
+        rules_board.place_piece(pixel, Piece(RED if value > 0 else BLUE, abs(value) == 3) if value else None)
+    return rules_board
+
+def from_rules_board(rules_board, color=RED):
+    """Return the compressed board of a Board, seen by the given player (its pieces are positive)."""
+    board = np.zeros(32, dtype=np.int8)
+    for k, pixel in enumerate(PIXELS):
+        piece = rules_board.location(pixel).occupant
+        if piece is not None:
+            board[k] = (3 if piece.king else 1) * (1 if piece.color == RED else -1)
+    # BLUE moves towards y = 0: seen by BLUE, the board is turned around like heuristics.reverse()
+    return board if color == RED else -board[::-1]
+
+def rules_moves(board, color):
+    """Return the (start, end) moves of color: its captures if it has one, every legal move otherwise."""
+    if isinstance(board, BitBoard):
+        # the moves of the whole board from its masks, in the order of the scan below
+        moves, movers, capturers = board.all_moves((color,))
+        return [(start, end) for start in sorted(capturers[color] or movers[color]) for end in moves[start]]
+    moves, captures = [], []
+    for x in range(8):
+        for y in range(x % 2, 8, 2):
+            piece = board.location((x, y)).occupant
+            if piece is not None and piece.color == color:
+                for end in board.legal_moves((x, y)):
+                    (captures if abs(end[0] - x) > 1 else moves).append(((x, y), end))
+    return captures if captures else moves
+
+def make_move(board, start, end):
+    """Play a move on board and return what unmake_move() needs to take it back."""
+    # read before moving: on a Board, location() returns the piece itself, which move_piece() may king
+    piece = board.location(start).occupant
+    color, king = piece.color, piece.king
+    captured, captured_piece = None, None
+    if abs(end[0] - start[0]) > 1:
+        captured = ((start[0] + end[0]) >> 1, (start[1] + end[1]) >> 1)
+        captured_piece = board.location(captured).occupant
+        board.remove_piece(captured)
+    board.move_piece(start, end)
+    return start, end, color, king, captured, captured_piece
+
+def unmake_move(board, undo):
+    start, end, color, king, captured, captured_piece = undo
+    board.remove_piece(end)
+    board.place_piece(start, Piece(color, king))
+    if captured is not None:
+        board.place_piece(captured, Piece(captured_piece.color, captured_piece.king))
+
+def perft_rules(board, color, depth):
+    """Number of leaves of the rules move tree of depth depth."""
+    moves = rules_moves(board, color)
+    if depth <= 1:
+        return len(moves) if depth == 1 else 1
+    other = BLUE if color == RED else RED
+    nodes = 0
+    for start, end in moves:
+        undo = make_move(board, start, end)
+        nodes += perft_rules(board, other, depth - 1)
+        unmake_move(board, undo)
+    return nodes
+
+def perft_heuristics(board, depth):
+    """Number of leaves of the generate_next() move tree of depth depth, from a compressed board."""
+    if depth == 0:
+        return 1
+    children = generate_next(expand(board))
+    if depth == 1:
+        return len(children)
+    return sum(perft_heuristics(-child[::-1], depth - 1) for child in children)
+
+def timed(function, *args):
+    start = time.perf_counter()
+    nodes = function(*args)
+    return nodes, time.perf_counter() - start
+
+# cross-check
+
+def move_shape(board, child):
+    """Describe the move from board to child (compressed, same player): piece, kind and direction."""
+    vacated = np.flatnonzero((board > 0) & (child <= 0))
+    arrived = np.flatnonzero((child > 0) & (board <= 0))
+    if len(vacated) != 1 or len(arrived) != 1:
+        return "other"
+    start, end = int(vacated[0]), int(arrived[0])
+    piece = "king" if board[start] == 3 else "man"
+    di = int(DARK_ROWS[end] - DARK_ROWS[start])
+    dj = int(DARK_COLS[end] - DARK_COLS[start])
+    captured = int(np.sum(board < 0) - np.sum(child < 0))
+    kind = "step" if captured == 0 else "jump" if captured == 1 else f"{captured}-jump"
+    # every step or jump moves by one or two rows and columns, so anything further went off the board
+    reach = max(2 * captured, 1)
+    if abs(di) > reach or abs(dj) > reach:
+        return f"{piece} {kind} {start}->{end} wrapping around the board"
+    if captured > 1:
+        return f"{piece} {kind}"
+    direction = ("forward" if di > 0 else "backward") + ("-right" if dj > 0 else "-left")
+    return f"{piece} {kind} {direction}"
+
+def compare_successors(board):
+    """
+    Compare the successors of a compressed board under both generators.
+    Returns (expected, divergences): Counters of move shapes found by only one generator, the expected ones
+    being the multi-jumps that only heuristics.generate_next() plays.
+    """
+    rules_board = to_rules_board(board, BitBoard)
+    rules_children = set()
+    for start, end in rules_moves(rules_board, RED):
+        undo = make_move(rules_board, start, end)
+        rules_children.add(from_rules_board(rules_board).tobytes())
+        unmake_move(rules_board, undo)
+    heuristics_children = {child.astype(np.int8).tobytes() for child in generate_next(expand(board))}
+
+    expected, divergences = Counter(), Counter()
+    for child, engine in [(c, "heuristics only") for c in heuristics_children - rules_children] + [(c, "rules only") for c in rules_children - heuristics_children]:
+        child = np.frombuffer(child, dtype=np.int8)
+        captured = int(np.sum(board < 0) - np.sum(child < 0))
+        shape = move_shape(board, child)
+        if engine == "heuristics only" and captured >= 2 and "wrapping" not in shape:
+            expected[f"{engine}: {shape}"] += 1
+        else:
+            divergences[f"{engine}: {shape}"] += 1
+    return expected, divergences
+
+def cross_check(board, depth, seen=None):
+    """
+    Compare both generators on every position of the rules move tree of depth depth from a compressed board.
+    Returns (positions, expected, divergences, examples), examples mapping each divergence to a position string.
+    """
+    seen = set() if seen is None else seen
+    expected, divergences, examples = Counter(), Counter(), {}
+    rules_board = to_rules_board(board)
+
+    def visit(depth, color):
+        position = from_rules_board(rules_board, color)
+        key = position.tobytes()
+        if key not in seen:
+            seen.add(key)
+            found_expected, found = compare_successors(position)
+            expected.update(found_expected)
+            divergences.update(found)
+            for shape in found:
+                examples.setdefault(shape, format_position(position))
+        if depth > 0:
+            other = BLUE if color == RED else RED
+            for start, end in rules_moves(rules_board, color):
+                undo = make_move(rules_board, start, end)
+                visit(depth - 1, other)
+                unmake_move(rules_board, undo)
+
+    visit(depth, RED)
+    return len(seen), expected, divergences, examples
+
+def random_positions(count, seed=0, max_plies=80):
+    """Positions reached by random rules play from the standard position, seen by the player to move."""
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        board, color = to_rules_board(parse_position(POSITIONS["standard"])), RED
+        for ply in range(rng.randrange(max_plies)):
+            moves = rules_moves(board, color)
+            if not moves:
+                break
+            make_move(board, *rng.choice(moves))
+            color = BLUE if color == RED else RED
+        positions.append(from_rules_board(board, color))
+    return positions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Perft of the rules and heuristics move generators, and a cross-check of both")
+    parser.add_argument("--depth", type=int, default=6)
+    parser.add_argument("--position", action="append", default=[], help="extra 32-character position, see POSITIONS")
+    parser.add_argument("--check-depth", type=int, default=3, help="depth of the cross-checked tree of every position")
+    parser.add_argument("--random", type=int, default=300, help="random positions also cross-checked")
+    args = parser.parse_args()
+
+    positions = dict(POSITIONS)
+    positions.update((f"custom {i}", text) for i, text in enumerate(args.position))
+
+    print(f"{'position':>10} {'depth':>5} {'Board':>10} {'BitBoard':>10} {'heuristics':>11}   leaves/sec (Board, BitBoard, heuristics)")
+    mismatches = 0
+    for name, text in positions.items():
+        board = parse_position(text)
+        for depth in range(1, args.depth + 1):
+            board_nodes, board_time = timed(perft_rules, to_rules_board(board), RED, depth)
+            bitboard_nodes, bitboard_time = timed(perft_rules, to_rules_board(board, BitBoard), RED, depth)
+            heuristics_nodes, heuristics_time = timed(perft_heuristics, board, depth)
+            reference = REFERENCE.get(name, [])
+            note = ""
+            if board_nodes != bitboard_nodes:
+                note += "  BOARD/BITBOARD MISMATCH"
+                mismatches += 1
+            if depth <= SINGLE_JUMP_DEPTH.get(name, 0) and board_nodes != reference[depth - 1]:
+                note += f"  RULES/ENGLISH DRAUGHTS MISMATCH ({reference[depth - 1]})"
+                mismatches += 1
+            if depth <= len(reference) and heuristics_nodes != reference[depth - 1]:
+                note += f"  (English draughts: {reference[depth - 1]})"
+            print(f"{name:>10} {depth:5d} {board_nodes:10d} {bitboard_nodes:10d} {heuristics_nodes:11d}   "
+                  f"{board_nodes / board_time:9,.0f} {bitboard_nodes / bitboard_time:9,.0f} {heuristics_nodes / heuristics_time:9,.0f}{note}")
+
+    seen = set()
+    expected, divergences, examples = Counter(), Counter(), {}
+    for name, text in positions.items():
+        checked, found_expected, found, found_examples = cross_check(parse_position(text), args.check_depth, seen)
+        expected.update(found_expected)
+        divergences.update(found)
+        for shape, example in found_examples.items():
+            examples.setdefault(shape, example)
+    for position in random_positions(args.random):
+        checked, found_expected, found, found_examples = cross_check(position, 0, seen)
+        expected.update(found_expected)
+        divergences.update(found)
+        for shape, example in found_examples.items():
+            examples.setdefault(shape, example)
+
+    print(f"\ncross-check of {len(seen)} positions: {sum(expected.values())} expected differences (multi-jumps), "
+          f"{sum(divergences.values())} divergences")
+    for shape, count in expected.most_common():
+        print(f"  expected  {count:6d}  {shape}")
+    for shape, count in divergences.most_common():
+        print(f"  DIVERGES  {count:6d}  {shape}  e.g. {examples[shape]}")
+    if mismatches:
+        raise SystemExit(f"{mismatches} perft mismatches between Board, BitBoard and the English draughts reference")
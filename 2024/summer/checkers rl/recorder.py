@@ -0,0 +1,147 @@
+import os
+import json
+import glob
+import queue
+import atexit
+import threading
+import numpy as np
+
+# Episode logging for EnvCheckers without per-step formatting or I/O.
+# Steps are stored in preallocated columns (episode, action, reward, done); every chunk_size steps
+# the full columns are handed to a background thread that writes them compressed as steps_XXXXX.npz.
+# Every finished episode adds one line to episodes.jsonl. Only the writer thread touches the disk.
+
+STEP_COLUMNS = {"episode": np.int64, "action": np.int32, "reward": np.int16, "done": np.bool_}
+
+class EpisodeRecorder:
+    """
+    Buffered, background writer of EnvCheckers episodes. One recorder can be shared by several
+    envs of the same process: every episode gets its own id from begin_episode().
+    """
+
+    def __init__(self, directory="logs", chunk_size=1 << 16, record_steps=True, max_pending=8):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.record_steps = record_steps
+
+        # continue an existing log: episode ids and file numbers carry on from it
+        summaries_path = os.path.join(directory, "episodes.jsonl")
+        self.episodes = 0
+        if os.path.exists(summaries_path):
+            with open(summaries_path) as summaries:
+                self.episodes = sum(1 for line in summaries)
+        self.files = len(glob.glob(os.path.join(directory, "steps_*.npz")))
+        self._new_chunk()
+
+        # bounded, so a slow disk slows the env down instead of filling the memory
+        self._queue = queue.Queue(max_pending)
+        self._summaries = open(summaries_path, "a", buffering=1 << 20)
+        self._thread = threading.Thread(target=self._write, daemon=True)
+        self._closed = False
+        self._thread.start()
+        # the writer is a daemon thread: without close() at exit, the queued chunks would be lost
+        atexit.register(self.close)
+
+    def _new_chunk(self):
+        self.columns = {name: np.zeros(self.chunk_size, dtype=dtype) for name, dtype in STEP_COLUMNS.items()}
+        self.count = 0
+
+    def begin_episode(self):
+        """Return the id of a new episode."""
+        self.episodes += 1
+        return self.episodes - 1
+
+    def record_step(self, episode, action, reward, done):
+        """Store one step. Nothing is formatted or written here."""
+        if not self.record_steps:
+            return
+        columns = self.columns
+        i = self.count
+        columns["episode"][i] = episode
+        columns["action"][i] = action
+        columns["reward"][i] = reward
+        columns["done"][i] = done
+        self.count = i + 1
+        if self.count == self.chunk_size:
+            self._flush_steps()
+
+    def end_episode(self, summary):
+        """Queue the summary of a finished episode (a dict of JSON values) for episodes.jsonl."""
+        self._queue.put(("summary", summary))
+
+    def _flush_steps(self):
+        if self.count > 0:
+            columns = {name: column[:self.count] for name, column in self.columns.items()}
+            self._queue.put(("steps", (self.files, columns)))
+            self.files += 1
+            self._new_chunk()
+
+    def _write(self):
+        while True:
+            kind, item = self._queue.get()
+            if kind == "summary":
+                self._summaries.write(json.dumps(item, separators=(",", ":")) + "\n")
+            elif kind == "steps":
+                index, columns = item
+                np.savez_compressed(os.path.join(self.directory, f"steps_{index:05d}.npz"), **columns)
+            elif kind == "flush":
+                self._summaries.flush()
+                item.set()
+            else:
+                self._summaries.close()
+                return
+
+    def flush(self):
+        """Write everything recorded so far and wait until it is on disk. Does nothing once the recorder is closed."""
+        if self._closed or not self._thread.is_alive():
+            return
+        self._flush_steps()
+        done = threading.Event()
+        self._queue.put(("flush", done))
+        done.wait()
+
+    def close(self):
+        """Write everything recorded so far and stop the writer thread. Closing twice does nothing."""
+        self._closed = True
+        if self._thread.is_alive():
+            self._flush_steps()
+            self._queue.put(("close", None))
+            self._thread.join()
+        atexit.unregister(self.close)
+
+def load_episodes(directory="logs"):
+    """Return the episode summaries of a log directory, oldest first."""
+    with open(os.path.join(directory, "episodes.jsonl")) as summaries:
+        return [json.loads(line) for line in summaries]
+
+def load_steps(directory="logs"):
+    """Return the recorded steps of a log directory as a dict of columns."""
+    files = sorted(glob.glob(os.path.join(directory, "steps_*.npz")))
+    if not files:
+        return {name: np.zeros(0, dtype=dtype) for name, dtype in STEP_COLUMNS.items()}
+    columns = {name: [] for name in STEP_COLUMNS}
+    for path in files:
+        with np.load(path) as chunk:
+            for name in STEP_COLUMNS:
+                columns[name].append(chunk[name])
+    return {name: np.concatenate(chunks) for name, chunks in columns.items()}
+
+def check_close(directory, steps=100):
+    """Record steps, close the recorder, then flush and close it again (as EnvCheckers.close() and atexit do)."""
+    recorder = EpisodeRecorder(directory, chunk_size=64)
+    episode = recorder.begin_episode()
+    for i in range(steps):
+        recorder.record_step(episode, i, 1, i == steps - 1)
+    recorder.end_episode({"episode": episode, "steps": steps})
+    recorder.close()
+    recorder.flush()
+    recorder.close()
+    assert len(load_steps(directory)["action"]) == steps
+    assert len(load_episodes(directory)) == 1
+
+if __name__ == "__main__":
+    import tempfile
+    with tempfile.TemporaryDirectory() as directory:
+        check_close(directory)
+    print("EpisodeRecorder can be flushed and closed after close()")
@@ -0,0 +1,262 @@
+import os
+import json
+import time
+import argparse
+import numpy as np
+
+# Experience replay for EnvCheckers and its vector envs.
+# Transitions are kept in preallocated columns (in RAM, or memory-mapped .npy files for capacities
+# larger than the RAM), written as a circular buffer. add() takes the output of one step of num_envs
+# envs at once and turns it into n-step transitions: every env has a window of its last n steps,
+# and a transition (first observation, first action, discounted sum of the n rewards, observation
+# after the n-th step) is written when the window is full, or for every step of the window when
+# the game ends. Prioritized sampling draws from a sum tree updated and searched level by level
+# for the whole batch with array operations.
+
+COLUMNS = ("obs", "actions", "returns", "next_obs", "dones", "discounts")
+
+class SumTree:
+    """
+    Binary tree of priorities in one array: the leaves hold the priorities of the buffer slots and
+    every other node the sum of its two children, node 1 being the root.
+    """
+
+    def __init__(self, capacity):
+        self.depth = max(capacity - 1, 1).bit_length()
+        self.leaves = 1 << self.depth
+        self.nodes = np.zeros(2 * self.leaves)
+
+    def total(self):
+        return self.nodes[1]
+
+    def update(self, indices, priorities):
+        """Set the priorities of the slots indices, then the sums above them."""
+        nodes = np.asarray(indices, dtype=np.int64) + self.leaves
+        self.nodes[nodes] = priorities
+        # a node reached twice gets the same sum twice, cheaper than removing the duplicates
+        for level in range(self.depth):
+            nodes >>= 1
+            children = nodes << 1
+            self.nodes[nodes] = self.nodes.take(children) + self.nodes.take(children + 1)
+
+    def find(self, targets):
+        """Return the slots whose cumulative priority ranges contain targets (values in [0, total))."""
+        nodes = np.ones(len(targets), dtype=np.int64)
+        targets = np.array(targets, dtype=np.float64)
+        for level in range(self.depth):
+            nodes <<= 1
+            left = self.nodes.take(nodes)
+            right = targets >= left
+            targets -= left * right
+            nodes += right
+        return nodes - self.leaves
+
+class ReplayBuffer:
+    """
+    Circular buffer of capacity n-step transitions from num_envs envs, stepped together.
+    With prioritized=True, sample() draws transitions with probability priority^alpha (new ones get
+    the highest priority seen so far) and returns importance-sampling weights, and update_priorities()
+    sets the priorities from the TD errors of a sampled batch.
+    With a directory, the columns are memory-mapped .npy files there, and a buffer saved by flush()
+    is opened again where it stopped.
+    """
+
+    def __init__(self, capacity, num_envs=1, obs_shape=(8, 8), n_step=1, gamma=0.99, prioritized=False,
+                 alpha=0.6, beta=0.4, epsilon=1e-6, directory=None, seed=None):
+        self.capacity = capacity
+        self.num_envs = num_envs
+        self.obs_shape = tuple(obs_shape)
+        self.n_step = n_step
+        self.gamma = gamma
+        self.prioritized = prioritized
+        self.alpha = alpha
+        self.beta = beta
+        self.epsilon = epsilon
+        self.directory = directory
+        self.rng = np.random.default_rng(seed)
+
+        dtypes = {"obs": np.int8, "actions": np.int32, "returns": np.float32, "next_obs": np.int8, "dones": np.bool_, "discounts": np.float32}
+        shapes = {name: (capacity,) + (self.obs_shape if name in ("obs", "next_obs") else ()) for name in COLUMNS}
+        self.position = self.size = 0
+        if directory is None:
+            self.columns = {name: np.zeros(shapes[name], dtype=dtypes[name]) for name in COLUMNS}
+        else:
+            os.makedirs(directory, exist_ok=True)
+            state_path = os.path.join(directory, "state.json")
+            reopen = os.path.exists(state_path)
+            if reopen:
+                with open(state_path) as state:
+                    saved = json.load(state)
+                if saved["capacity"] != capacity or tuple(saved["obs_shape"]) != self.obs_shape:
+                    raise ValueError(f"{directory} holds a buffer of capacity {saved['capacity']} and observations {saved['obs_shape']}")
+                self.position, self.size = saved["position"], saved["size"]
+            self.columns = {name: np.lib.format.open_memmap(os.path.join(directory, f"{name}.npy"), mode="r+" if reopen else "w+",
+                                                            dtype=dtypes[name], shape=shapes[name]) for name in COLUMNS}
+
+        self.tree = SumTree(capacity) if prioritized else None
+        self.max_priority = 1.0
+        if prioritized and self.size:
+            self.tree.update(np.arange(self.size), self.max_priority)
+
+        # n-step windows, one per env
+        self.window_obs = np.zeros((num_envs, n_step) + self.obs_shape, dtype=np.int8)
+        self.window_actions = np.zeros((num_envs, n_step), dtype=np.int32)
+        self.window_rewards = np.zeros((num_envs, n_step), dtype=np.float32)
+        self.window_count = np.zeros(num_envs, dtype=np.int64)
+        self.powers = gamma ** np.arange(n_step + 1)
+        # suffix_returns[j, i] = gamma^(i - j) for i >= j: the returns of every suffix of a window
+        self.suffix_returns = np.triu(self.powers[np.maximum(np.arange(n_step)[None] - np.arange(n_step)[:, None], 0)])
+
+    def __len__(self):
+        return self.size
+
+    def add(self, obs, actions, rewards, next_obs, dones, infos=None):
+        """
+        Add one step of every env: arrays with num_envs rows (or a single transition when num_envs is 1).
+        With the infos of an auto-resetting vector env, the last observation of a finished game is taken
+        from infos["final_observation"] rather than next_obs, which is already the next game's.
+        """
+        obs = np.asarray(obs).reshape((self.num_envs,) + self.obs_shape)
+        next_obs = np.asarray(next_obs).reshape((self.num_envs,) + self.obs_shape)
+        actions = np.asarray(actions).reshape(self.num_envs)
+        rewards = np.asarray(rewards).reshape(self.num_envs)
+        dones = np.asarray(dones, dtype=bool).reshape(self.num_envs)
+        if infos is not None and "final_observation" in infos:
+            next_obs = np.where(dones.reshape((-1,) + (1,) * len(self.obs_shape)), np.asarray(infos["final_observation"]).reshape(next_obs.shape), next_obs)
+
+        envs = np.arange(self.num_envs)
+        count = self.window_count
+        self.window_obs[envs, count] = obs
+        self.window_actions[envs, count] = actions
+        self.window_rewards[envs, count] = rewards
+        count += 1
+
+        full = np.flatnonzero((count == self.n_step) & ~dones)
+        if len(full):
+            returns = self.window_rewards[full] @ self.powers[:self.n_step]
+            self._store(self.window_obs[full, 0], self.window_actions[full, 0], returns, next_obs[full],
+                        np.zeros(len(full), dtype=bool), np.full(len(full), self.powers[self.n_step]))
+            self.window_obs[full, :-1] = self.window_obs[full, 1:]
+            self.window_actions[full, :-1] = self.window_actions[full, 1:]
+            self.window_rewards[full, :-1] = self.window_rewards[full, 1:]
+            count[full] -= 1
+
+        # a finished game ends every window that is still open
+        for e in np.flatnonzero(dones):
+            k = count[e]
+            returns = self.suffix_returns[:k, :k] @ self.window_rewards[e, :k]
+            self._store(self.window_obs[e, :k], self.window_actions[e, :k], returns, np.repeat(next_obs[e][None], k, axis=0),
+                        np.ones(k, dtype=bool), self.powers[k:0:-1])
+            count[e] = 0
+
+    def _store(self, obs, actions, returns, next_obs, dones, discounts):
+        slots = (self.position + np.arange(len(obs))) % self.capacity
+        columns = self.columns
+        columns["obs"][slots] = obs
+        columns["actions"][slots] = actions
+        columns["returns"][slots] = returns
+        columns["next_obs"][slots] = next_obs
+        columns["dones"][slots] = dones
+        columns["discounts"][slots] = discounts
+        if self.tree is not None:
+            self.tree.update(slots, self.max_priority ** self.alpha)
+        self.position = int((self.position + len(obs)) % self.capacity)
+        self.size = min(self.size + len(obs), self.capacity)
+
+    def sample(self, batch_size, beta=None):
+        """
+        Return a batch as a dict of arrays: obs, actions, returns (discounted sums of up to n rewards),
+        next_obs, dones, discounts (gamma^k for the k rewards in returns), indices and weights
+        (importance-sampling weights, normalized by the largest of the batch; all 1 when uniform).
+        The target of a transition is returns + discounts * (1 - dones) * V(next_obs).
+        """
+        if self.size == 0:
+            raise ValueError("cannot sample from an empty replay buffer")
+        if self.tree is None:
+            indices = self.rng.integers(0, self.size, size=batch_size)
+            weights = np.ones(batch_size, dtype=np.float32)
+        else:
+            # one draw in each of batch_size equal segments of the total priority
+            total = self.tree.total()
+            targets = (np.arange(batch_size) + self.rng.random(batch_size)) * (total / batch_size)
+            indices = np.minimum(self.tree.find(np.minimum(targets, np.nextafter(total, 0))), self.size - 1)
+            probabilities = self.tree.nodes[indices + self.tree.leaves] / total
+            weights = (self.size * probabilities) ** -(self.beta if beta is None else beta)
+            weights = (weights / weights.max()).astype(np.float32)
+        batch = {name: column.take(indices, axis=0) for name, column in self.columns.items()}
+        batch["indices"] = indices
+        batch["weights"] = weights
+        return batch
+
+    def update_priorities(self, indices, td_errors):
+        """Set the priorities of sampled transitions from their TD errors."""
+        priorities = np.abs(np.asarray(td_errors, dtype=np.float64)) + self.epsilon
+        self.max_priority = max(self.max_priority, float(priorities.max()))
+        self.tree.update(indices, priorities ** self.alpha)
+
+    def flush(self):
+        """Write memory-mapped columns and the buffer position to the directory."""
+        if self.directory is None:
+            return
+        for column in self.columns.values():
+            column.flush()
+        with open(os.path.join(self.directory, "state.json"), "w") as state:
+            json.dump({"capacity": self.capacity, "obs_shape": list(self.obs_shape), "position": self.position, "size": self.size}, state)
+
+def collect(env, buffer, num_steps, seed=0):
+    """Step a vector env (SubprocVecEnvCheckers) num_steps times with random legal actions, adding every step to buffer."""
+    from subproc_checkers import sample_masked
+
+    rng = np.random.default_rng(seed)
+    obs = env.reset()
+    for i in range(num_steps):
+        actions = sample_masked(env.action_masks(), rng)
+        next_obs, rewards, dones, infos = env.step(actions)
+        buffer.add(obs, actions, rewards, next_obs, dones, infos)
+        obs = next_obs
+
+def time_call(function, repeats):
+    start = time.perf_counter()
+    for i in range(repeats):
+        function()
+    return (time.perf_counter() - start) / repeats * 1e6
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay buffer add/sample benchmark")
+    parser.add_argument("--capacity", type=int, default=1 << 20)
+    parser.add_argument("--batch-size", type=int, default=1024)
+    parser.add_argument("--envs", type=int, default=64)
+    parser.add_argument("--n-step", type=int, default=3)
+    parser.add_argument("--collect", type=int, default=200, help="steps of SubprocVecEnvCheckers played into the buffer first")
+    args = parser.parse_args()
+
+    from subproc_checkers import SubprocVecEnvCheckers
+
+    for prioritized in (False, True):
+        buffer = ReplayBuffer(args.capacity, args.envs, n_step=args.n_step, prioritized=prioritized, seed=0)
+        env = SubprocVecEnvCheckers(args.envs, 1)
+        try:
+            start = time.perf_counter()
+            collect(env, buffer, args.collect)
+            collected = time.perf_counter() - start
+        finally:
+            env.close()
+
+        # fill the rest with random steps, as fast as add() goes
+        rng = np.random.default_rng(0)
+        obs = rng.integers(0, 5, size=(args.envs, 8, 8), dtype=np.int8)
+        steps = 0
+        start = time.perf_counter()
+        while len(buffer) < args.capacity:
+            buffer.add(obs, rng.integers(0, 4096, args.envs), rng.integers(-5, 11, args.envs), obs, rng.random(args.envs) < 0.01)
+            steps += 1
+        added = (time.perf_counter() - start) / steps * 1e6
+
+        sample_us = time_call(lambda: buffer.sample(args.batch_size), 200)
+        line = (f"{'prioritized' if prioritized else 'uniform':>11}: {args.collect * args.envs / collected:8,.0f} env steps/s collected, "
+                f"add {added:6.1f} us per {args.envs}-env step, sample({args.batch_size}) {sample_us:6.1f} us")
+        if prioritized:
+            batch = buffer.sample(args.batch_size)
+            update_us = time_call(lambda: buffer.update_priorities(batch["indices"], rng.random(args.batch_size)), 200)
+            line += f", update_priorities {update_us:6.1f} us"
+        print(line)
@@ -0,0 +1,801 @@
+"""
+rules.py
+
+The checkers rules of checkers.py without any pygame code: colours, directions, the Board and
+BitBoard engines, Piece and Square. Game and Graphics in checkers.py draw and drive them.
+"""
+import random
+
+##COLORS##
+#             R    G    B 
+WHITE    = (255, 255, 255)
+BLUE     = (  0,   0, 255)
+RED      = (255,   0,   0)
+BLACK    = (  0,   0,   0)
+GOLD     = (255, 215,   0)
+HIGH     = (160, 190, 255)
+
+##DIRECTIONS##
+NORTHWEST = "northwest"
+NORTHEAST = "northeast"
+SOUTHWEST = "southwest"
+SOUTHEAST = "southeast"
+
+##BITBOARDS##
+# The 32 dark squares are numbered row by row: square (x,y) has index y*4 + x//2.
+# Even rows hold x = 0,2,4,6 and odd rows hold x = 1,3,5,7, so a diagonal step
+# is a shift by 3, 4 or 5 bits depending on the parity of the row.
+FULL      = 0xFFFFFFFF
+ROW_0     = 0x0000000F
+ROW_7     = 0xF0000000
+EVEN_ROWS = 0x0F0F0F0F
+ODD_ROWS  = 0xF0F0F0F0
+LEFT_EDGE = 0x01010101 # x == 0, only found on even rows
+RIGHT_EDGE= 0x80808080 # x == 7, only found on odd rows
+
+DIRECTIONS = [NORTHWEST, NORTHEAST, SOUTHWEST, SOUTHEAST]
+OPPOSITE = {NORTHWEST: SOUTHEAST, NORTHEAST: SOUTHWEST, SOUTHWEST: NORTHEAST, SOUTHEAST: NORTHWEST}
+
+def shift(bb, dir):
+	"""
+	Moves every bit of the bitboard bb one diagonal step in the given direction.
+	Bits that would leave the board are dropped.
+	"""
+	if dir == NORTHWEST:
+		return ((bb & EVEN_ROWS & ~LEFT_EDGE & ~ROW_0) >> 5) | ((bb & ODD_ROWS) >> 4)
+	elif dir == NORTHEAST:
+		return ((bb & EVEN_ROWS & ~ROW_0) >> 4) | ((bb & ODD_ROWS & ~RIGHT_EDGE) >> 3)
+	elif dir == SOUTHWEST:
+		return (((bb & EVEN_ROWS & ~LEFT_EDGE) << 3) | ((bb & ODD_ROWS & ~ROW_7) << 4)) & FULL
+	elif dir == SOUTHEAST:
+		return (((bb & EVEN_ROWS) << 4) | ((bb & ODD_ROWS & ~RIGHT_EDGE & ~ROW_7) << 5)) & FULL
+	else:
+		return 0
+
+def square_bit(pixel):
+	"""
+	Returns the bit of the dark square (x,y), or 0 for a light square.
+	"""
+	x = pixel[0]
+	y = pixel[1]
+	if (x + y) % 2 != 0:
+		return 0
+	return 1 << (y * 4 + (x >> 1))
+
+def bit_square(bit):
+	"""
+	Does the reverse of square_bit(). Takes a single bit and returns its board coordinates (x,y).
+	"""
+	index = bit.bit_length() - 1
+	y = index >> 2
+	return ((index & 3) * 2 + (y & 1), y)
+
+# one step and one jump in each direction, for every square
+STEPS = {dir: [shift(1 << i, dir) for i in range(32)] for dir in DIRECTIONS}
+JUMPS = {dir: [shift(shift(1 << i, dir), dir) for i in range(32)] for dir in DIRECTIONS}
+
+# (x,y) of every square index, and (bit, index) of every dark square (x,y)
+PIXELS = [bit_square(1 << i) for i in range(32)]
+SQUARES = {pixel: (1 << i, i) for i, pixel in enumerate(PIXELS)}
+
+# the directions a red man, a blue man and a king move in, in the order of blind_legal_moves()
+FORWARD = {RED: [SOUTHWEST, SOUTHEAST], BLUE: [NORTHWEST, NORTHEAST]}
+KING = "king"
+PIECE_DIRECTIONS = {RED: FORWARD[RED], BLUE: FORWARD[BLUE], KING: DIRECTIONS}
+
+# (step bit, jump bit, step square, jump square) of every direction a piece moves in, for every square
+MOVE_TABLES = {kind: [[(STEPS[dir][i], JUMPS[dir][i], bit_square(STEPS[dir][i]) if STEPS[dir][i] else None,
+                        bit_square(JUMPS[dir][i]) if JUMPS[dir][i] else None) for dir in dirs] for i in range(32)]
+               for kind, dirs in PIECE_DIRECTIONS.items()}
+
+# shift() of every direction as (towards row 0, even-row mask, even-row shift, odd-row mask, odd-row shift)
+SHIFTS = {
+	NORTHWEST: (True, EVEN_ROWS & ~LEFT_EDGE & ~ROW_0, 5, ODD_ROWS, 4),
+	NORTHEAST: (True, EVEN_ROWS & ~ROW_0, 4, ODD_ROWS & ~RIGHT_EDGE, 3),
+	SOUTHWEST: (False, EVEN_ROWS & ~LEFT_EDGE, 3, ODD_ROWS & ~ROW_7, 4),
+	SOUTHEAST: (False, EVEN_ROWS, 4, ODD_ROWS & ~RIGHT_EDGE & ~ROW_7, 5),
+}
+
+# the square a step and a jump in each direction start from, for every square index they reach
+STEP_SOURCES = {dir: [shift(1 << i, OPPOSITE[dir]).bit_length() - 1 for i in range(32)] for dir in DIRECTIONS}
+JUMP_SOURCES = {dir: [shift(shift(1 << i, OPPOSITE[dir]), OPPOSITE[dir]).bit_length() - 1 for i in range(32)] for dir in DIRECTIONS}
+
+def bit_indices(bb):
+	"""
+	Yields the index of every set bit of the bitboard bb, lowest first.
+	"""
+	while bb:
+		low = bb & -bb
+		yield low.bit_length() - 1
+		bb ^= low
+
+class Board:
+	def __init__(self):
+		self.matrix = self.new_board()
+
+	def new_board(self):
+		"""
+		Create a new board matrix.
+		"""
+
+		# initialize squares and place them in matrix
+
+		matrix = [[None] * 8 for i in range(8)]
+
+		# The following code block has been adapted from
+		# http://itgirl.dreamhosters.com/itgirlgames/games/Program%20Leaders/ClareR/Checkers/checkers.py
+		for x in range(8):
+			for y in range(8):
+				if (x % 2 != 0) and (y % 2 == 0):
+					matrix[y][x] = Square(WHITE)
+				elif (x % 2 != 0) and (y % 2 != 0):
+					matrix[y][x] = Square(BLACK)
+				elif (x % 2 == 0) and (y % 2 != 0):
+					matrix[y][x] = Square(WHITE)
+				elif (x % 2 == 0) and (y % 2 == 0): 
+					matrix[y][x] = Square(BLACK)
+
+		# initialize the pieces and put them in the appropriate squares
+
+		for x in range(8):
+			for y in range(3):
+				if matrix[x][y].color == BLACK:
+					matrix[x][y].occupant = Piece(RED)
+			for y in range(5, 8):
+				if matrix[x][y].color == BLACK:
+					matrix[x][y].occupant = Piece(BLUE)
+
+		return matrix
+
+	def board_string(self, board):
+		"""
+		Takes a board and returns a matrix of the board space colors. Used for testing new_board()
+		"""
+
+		board_string = [[None] * 8] * 8 
+
+		for x in range(8):
+			for y in range(8):
+				if board[x][y].color == WHITE:
+					board_string[x][y] = "WHITE"
+				else:
+					board_string[x][y] = "BLACK"
+
+
+		return board_string
+	
+	def rel(self, dir, pixel):
+		"""
+		Returns the coordinates one square in a different direction to (x,y).
+
+		===DOCTESTS===
+
+		>>> board = Board()
+
+		>>> board.rel(NORTHWEST, (1,2))
+		(0,1)
+
+		>>> board.rel(SOUTHEAST, (3,4))
+		(4,5)
+
+		>>> board.rel(NORTHEAST, (3,6))
+		(4,5)
+
+		>>> board.rel(SOUTHWEST, (2,5))
+		(1,6)
+		"""
+		x = pixel[0]
+		y = pixel[1]
+		if dir == NORTHWEST:
+			return (x - 1, y - 1)
+		elif dir == NORTHEAST:
+			return (x + 1, y - 1)
+		elif dir == SOUTHWEST:
+			return (x - 1, y + 1)
+		elif dir == SOUTHEAST:
+			return (x + 1, y + 1)
+		else:
+			return 0
+
+	def adjacent(self, pixel):
+		"""
+		Returns a list of squares locations that are adjacent (on a diagonal) to (x,y).
+		"""
+		x = pixel[0]
+		y = pixel[1]
+
+		return [self.rel(NORTHWEST, (x,y)), self.rel(NORTHEAST, (x,y)),self.rel(SOUTHWEST, (x,y)),self.rel(SOUTHEAST, (x,y))]
+
+	def location(self, pixel):
+		"""
+		Takes a set of coordinates as arguments and returns self.matrix[x][y]
+		This can be faster than writing something like self.matrix[coords[0]][coords[1]]
+		"""
+		x = pixel[0]
+		y = pixel[1]
+
+		return self.matrix[x][y]
+
+	def blind_legal_moves(self, pixel):
+		"""
+		Returns a list of blind legal move locations from a set of coordinates (x,y) on the board. 
+		If that location is empty, then blind_legal_moves() return an empty list.
+		"""
+
+		x = pixel[0]
+		y = pixel[1]
+		if self.matrix[x][y].occupant != None:
+			
+			if self.matrix[x][y].occupant.king == False and self.matrix[x][y].occupant.color == BLUE:
+				blind_legal_moves = [self.rel(NORTHWEST, (x,y)), self.rel(NORTHEAST, (x,y))]
+				
+			elif self.matrix[x][y].occupant.king == False and self.matrix[x][y].occupant.color == RED:
+				blind_legal_moves = [self.rel(SOUTHWEST, (x,y)), self.rel(SOUTHEAST, (x,y))]
+
+			else:
+				blind_legal_moves = [self.rel(NORTHWEST, (x,y)), self.rel(NORTHEAST, (x,y)), self.rel(SOUTHWEST, (x,y)), self.rel(SOUTHEAST, (x,y))]
+
+		else:
+			blind_legal_moves = []
+
+		return blind_legal_moves
+
+	def legal_moves(self, pixel, hop=False):
+		"""
+		Returns a list of legal move locations from a given set of coordinates (x,y) on the board.
+		If that location is empty, then legal_moves() returns an empty list.
+		"""
+		x = pixel[0]
+		y = pixel[1]
+		blind_legal_moves = self.blind_legal_moves((x,y))
+		legal_moves = []
+		capture_moves = []
+
+		for move in blind_legal_moves:
+			if self.on_board(move):
+				# Vérification des mouvements de capture
+				if self.location(move).occupant and self.location(move).occupant.color != self.location((x,y)).occupant.color:
+					capture_move = (move[0] + (move[0] - x), move[1] + (move[1] - y))
+					if self.on_board(capture_move) and self.location(capture_move).occupant == None:
+						capture_moves.append(capture_move)
+				elif not self.location(move).occupant:  # Mouvements normaux
+					legal_moves.append(move)
+		
+		# Si des mouvements de capture existent, les rendre obligatoires
+		if capture_moves:
+			return capture_moves
+		
+		return legal_moves
+
+	def has_legal_moves(self, color):
+		"""
+		Returns True if a piece of the given color has a legal move.
+		"""
+		for x in range(8):
+			for y in range(8):
+				if self.location((x,y)).color == BLACK and self.location((x,y)).occupant != None and self.location((x,y)).occupant.color == color:
+					if self.legal_moves((x,y)) != []:
+						return True
+
+		return False
+
+	def remove_piece(self, pixel):
+		"""
+		Removes a piece from the board at position (x,y). 
+		"""
+		x = pixel[0]
+		y = pixel[1]
+		self.matrix[x][y].occupant = None
+
+	def place_piece(self, pixel, piece):
+		"""
+		Puts piece (a Piece, or None to empty the square) on the square (x,y), without kinging it.
+		"""
+		x = pixel[0]
+		y = pixel[1]
+		self.matrix[x][y].occupant = piece
+
+	def move_piece(self, pixel_start, pixel_end):
+		"""
+		Move a piece from (start_x, start_y) to (end_x, end_y).
+		"""
+		start_x = pixel_start[0]
+		start_y = pixel_start[1]
+		end_x = pixel_end[0]
+		end_y = pixel_end[1]
+
+		self.matrix[end_x][end_y].occupant = self.matrix[start_x][start_y].occupant
+		self.remove_piece((start_x, start_y))
+
+		self.king((end_x, end_y))
+
+	def is_end_square(self, coords):
+		"""
+		Is passed a coordinate tuple (x,y), and returns true or 
+		false depending on if that square on the board is an end square.
+
+		===DOCTESTS===
+
+		>>> board = Board()
+
+		>>> board.is_end_square((2,7))
+		True
+
+		>>> board.is_end_square((5,0))
+		True
+
+		>>>board.is_end_square((0,5))
+		False
+		"""
+
+		if coords[1] == 0 or coords[1] == 7:
+			return True
+		else:
+			return False
+
+	def on_board(self, pixel):
+		"""
+		Checks to see if the given square (x,y) lies on the board.
+		If it does, then on_board() return True. Otherwise it returns false.
+
+		===DOCTESTS===
+		>>> board = Board()
+
+		>>> board.on_board((5,0)):
+		True
+
+		>>> board.on_board(-2, 0):
+		False
+
+		>>> board.on_board(3, 9):
+		False
+		"""
+
+		x = pixel[0]
+		y = pixel[1]
+		if x < 0 or y < 0 or x > 7 or y > 7:
+			return False
+		else:
+			return True
+
+
+	def king(self, pixel):
+		"""
+		Takes in (x,y), the coordinates of square to be considered for kinging.
+		If it meets the criteria, then king() kings the piece in that square and kings it.
+		"""
+		x = pixel[0]
+		y = pixel[1]
+		if self.location((x,y)).occupant != None:
+			if (self.location((x,y)).occupant.color == BLUE and y == 0) or (self.location((x,y)).occupant.color == RED and y == 7):
+				self.location((x,y)).occupant.king = True 
+
+class BitBoard(Board):
+	"""
+	A drop-in replacement for Board that stores the position in three 32-bit bitboards
+	(red pieces, blue pieces and kings) instead of a matrix of Square objects.
+	legal_moves() of one square reads the precomputed MOVE_TABLES, all_moves() generates the moves of
+	every piece at once from the shift() masks of the whole board, which is what MoveTracker uses.
+	The matrix property builds 64 Square objects and is only meant for drawing.
+	"""
+	def __init__(self):
+		self.red = ROW_0 | (ROW_0 << 4) | (ROW_0 << 8)
+		self.blue = ROW_7 | (ROW_7 >> 4) | (ROW_7 >> 8)
+		self.kings = 0
+
+	@property
+	def matrix(self):
+		"""
+		Builds a matrix of Square objects from the bitboards, for code that reads board.matrix directly.
+		Changing it has no effect on the board.
+		"""
+		return [[self.location((x,y)) for y in range(8)] for x in range(8)]
+
+	def new_board(self):
+		"""
+		Create a new board matrix.
+		"""
+		return BitBoard().matrix
+
+	def location(self, pixel):
+		"""
+		Takes a set of coordinates as arguments and returns a Square describing (x,y).
+		"""
+		square = SQUARES.get(pixel)
+		if square is None:
+			return Square(WHITE)
+		bit = square[0]
+		if self.red & bit:
+			return Square(BLACK, Piece(RED, bool(self.kings & bit)))
+		elif self.blue & bit:
+			return Square(BLACK, Piece(BLUE, bool(self.kings & bit)))
+		return Square(BLACK)
+
+	def occupant(self, bit):
+		"""
+		Returns a Piece describing what sits on the given square bit, or None if it is empty.
+		"""
+		if self.red & bit:
+			return Piece(RED, bool(self.kings & bit))
+		elif self.blue & bit:
+			return Piece(BLUE, bool(self.kings & bit))
+		return None
+
+	def pieces(self, color):
+		"""
+		Returns the bitboard of the pieces of the given color.
+		"""
+		return self.red if color == RED else self.blue
+
+	def piece_directions(self, bit):
+		"""
+		Returns the directions the piece on the given square bit may move in, in the same order as blind_legal_moves().
+		"""
+		if self.kings & bit:
+			return DIRECTIONS
+		elif self.blue & bit:
+			return FORWARD[BLUE]
+		elif self.red & bit:
+			return FORWARD[RED]
+		return []
+
+	def blind_legal_moves(self, pixel):
+		"""
+		Returns a list of blind legal move locations from a set of coordinates (x,y) on the board.
+		If that location is empty, then blind_legal_moves() return an empty list.
+		"""
+		bit = square_bit(pixel)
+		return [self.rel(dir, pixel) for dir in self.piece_directions(bit)]
+
+	def legal_moves(self, pixel, hop=False):
+		"""
+		Returns a list of legal move locations from a given set of coordinates (x,y) on the board.
+		If that location is empty, then legal_moves() returns an empty list.
+		"""
+		square = SQUARES.get(pixel)
+		if square is None:
+			return []
+		bit, index = square
+		if self.red & bit:
+			enemy = self.blue
+			table = MOVE_TABLES[KING if self.kings & bit else RED][index]
+		elif self.blue & bit:
+			enemy = self.red
+			table = MOVE_TABLES[KING if self.kings & bit else BLUE][index]
+		else:
+			return []
+		occupied = self.red | self.blue
+		legal_moves = []
+		capture_moves = []
+
+		for step, jump, step_pixel, jump_pixel in table:
+			if step & enemy:
+				if jump and not jump & occupied:
+					capture_moves.append(jump_pixel)
+			elif step and not step & occupied:
+				legal_moves.append(step_pixel)
+
+		if capture_moves:
+			return capture_moves
+
+		return legal_moves
+
+	def move_masks(self, color):
+		"""
+		Returns ({dir: pieces that can step in dir}, {dir: pieces that can jump in dir}) for the given color.
+		"""
+		own = self.pieces(color)
+		enemy = self.blue if color == RED else self.red
+		empty = ~(self.red | self.blue) & FULL
+		forward = FORWARD[color]
+
+		steps = {}
+		jumps = {}
+		for dir in DIRECTIONS:
+			pieces = own if dir in forward else own & self.kings
+			back = OPPOSITE[dir]
+			steps[dir] = pieces & shift(empty, back)
+			jumps[dir] = pieces & shift(enemy & shift(empty, back), back)
+		return steps, jumps
+
+	def movers(self, color):
+		"""
+		Returns the bitboard of the pieces of the given color that have at least one legal move.
+		"""
+		steps, jumps = self.move_masks(color)
+		movers = 0
+		for dir in DIRECTIONS:
+			movers |= steps[dir] | jumps[dir]
+		return movers
+
+	def all_moves(self, colors=(RED, BLUE)):
+		"""
+		Returns the legal moves of every piece of the given colors at once, from the whole-board masks:
+		({(x,y): legal_moves((x,y))} for the pieces that can move, {color: squares of its movers},
+		{color: squares of its pieces that can capture}), what MoveTracker keeps.
+		"""
+		moves = {}
+		movers = {}
+		capturers = {}
+		empty = ~(self.red | self.blue) & FULL
+		for color in colors:
+			own, enemy = (self.red, self.blue) if color == RED else (self.blue, self.red)
+			forward = FORWARD[color]
+			own_kings = own & self.kings
+			# the landing squares of the jumps, then of the steps, in each direction: shift(pieces, dir)
+			jumps = []
+			steps = []
+			for dir in DIRECTIONS:
+				pieces = own if dir in forward else own_kings
+				if not pieces:
+					continue
+				north, even, a, odd, b = SHIFTS[dir]
+				if north:
+					step = ((pieces & even) >> a) | ((pieces & odd) >> b)
+					over = step & enemy
+					jump = (((over & even) >> a) | ((over & odd) >> b)) & empty
+				else:
+					step = (((pieces & even) << a) | ((pieces & odd) << b)) & FULL
+					over = step & enemy
+					jump = (((over & even) << a) | ((over & odd) << b)) & FULL & empty
+				if jump:
+					jumps.append((dir, jump))
+				if step & empty:
+					steps.append((dir, step & empty))
+
+			# a piece that can capture only has its captures, in the order of the directions
+			capturing = set()
+			for dir, landing in jumps:
+				sources = JUMP_SOURCES[dir]
+				while landing:
+					low = landing & -landing
+					landing ^= low
+					index = low.bit_length() - 1
+					pixel = PIXELS[sources[index]]
+					capturing.add(pixel)
+					if pixel in moves:
+						moves[pixel].append(PIXELS[index])
+					else:
+						moves[pixel] = [PIXELS[index]]
+			moving = set(capturing)
+			for dir, landing in steps:
+				sources = STEP_SOURCES[dir]
+				while landing:
+					low = landing & -landing
+					landing ^= low
+					index = low.bit_length() - 1
+					pixel = PIXELS[sources[index]]
+					if pixel in capturing:
+						continue
+					moving.add(pixel)
+					if pixel in moves:
+						moves[pixel].append(PIXELS[index])
+					else:
+						moves[pixel] = [PIXELS[index]]
+			movers[color] = moving
+			capturers[color] = capturing
+		return moves, movers, capturers
+
+	def has_legal_moves(self, color):
+		"""
+		Returns True if a piece of the given color has a legal move.
+		"""
+		return self.movers(color) != 0
+
+	def remove_piece(self, pixel):
+		"""
+		Removes a piece from the board at position (x,y).
+		"""
+		keep = ~square_bit(pixel)
+		self.red &= keep
+		self.blue &= keep
+		self.kings &= keep
+
+	def place_piece(self, pixel, piece):
+		"""
+		Puts piece (a Piece, or None to empty the square) on the square (x,y), without kinging it.
+		"""
+		self.remove_piece(pixel)
+		if piece is not None:
+			bit = square_bit(pixel)
+			if piece.color == RED:
+				self.red |= bit
+			else:
+				self.blue |= bit
+			if piece.king:
+				self.kings |= bit
+
+	def move_piece(self, pixel_start, pixel_end):
+		"""
+		Move a piece from (start_x, start_y) to (end_x, end_y).
+		"""
+		start = SQUARES[pixel_start][0]
+		end = SQUARES[pixel_end][0]
+		moved = start | end
+		red = self.red & start
+		blue = self.blue & start
+		king = self.kings & start
+
+		self.red &= ~moved
+		self.blue &= ~moved
+		self.kings &= ~moved
+		if red:
+			self.red |= end
+		if blue:
+			self.blue |= end
+		if king:
+			self.kings |= end
+
+		self.kings |= end & ((self.blue & ROW_0) | (self.red & ROW_7))
+
+	def king(self, pixel):
+		"""
+		Takes in (x,y), the coordinates of square to be considered for kinging.
+		If it meets the criteria, then king() kings the piece in that square and kings it.
+		"""
+		self.kings |= square_bit(pixel) & ((self.blue & ROW_0) | (self.red & ROW_7))
+
+
+class Piece:
+	__slots__ = ("color", "king") # BitBoard.location() creates them on every call
+
+	def __init__(self, color, king = False):
+		self.color = color
+		self.king = king
+
+class Square:
+	__slots__ = ("color", "occupant")
+
+	def __init__(self, color, occupant = None):
+		self.color = color # color is either BLACK or WHITE
+		self.occupant = occupant # occupant is a Square object
+
+class MoveTracker:
+	"""
+	Keeps the legal moves of every piece of a Board or BitBoard up to date while moves are played.
+	The moves of a piece only depend on the squares one and two diagonal steps away, so after a move on
+	a Board only the pieces around the start, end and captured squares are recomputed. A BitBoard
+	regenerates every move from its masks instead, which costs less than those legal_moves() calls.
+	Whether a colour can move or has a capture pending is then a lookup instead of a scan of the board.
+	"""
+
+	# the squares whose legal moves can change when the square (0,0) changes
+	NEIGHBOURHOOD = [(0,0)] + [(dx * d, dy * d) for d in (1, 2) for dx in (-1, 1) for dy in (-1, 1)]
+
+	def __init__(self, board):
+		self.board = board
+		self.moves = {} # (x,y) -> board.legal_moves((x,y)), for the pieces that can move
+		self.movers = {RED: set(), BLUE: set()}
+		self.capturers = {RED: set(), BLUE: set()}
+		# a BitBoard generates the moves of the whole board from its masks faster than around a move
+		self.whole_board = hasattr(board, "all_moves")
+		if self.whole_board:
+			self.rebuild()
+		else:
+			for x in range(8):
+				for y in range(8):
+					if (x + y) % 2 == 0:
+						self.refresh((x,y))
+
+	def rebuild(self):
+		"""
+		Recomputes the legal moves of every piece with board.all_moves().
+		"""
+		self.moves, self.movers, self.capturers = self.board.all_moves()
+
+	def refresh(self, pixel):
+		"""
+		Recomputes the legal moves of the piece on the given square, if there is one.
+		"""
+		if self.moves.pop(pixel, None) is not None:
+			for color in (RED, BLUE):
+				self.movers[color].discard(pixel)
+				self.capturers[color].discard(pixel)
+
+		legal_moves = self.board.legal_moves(pixel)
+		if legal_moves:
+			color = self.board.location(pixel).occupant.color
+			self.moves[pixel] = legal_moves
+			self.movers[color].add(pixel)
+			if abs(legal_moves[0][0] - pixel[0]) > 1:
+				self.capturers[color].add(pixel)
+
+	def move(self, start, end):
+		"""
+		Moves the piece on start to end, removes the piece it jumped over if any, and updates the legal moves
+		of the pieces around them. Returns the square of the captured piece, or None.
+		"""
+		self.board.move_piece(start, end)
+		changed = [start, end]
+		captured = None
+		if abs(start[0] - end[0]) > 1:
+			captured = ((start[0] + end[0]) >> 1, (start[1] + end[1]) >> 1)
+			self.board.remove_piece(captured)
+			changed.append(captured)
+
+		if self.whole_board:
+			self.rebuild()
+			return captured
+
+		stale = set()
+		for x, y in changed:
+			for dx, dy in self.NEIGHBOURHOOD:
+				if 0 <= x + dx < 8 and 0 <= y + dy < 8:
+					stale.add((x + dx, y + dy))
+		for pixel in stale:
+			self.refresh(pixel)
+		return captured
+
+	def has_legal_moves(self, color):
+		"""
+		Same as board.has_legal_moves(color).
+		"""
+		return len(self.movers[color]) > 0
+
+	def has_captures(self, color):
+		"""
+		Returns True if a piece of the given color can capture.
+		"""
+		return len(self.capturers[color]) > 0
+
+	def turn_moves(self, color):
+		"""
+		Returns {(x,y): legal moves} for the pieces of the given color, only those that can capture if there is one.
+		"""
+		pixels = self.capturers[color] or self.movers[color]
+		return {pixel: self.moves[pixel] for pixel in pixels}
+
+def cross_check(num_games = 200, max_plies = 200, seed = 0):
+	"""
+	Plays random games on a Board and a BitBoard side by side and checks after every move
+	that both boards agree on every square and every list of legal moves, and that their
+	MoveTrackers agree with the legal moves computed from scratch.
+	Returns the number of positions compared.
+	"""
+	rng = random.Random(seed)
+	positions = 0
+
+	for game in range(num_games):
+		board = Board()
+		bitboard = BitBoard()
+		trackers = [MoveTracker(board), MoveTracker(bitboard)]
+		turn = BLUE
+
+		for ply in range(max_plies):
+			moves = []
+			all_moves = {}
+			for x in range(8):
+				for y in range(8):
+					square = board.location((x,y))
+					bitsquare = bitboard.location((x,y))
+					assert square.color == bitsquare.color, (game, ply, (x,y))
+					assert (square.occupant is None) == (bitsquare.occupant is None), (game, ply, (x,y))
+					if square.occupant is not None:
+						assert square.occupant.color == bitsquare.occupant.color, (game, ply, (x,y))
+						assert square.occupant.king == bitsquare.occupant.king, (game, ply, (x,y))
+
+					legal_moves = board.legal_moves((x,y))
+					assert legal_moves == bitboard.legal_moves((x,y)), (game, ply, (x,y))
+					if legal_moves:
+						all_moves[(x,y)] = legal_moves
+					if square.occupant is not None and square.occupant.color == turn:
+						moves += [((x,y), move) for move in legal_moves]
+
+			assert board.has_legal_moves(turn) == bitboard.has_legal_moves(turn), (game, ply)
+			for tracker in trackers:
+				assert tracker.moves == all_moves, (game, ply)
+				assert tracker.has_legal_moves(turn) == board.has_legal_moves(turn), (game, ply)
+			positions += 1
+			if not moves:
+				break
+
+			start, end = rng.choice(moves)
+			for tracker in trackers:
+				tracker.move(start, end)
+
+			turn = RED if turn == BLUE else BLUE
+
+	return positions
+
+if __name__ == "__main__":
+	print("Board and BitBoard agree on {} positions".format(cross_check()))
@@ -0,0 +1,214 @@
+import os
+import time
+import argparse
+import numpy as np
+from heuristics import np_board, get_metrics_batch
+from transposition import TranspositionTable, PositionCache, zobrist_hash
+from numpy_model import load_evaluator
+from endgame import EndgameTable
+
+# Iterative-deepening negamax alpha-beta over the heuristics.py rules.
+# A node is a compressed (32,) board seen by the player to move (positive pieces are theirs).
+# Its moves are the boards of generate_next(), seen by the same player; the opponent's node
+# after a move is the reversed board, -child[::-1].
+# Nodes one ply above the horizon evaluate all their children with a single call to the evaluator,
+# so a keras model runs one predict_on_batch per frontier node instead of one per leaf.
+# With an endgame.EndgameTable, positions with few pieces get their exact value instead.
+
+WIN = 1e6 # value of a won position, larger than any evaluation
+EXACT, LOWER, UPPER = 0, 1, 2
+
+# weights of the get_metrics() columns in its labelling score
+SCORE_WEIGHTS = np.array([2, 1, 2, 4, 1, 2, 3, 2, 1, 100])
+
+def metrics_evaluator(boards):
+    """Evaluate (N, 32) boards with the heuristic score get_metrics() labels them with."""
+    return get_metrics_batch(boards)[:, 1:] @ SCORE_WEIGHTS
+
+def load_disc_model(json_path="disc.json", weights_path="disc.h5"):
+    """
+    Load the disc model trained by train.py and return it as an evaluator of (N, 32) boards.
+    numpy_model.load_evaluator() gives the same evaluator without keras, from an exported disc.npz.
+    """
+    from keras.models import model_from_json
+
+    with open(json_path) as json_file:
+        model = model_from_json(json_file.read())
+    model.load_weights(weights_path)
+    return lambda boards: np.asarray(model.predict_on_batch(np.asarray(boards, dtype=np.float32)))[:, 0]
+
+class SearchTimeout(Exception):
+    pass
+
+class AlphaBetaSearch:
+    """
+    Iterative-deepening alpha-beta search with a time budget per move.
+    Moves are ordered transposition-table move first, then captures (most pieces taken first),
+    then killer moves of the same ply, then by the history heuristic.
+    """
+
+    def __init__(self, evaluate=metrics_evaluator, time_budget=1.0, max_depth=32, table_size=1 << 18, endgame=None):
+        self.evaluate = evaluate
+        self.endgame = endgame
+        self.time_budget = time_budget
+        self.max_depth = max_depth
+        self.table = TranspositionTable(table_size, policy="depth")
+        self.cache = PositionCache(table_size)
+        self.history = {}
+        self.killers = {}
+
+    def moves(self, board):
+        """Return the children of board and the (from square, to square) key of each move."""
+        children = self.cache.next_boards(board)
+        vacated = (board > 0) & (children <= 0)
+        arrived = (children > 0) & (board <= 0)
+        return children, (np.argmax(vacated, axis=1) * 32 + np.argmax(arrived, axis=1)).tolist()
+
+    def endgame_values(self, boards, ply):
+        """Return which of (N, 32) boards at ply the endgame table has, and their exact values."""
+        results, plies = self.endgame.probe_batch(boards)
+        exact = np.where(results == 1, WIN - ply - plies, np.where(results == -1, -WIN + ply + plies, 0.0))
+        return results != 2, exact
+
+    def evaluate_children(self, children, ply):
+        """Evaluate the children of a node at ply in one batch, exactly where the endgame table has them."""
+        values = self.cache.evaluate(children, self.evaluate)
+        self.evaluations += len(children)
+        self.batches += 1
+        if self.endgame is not None:
+            known, exact = self.endgame_values(-children[:, ::-1], ply + 1)
+            values[known] = -exact[known]
+        return values
+
+    def order(self, board, children, keys, ply, best_key):
+        """Return the indices of children, best moves first."""
+        captured = np.sum(board < 0) - np.sum(children < 0, axis=1)
+        killers = self.killers.get(ply, ())
+        scores = []
+        for i, key in enumerate(keys):
+            score = self.history.get(key, 0)
+            if key == best_key:
+                score += 1e12
+            elif captured[i] > 0:
+                score += 1e9 * captured[i]
+            elif key in killers:
+                score += 1e8
+            scores.append(score)
+        return sorted(range(len(keys)), key=lambda i: -scores[i])
+
+    def negamax(self, board, depth, alpha, beta, ply):
+        self.nodes += 1
+        if (self.nodes & 255) == 0 and time.perf_counter() > self.deadline:
+            raise SearchTimeout()
+
+        if self.endgame is not None:
+            known, exact = self.endgame_values(board[None], ply)
+            if known[0]:
+                return float(exact[0])
+
+        key = zobrist_hash(board)
+        entry = self.table.get(key, depth)
+        best_key = None
+        if entry is not None:
+            value, flag, best_key = entry
+            if flag == EXACT or (flag == LOWER and value >= beta) or (flag == UPPER and value <= alpha):
+                return value
+
+        children, keys = self.moves(board)
+        if len(children) == 0:
+            return -WIN + ply
+
+        if depth == 1:
+            values = self.evaluate_children(children, ply)
+            best = int(np.argmax(values))
+            value = float(values[best])
+            self.table.put(key, (value, EXACT, keys[best]), depth)
+            return value
+
+        original_alpha = alpha
+        value = -np.inf
+        for i in self.order(board, children, keys, ply, best_key):
+            score = -self.negamax(-children[i][::-1], depth - 1, -beta, -alpha, ply + 1)
+            if score > value:
+                value = score
+                best_key = keys[i]
+            alpha = max(alpha, score)
+            if alpha >= beta:
+                if keys[i] not in self.killers.get(ply, ()):
+                    self.killers[ply] = (keys[i],) + self.killers.get(ply, ())[:1]
+                self.history[keys[i]] = self.history.get(keys[i], 0) + depth * depth
+                break
+
+        flag = UPPER if value <= original_alpha else LOWER if value >= beta else EXACT
+        self.table.put(key, (value, flag, best_key), depth)
+        return value
+
+    def search(self, board):
+        """
+        Return the best child of board found within the time budget, its value and the search statistics.
+        Returns (None, -WIN, stats) if board has no legal move.
+        """
+        start = time.perf_counter()
+        self.deadline = start + self.time_budget
+        self.nodes = self.evaluations = self.batches = 0
+        self.killers = {}
+
+        children, keys = self.moves(board)
+        if len(children) == 0:
+            return None, -WIN, {"depth": 0, "nodes": 0, "evaluations": 0, "seconds": 0.0, "nodes_per_sec": 0.0}
+
+        best, best_value, depth_reached = 0, -np.inf, 0
+        order = list(range(len(children)))
+        for depth in range(1, self.max_depth + 1):
+            try:
+                if depth == 1:
+                    values = self.evaluate_children(children, 0).tolist()
+                else:
+                    values = [-np.inf] * len(children)
+                    alpha = -np.inf
+                    for i in order:
+                        values[i] = -self.negamax(-children[i][::-1], depth - 1, -np.inf, -alpha, 1)
+                        alpha = max(alpha, values[i])
+            except SearchTimeout:
+                break
+            order = sorted(range(len(children)), key=lambda i: -values[i])
+            best, best_value, depth_reached = order[0], values[order[0]], depth
+            if abs(best_value) >= WIN - self.max_depth or time.perf_counter() > self.deadline:
+                break
+
+        elapsed = time.perf_counter() - start
+        stats = {"depth": depth_reached, "nodes": self.nodes, "evaluations": self.evaluations, "batches": self.batches,
+                 "seconds": elapsed, "nodes_per_sec": self.nodes / elapsed if elapsed > 0 else 0.0}
+        return children[best], best_value, stats
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Alpha-beta search benchmark from the initial position")
+    parser.add_argument("--budgets", type=float, nargs="+", default=[0.25, 1.0, 4.0], help="seconds per move")
+    parser.add_argument("--moves", type=int, default=6, help="moves played per budget")
+    args = parser.parse_args()
+
+    if os.path.exists("disc.npz"):
+        evaluate, name = load_evaluator("disc.npz"), "disc model (NumPy, disc.npz)"
+    elif os.path.exists("disc.json") and os.path.exists("disc.h5"):
+        evaluate, name = load_disc_model(), "disc model (keras)"
+    else:
+        evaluate, name = metrics_evaluator, "get_metrics score (disc.json/disc.h5 not found)"
+    print(f"evaluator: {name}")
+    endgame = None
+    if os.path.exists("endgame.npy"):
+        endgame = EndgameTable("endgame.npy")
+        print(f"endgame table: up to {endgame.max_pieces} pieces")
+
+    for budget in args.budgets:
+        searcher = AlphaBetaSearch(evaluate, time_budget=budget, endgame=endgame)
+        board = np_board()
+        depths, nodes, seconds = [], 0, 0.0
+        for move in range(args.moves):
+            child, value, stats = searcher.search(board)
+            if child is None:
+                break
+            depths.append(stats["depth"])
+            nodes += stats["nodes"]
+            seconds += stats["seconds"]
+            board = -child[::-1]
+        print(f"budget {budget:5.2f}s: depth reached {depths}, {nodes / seconds:,.0f} nodes/sec")
@@ -0,0 +1,240 @@
+import os
+import time
+import argparse
+import multiprocessing
+from multiprocessing import shared_memory
+import numpy as np
+from gym import spaces
+from gym.vector import VectorEnv
+
+# Unchanged EnvCheckers games run in worker processes, a contiguous slice of games per worker.
+# Observations, action masks, rewards, dones and actions live in shared memory blocks: the learner
+# writes the actions and reads the rest in place. The pipes only carry command names one way and
+# the indices of finished games the other way, so no array is pickled per step.
+
+def _block_specs(num_envs, num_actions, masks, obs_shape=(8, 8)):
+    """(shape, dtype) of every shared array."""
+    specs = {
+        "observations": ((num_envs,) + obs_shape, np.int8),
+        "final_observations": ((num_envs,) + obs_shape, np.int8),
+        "actions": ((num_envs,), np.int64),
+        "rewards": ((num_envs,), np.float32),
+        "dones": ((num_envs,), np.bool_),
+    }
+    if masks:
+        specs["action_masks"] = ((num_envs, num_actions), np.bool_)
+    return specs
+
+def _open_arrays(blocks, specs):
+    """Return numpy views of shared memory blocks, given {name: block name} and {name: (shape, dtype)}."""
+    handles = {name: shared_memory.SharedMemory(name=block) for name, block in blocks.items()}
+    arrays = {name: np.ndarray(shape, dtype=dtype, buffer=handles[name].buf) for name, (shape, dtype) in specs.items()}
+    return handles, arrays
+
+def _worker(conn, blocks, specs, start, stop, env_kwargs):
+    from gym_checkers import EnvCheckers
+
+    handles, arrays = _open_arrays(blocks, specs)
+    observations = arrays["observations"]
+    final_observations = arrays["final_observations"]
+    actions = arrays["actions"]
+    rewards = arrays["rewards"]
+    dones = arrays["dones"]
+    masks = arrays.get("action_masks")
+    envs = [EnvCheckers(**env_kwargs) for _ in range(start, stop)]
+
+    try:
+        while True:
+            command = conn.recv()
+            if command == "step":
+                finished = []
+                for i, env in enumerate(envs, start):
+                    obs, reward, done, info = env.step(int(actions[i]))
+                    rewards[i] = reward
+                    dones[i] = done
+                    if done:
+                        final_observations[i] = obs
+                        obs = env.reset()
+                        finished.append(i)
+                    observations[i] = obs
+                    if masks is not None:
+                        masks[i] = env.action_masks()
+                conn.send(finished)
+            elif command == "reset":
+                for i, env in enumerate(envs, start):
+                    observations[i] = env.reset()
+                    if masks is not None:
+                        masks[i] = env.action_masks()
+                conn.send(None)
+            elif command == "close":
+                break
+    except (KeyboardInterrupt, EOFError):
+        pass
+    finally:
+        # the views must go before the blocks can be closed
+        del observations, final_observations, actions, rewards, dones, masks, arrays
+        for handle in handles.values():
+            handle.close()
+        conn.close()
+
+class SubprocVecEnvCheckers(VectorEnv):
+    """
+    num_envs EnvCheckers stepped by num_workers processes (all cores by default).
+    Finished games are reset automatically, their last observation is in infos["final_observation"]
+    like VecEnvCheckers. With masks=True, infos["action_mask"] and action_masks() give the legal actions.
+    step_async() returns as soon as the workers are told to step, so the learner can work until step_wait().
+    """
+
+    def __init__(self, num_envs=64, num_workers=None, env_kwargs=None, masks=True, context=None):
+        from gym_checkers import OBSERVATION_SPACES
+
+        # the workers copy every observation into shared memory, the env does not need to copy it first
+        env_kwargs = {"headless": True, "verbose": 0, "copy_obs": False, **(env_kwargs or {})}
+        num_actions = 256 if env_kwargs.get("compact") else 64 * 64
+        observation_space = OBSERVATION_SPACES[env_kwargs.get("obs_format", "board")]
+        super(SubprocVecEnvCheckers, self).__init__(num_envs, observation_space, spaces.Discrete(num_actions))
+        num_workers = min(num_workers or os.cpu_count(), num_envs)
+        specs = _block_specs(num_envs, num_actions, masks, observation_space.shape)
+
+        self._handles = {}
+        self._arrays = {}
+        for name, (shape, dtype) in specs.items():
+            size = max(int(np.prod(shape)) * np.dtype(dtype).itemsize, 1)
+            self._handles[name] = shared_memory.SharedMemory(create=True, size=size)
+            self._arrays[name] = np.ndarray(shape, dtype=dtype, buffer=self._handles[name].buf)
+        blocks = {name: handle.name for name, handle in self._handles.items()}
+
+        ctx = multiprocessing.get_context(context)
+        bounds = np.linspace(0, num_envs, num_workers + 1).astype(int)
+        self.pipes = []
+        self.processes = []
+        for start, stop in zip(bounds[:-1], bounds[1:]):
+            parent, child = ctx.Pipe()
+            process = ctx.Process(target=_worker, args=(child, blocks, specs, int(start), int(stop), env_kwargs), daemon=True)
+            process.start()
+            child.close()
+            self.pipes.append(parent)
+            self.processes.append(process)
+        self.reset()
+
+    def reset_async(self, seed=None, options=None):
+        for pipe in self.pipes:
+            pipe.send("reset")
+
+    def reset_wait(self, seed=None, options=None):
+        """Reset every game to its initial state."""
+        for pipe in self.pipes:
+            pipe.recv()
+        return self._arrays["observations"].copy()
+
+    def step_async(self, actions):
+        self._arrays["actions"][:] = actions
+        for pipe in self.pipes:
+            pipe.send("step")
+
+    def step_wait(self):
+        finished = []
+        for pipe in self.pipes:
+            finished += pipe.recv()
+
+        infos = {}
+        if finished:
+            infos["final_observation"] = self._arrays["final_observations"].copy()
+            infos["_final_observation"] = self._arrays["dones"].copy()
+        if "action_masks" in self._arrays:
+            infos["action_mask"] = self._arrays["action_masks"].copy()
+        return self._arrays["observations"].copy(), self._arrays["rewards"].copy(), self._arrays["dones"].copy(), infos
+
+    def action_masks(self):
+        """Return the (num_envs, num_actions) legal-action masks of the current positions, as a read-only view that the next step updates."""
+        masks = self._arrays["action_masks"].view()
+        masks.setflags(write=False)
+        return masks
+
+    def close_extras(self, **kwargs):
+        for pipe in self.pipes:
+            try:
+                pipe.send("close")
+            except (BrokenPipeError, OSError):
+                pass
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        for pipe in self.pipes:
+            pipe.close()
+        self._arrays = {}
+        for handle in self._handles.values():
+            handle.close()
+            handle.unlink()
+
+def sample_masked(masks, rng):
+    """Return one uniformly chosen legal action per row of masks (action 0 where there is none)."""
+    actions = np.zeros(len(masks), dtype=np.int64)
+    for e, mask in enumerate(masks):
+        legal = np.flatnonzero(mask)
+        if len(legal):
+            actions[e] = legal[rng.integers(len(legal))]
+    return actions
+
+def check_against_envs(num_envs=8, num_workers=2, num_steps=500, seed=0):
+    """Step SubprocVecEnvCheckers and num_envs in-process EnvCheckers with the same actions and assert they agree."""
+    from gym_checkers import EnvCheckers
+
+    rng = np.random.default_rng(seed)
+    vec_env = SubprocVecEnvCheckers(num_envs, num_workers)
+    envs = [EnvCheckers(headless=True, verbose=0) for _ in range(num_envs)]
+    try:
+        for i in range(num_steps):
+            # half of the actions are legal moves, the rest are random (mostly illegal) actions
+            actions = np.where(rng.random(num_envs) < 0.5, sample_masked(vec_env.action_masks(), rng), rng.integers(0, 64 * 64, size=num_envs))
+            obs, rewards, dones, infos = vec_env.step(actions)
+            for e, env in enumerate(envs):
+                scalar_obs, reward, done, info = env.step(int(actions[e]))
+                final_obs = infos["final_observation"][e] if done else obs[e]
+                assert np.array_equal(scalar_obs, final_obs), (i, e)
+                assert reward == rewards[e] and done == dones[e], (i, e, reward, rewards[e])
+                if done:
+                    assert np.array_equal(env.reset(), obs[e]), (i, e)
+                assert np.array_equal(env.action_masks(), infos["action_mask"][e]), (i, e)
+    finally:
+        vec_env.close()
+
+def benchmark(num_envs, num_workers, num_steps=200, seed=0):
+    """Return the number of env-steps per second with legal random actions, from num_workers processes."""
+    rng = np.random.default_rng(seed)
+    env = SubprocVecEnvCheckers(num_envs, num_workers)
+    try:
+        start = time.perf_counter()
+        for i in range(num_steps):
+            env.step(sample_masked(env.action_masks(), rng))
+        return num_envs * num_steps / (time.perf_counter() - start)
+    finally:
+        env.close()
+
+def benchmark_in_process(num_envs, num_steps=200, seed=0):
+    """The same loop over EnvCheckers in this process, the baseline of benchmark()."""
+    from gym_checkers import EnvCheckers
+
+    rng = np.random.default_rng(seed)
+    envs = [EnvCheckers(headless=True, verbose=0) for _ in range(num_envs)]
+    start = time.perf_counter()
+    for i in range(num_steps):
+        actions = sample_masked([env.action_masks() for env in envs], rng)
+        for env, action in zip(envs, actions):
+            if env.step(int(action))[2]:
+                env.reset()
+    return num_envs * num_steps / (time.perf_counter() - start)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="SubprocVecEnvCheckers check and scaling benchmark")
+    parser.add_argument("--envs", type=int, default=64)
+    parser.add_argument("--steps", type=int, default=200)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+
+    check_against_envs()
+    print("SubprocVecEnvCheckers matches EnvCheckers")
+    print(f"in-process: {benchmark_in_process(args.envs, args.steps):10,.0f} steps/sec ({args.envs} envs)")
+    for workers in sorted({2 ** k for k in range(args.max_workers.bit_length())} | {args.max_workers}):
+        print(f"{workers:3d} workers: {benchmark(args.envs, workers, args.steps):10,.0f} steps/sec")
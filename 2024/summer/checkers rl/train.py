@@ -0,0 +1,138 @@
+import numpy as np
+from keras.models import Sequential
+from keras.layers import Dense
+from keras import regularizers
+from heuristics import np_board, expand, reverse, possible_moves, generate_next, get_metrics_batch
+from datagen import Deduplicator
+
+# Training script of the gen and disc models, run with `python train.py` (or `python functions.py`).
+# It is the only module of the package that imports keras at import time.
+
+# the frontiers of consecutive sets overlap, so every set is deduplicated (after canonicalization,
+# see datagen.canonical_batch) against itself and every earlier set before it is labelled and fitted:
+# seen holds every position trained on so far, and only the positions new to it are kept. Every set restarts
+# from the children of the initial board, so once the expansion repeats itself a set can be empty and is skipped
+def unique_positions(data, seen):
+    unique = seen.filter(data)
+    print(f"Positions: {len(data)}, not in this or earlier sets: {len(unique)}")
+    return unique
+
+def main():
+    # generative model, which only looks at heuristic scoring metrics used for labeling
+    gen_model = Sequential()
+    gen_model.add(Dense(32, activation='relu', input_dim=10)) 
+    gen_model.add(Dense(16, activation='relu',  kernel_regularizer=regularizers.l2(0.1)))
+
+    # output is passed to relu() because labels are binary
+    gen_model.add(Dense(1, activation='relu',  kernel_regularizer=regularizers.l2(0.1)))
+    gen_model.compile(optimizer='nadam', loss='binary_crossentropy')
+
+    board_0 = expand(np_board())
+    boards_1 = generate_next(board_0)
+    boards_2 = np.zeros((0,32))
+
+    counter_1 = counter_2 = 0
+    seen = Deduplicator()
+
+    # generate 5 sets of 1000 game states, used to train generative model
+    for i in range(0, 5):
+        while (len(boards_1) + len(boards_2) < 1000):
+            temp = counter_1
+            for counter_1 in range(temp, min(temp + 10, len(boards_1))):
+                if (possible_moves(reverse(expand(boards_1[counter_1]))) > 0):
+                    boards_2 = np.vstack((boards_2, generate_next(reverse(expand(boards_1[counter_1])))))
+            temp = counter_2
+            for counter_2 in range(temp, min(temp + 10, len(boards_2))):
+                if (possible_moves(expand(boards_2[counter_2])) > 0):
+                    boards_1 = np.vstack((boards_1, generate_next(expand(boards_2[counter_2]))))
+
+        # concat 1000 game states
+        data = unique_positions(np.vstack((boards_1, boards_2)), seen)
+        boards_2 = np.zeros((0, 32))
+        counter_2 = 0
+        boards_1 = np.vstack((boards_1[-10:], generate_next(board_0)))
+        counter_1 = len(boards_1) - 1
+        if (len(data) == 0):
+            continue
+
+        # calculate/save heuristic metrics for each game state
+        metrics = get_metrics_batch(data)
+
+        # pass to generative model
+        print("Shape: ", metrics.shape)
+        gen_model.fit(metrics[:, 1:], metrics[:, 0], epochs=32, batch_size=64)
+
+    # discriminative model
+    disc_model = Sequential()
+
+    # input dimensions is 32 board position values (and 10 heuristic metrics - removed)
+    disc_model.add(Dense(64 , activation='relu', input_dim=32))
+
+    # use regularizers, to prevent fitting noisy labels
+    disc_model.add(Dense(32 , activation='relu', kernel_regularizer=regularizers.l2(0.01)))
+    disc_model.add(Dense(16 , activation='relu', kernel_regularizer=regularizers.l2(0.01))) # 16
+    disc_model.add(Dense(8 , activation='relu', kernel_regularizer=regularizers.l2(0.01))) # 8
+
+    # output isn't squashed, because it might lose information
+    disc_model.add(Dense(1 , activation='linear', kernel_regularizer=regularizers.l2(0.01)))
+    disc_model.compile(optimizer='nadam', loss='binary_crossentropy')
+
+    boards_1 = generate_next(board_0)
+    boards_2 = np.zeros((0,32))
+    counter_1 = counter_2 = 0
+    seen = Deduplicator()
+
+    # generative 32 sets of 1000 game states, used to train discriminative model
+    for i in range(0, 32):
+        while (len(boards_1) + len(boards_2) < 1000):
+            temp = counter_1
+            for counter_1 in range(temp, min(temp + 10, len(boards_1))):
+                if (possible_moves(reverse(expand(boards_1[counter_1]))) > 0):
+                    boards_2 = np.vstack((boards_2, generate_next(reverse(expand(boards_1[counter_1])))))
+            temp = counter_2
+            for counter_2 in range(temp, min(temp + 10, len(boards_2))):
+                if (possible_moves(expand(boards_2[counter_2])) > 0):
+                    boards_1 = np.vstack((boards_1, generate_next(expand(boards_2[counter_2]))))
+
+        data = unique_positions(np.vstack((boards_1, boards_2)), seen)
+        boards_2 = np.zeros((0, 32))
+        counter_2 = 0
+        boards_1 = np.vstack((boards_1[-10:], generate_next(board_0)))
+        counter_1 = len(boards_1) - 1
+        if (len(data) == 0):
+            continue
+
+        # calculate heuristic metric for data
+        metrics = get_metrics_batch(data)
+
+        # maybe pass it to generative model too
+        if (np.random.random() > 0.75):
+            gen_model.fit(metrics[:, 1:], metrics[:, 0], epochs=16, batch_size=32, verbose=0)
+
+        # calculate probilistic (noisy) labels
+        probabilistic = gen_model.predict_on_batch(metrics[:, 1:])
+
+        # calculate confidence score for each probabilistic label using error between probabilistic and weak label
+        confidence = 1/(1 + np.absolute(metrics[:, 0] - probabilistic[:, 0]))
+
+        # fit labels to {-1, 1}
+        probabilistic = np.sign(probabilistic)
+
+        # concat board position data with heurstic metric and pass for training - removed
+        disc_model.fit(data, probabilistic, epochs=32, batch_size=64, sample_weight=confidence, verbose=0)
+
+    # save models
+    gen_json = gen_model.to_json()
+    with open('gen.json', 'w') as json_file:
+        json_file.write(gen_json)
+    gen_model.save_weights('gen.h5')
+
+    disc_json = disc_model.to_json()
+    with open('disc.json', 'w') as json_file:
+        json_file.write(disc_json)
+    disc_model.save_weights('disc.h5')
+    print('Checkers Model saved to: gen.json/h5 and disc.json/h5')
+
+
+if __name__ == "__main__":
+    main()
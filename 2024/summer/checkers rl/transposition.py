@@ -0,0 +1,182 @@
+import time
+from collections import OrderedDict
+import numpy as np
+from heuristics import np_board, expand, get_metrics, game_winner, generate_next
+
+# Zobrist hashing of compressed 32-square boards (see heuristics.compress):
+# one random 64-bit key per (square, piece value), XOR-ed together. Empty squares add nothing.
+SQUARES = np.arange(32)
+ZOBRIST = np.random.default_rng(20240917).integers(0, 2**63, size=(32, 7), dtype=np.uint64)
+ZOBRIST[:, 3] = 0 # value 0, empty square
+
+def zobrist_hash(board):
+    """Return the 64-bit Zobrist hash of a compressed (32,) or (1, 32) board, as compress() returns it."""
+    return int(np.bitwise_xor.reduce(ZOBRIST[SQUARES, np.asarray(board, dtype=np.int64).reshape(-1) + 3]))
+
+def zobrist_hash_batch(boards):
+    """Return the (N,) uint64 Zobrist hashes of compressed (N, 32) boards."""
+    return np.bitwise_xor.reduce(ZOBRIST[SQUARES, np.asarray(boards, dtype=np.int64).reshape(-1, 32) + 3], axis=1)
+
+def update_hash(key, square, old, new):
+    """Return the hash of a board after its square changed from value old to value new."""
+    return key ^ int(ZOBRIST[square, old + 3]) ^ int(ZOBRIST[square, new + 3])
+
+class TranspositionTable:
+    """
+    A bounded map from position hashes to cached values.
+
+    policy="lru" keeps the most recently used entries.
+    policy="depth" is a fixed array of slots indexed by key % capacity, where a colliding entry
+    only replaces the stored one if it was searched at least as deep.
+    """
+
+    def __init__(self, capacity=1 << 20, policy="lru"):
+        if policy not in ("lru", "depth"):
+            raise ValueError(f"unknown replacement policy {policy!r}, expected 'lru' or 'depth'")
+        self.capacity = capacity
+        self.policy = policy
+        self.clear()
+
+    def clear(self):
+        """Remove every entry and reset the counters."""
+        self.entries = OrderedDict() if self.policy == "lru" else [None] * self.capacity
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self.rejected = 0
+
+    def __len__(self):
+        return self.size
+
+    def get(self, key, depth=0):
+        """Return the value stored for key with at least the given depth, or None."""
+        if self.policy == "lru":
+            entry = self.entries.get(key)
+            if entry is not None and entry[0] >= depth:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+        else:
+            entry = self.entries[key % self.capacity]
+            if entry is not None and entry[0] == key and entry[1] >= depth:
+                self.hits += 1
+                return entry[2]
+        self.misses += 1
+        return None
+
+    def put(self, key, value, depth=0):
+        """Store value for key, evicting an entry if the table is full."""
+        self.stores += 1
+        if self.policy == "lru":
+            if key in self.entries:
+                self.entries.move_to_end(key)
+            elif self.size == self.capacity:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+            else:
+                self.size += 1
+            self.entries[key] = (depth, value)
+        else:
+            slot = key % self.capacity
+            entry = self.entries[slot]
+            if entry is None:
+                self.size += 1
+            elif entry[0] != key:
+                if entry[1] > depth:
+                    self.rejected += 1
+                    return
+                self.evictions += 1
+            self.entries[slot] = (key, depth, value)
+
+    def stats(self):
+        """Return the counters of the table."""
+        lookups = self.hits + self.misses
+        return {"size": self.size, "capacity": self.capacity, "policy": self.policy,
+                "hits": self.hits, "misses": self.misses, "hit_rate": self.hits / lookups if lookups else 0.0,
+                "stores": self.stores, "evictions": self.evictions, "rejected": self.rejected}
+
+class PositionCache:
+    """
+    Memoized heuristics.py position evaluation for compressed (32,) or (1, 32) boards, one LRU TranspositionTable
+    per quantity: get_metrics(), generate_next() (the legal successors), game_winner() and any batched evaluator
+    such as the disc model. These values do not depend on a search depth, so the "depth" policy has no use here.
+    """
+
+    def __init__(self, capacity=1 << 18):
+        self.tables = {name: TranspositionTable(capacity) for name in ("metrics", "moves", "winner", "evaluation")}
+
+    def _cached(self, name, board, compute):
+        board = np.asarray(board).reshape(-1)
+        key = zobrist_hash(board)
+        value = self.tables[name].get(key)
+        if value is None:
+            value = compute(board)
+            self.tables[name].put(key, value)
+        return value
+
+    def metrics(self, board):
+        """Cached get_metrics(board)."""
+        return self._cached("metrics", board, get_metrics)
+
+    def next_boards(self, board):
+        """Cached generate_next(expand(board)), returned read-only."""
+        def compute(board):
+            boards = generate_next(expand(board))
+            boards.setflags(write=False)
+            return boards
+        return self._cached("moves", board, compute)
+
+    def winner(self, board):
+        """Cached game_winner(expand(board))."""
+        return self._cached("winner", board, lambda board: game_winner(expand(board)))
+
+    def evaluate(self, boards, evaluate_batch):
+        """
+        Return evaluate_batch(boards) for (N, 32) boards, where only the boards missing from the cache
+        are passed to evaluate_batch, in a single call.
+        """
+        table = self.tables["evaluation"]
+        keys = zobrist_hash_batch(boards).tolist()
+        values = np.zeros(len(boards))
+        missing = {}
+        for i, key in enumerate(keys):
+            value = table.get(key)
+            if value is None:
+                missing.setdefault(key, []).append(i)
+            else:
+                values[i] = value
+        if missing:
+            first = [indices[0] for indices in missing.values()]
+            computed = np.asarray(evaluate_batch(np.asarray(boards)[first])).reshape(len(first), -1)[:, 0]
+            for (key, indices), value in zip(missing.items(), computed.tolist()):
+                values[indices] = value
+                table.put(key, value)
+        return values
+
+    def stats(self):
+        """Return the counters of every table."""
+        return {name: table.stats() for name, table in self.tables.items()}
+
+# every line of play from the initial board up to the given depth: move orders transpose into the same positions
+def tree_positions(board, depth):
+    yield board
+    if (depth > 0):
+        for child in generate_next(expand(board)):
+            yield from tree_positions(-child[::-1], depth - 1)
+
+if __name__ == "__main__":
+    for capacity in (1 << 10, 1 << 16):
+        cache = PositionCache(capacity)
+        start = time.perf_counter()
+        positions = 0
+        for board in tree_positions(np_board(), 4):
+            cache.next_boards(board)
+            cache.winner(board)
+            cache.metrics(board)
+            positions += 1
+        elapsed = time.perf_counter() - start
+        moves = cache.stats()["moves"]
+        print(f"capacity={capacity:6d}: {positions / elapsed:8,.0f} positions/sec, "
+              f"hit rate {moves['hit_rate']:.1%}, evictions {moves['evictions']}")
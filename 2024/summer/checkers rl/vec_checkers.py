@@ -0,0 +1,231 @@
+import time
+import numpy as np
+from gym import spaces
+from gym.vector import VectorEnv
+
+# Observation codes, the same as EnvCheckers._get_obs()
+EMPTY = 0
+RED = 1
+BLUE = 2
+RED_KING = 3
+BLUE_KING = 4
+WALL = 5 # padding around the board, never returned in an observation
+
+# colour and king flag of every code, indexed by the code itself
+COLOUR = np.array([0, RED, BLUE, RED, BLUE, WALL], dtype=np.int8)
+KING = np.array([False, False, False, True, True, False])
+
+# (dx, dy) of NORTHWEST, NORTHEAST, SOUTHWEST, SOUTHEAST, in EnvCheckers coordinates (x, y)
+DIRECTIONS = [(-1, -1), (1, -1), (-1, 1), (1, 1)]
+
+# men only move forward: blue towards y = 0, red towards y = 7
+FORWARD = {BLUE: [True, True, False, False], RED: [False, False, True, True]}
+
+PAD = 2
+
+def initial_board():
+    """Return the starting position as an (8, 8) observation."""
+    board = np.zeros((8, 8), dtype=np.int8)
+    for x in range(8):
+        for y in range(8):
+            if (x + y) % 2 == 0:
+                if y < 3:
+                    board[x, y] = RED
+                elif y > 4:
+                    board[x, y] = BLUE
+    return board
+
+class VecEnvCheckers(VectorEnv):
+    """
+    N checkers games stepped together with NumPy array operations.
+    Every game follows the same rules, rewards and termination as EnvCheckers,
+    and finished games are reset automatically.
+    """
+
+    def __init__(self, num_envs=64):
+        super(VecEnvCheckers, self).__init__(
+            num_envs,
+            spaces.Box(low=0, high=4, shape=(8, 8), dtype=np.int8),
+            spaces.Discrete(64 * 64),
+        )
+        self.index = np.arange(num_envs)
+
+        # the boards live inside a frame of walls, so neighbours and jumps never need bound checks
+        self.padded = np.full((num_envs, 8 + 2 * PAD, 8 + 2 * PAD), WALL, dtype=np.int8)
+        self.boards = self.padded[:, PAD:PAD + 8, PAD:PAD + 8]
+        self.turn = np.full(num_envs, BLUE, dtype=np.int8)
+        self.round = np.ones(num_envs)
+        self.total_reward = np.zeros(num_envs)
+        self._actions = np.zeros(num_envs, dtype=np.int64)
+        self.reset()
+
+    def reset_wait(self, seed=None, options=None):
+        """Reset every game to its initial state."""
+        self.boards[:] = initial_board()
+        self.turn[:] = BLUE
+        self.round[:] = 1
+        self.total_reward[:] = 0
+        return self.boards.copy()
+
+    def _shifted(self, array, dx, dy):
+        """Return the (N, 8, 8) view of a padded array moved by (dx, dy)."""
+        return array[:, PAD + dx:PAD + 8 + dx, PAD + dy:PAD + 8 + dy]
+
+    def _movers(self, colours, kings, colour, captures_only):
+        """Return a (N,) mask of the games where a piece of the given colour can capture (or move at all)."""
+        own = self._shifted(colours, 0, 0) == colour
+        own_kings = own & self._shifted(kings, 0, 0)
+        enemy = RED if colour == BLUE else BLUE
+
+        found = np.zeros(self.boards.shape, dtype=bool)
+        for d, (dx, dy) in enumerate(DIRECTIONS):
+            pieces = own if FORWARD[colour][d] else own_kings
+            moves = (self._shifted(colours, dx, dy) == enemy) & (self._shifted(self.padded, 2 * dx, 2 * dy) == EMPTY)
+            if not captures_only:
+                moves |= self._shifted(self.padded, dx, dy) == EMPTY
+            found |= pieces & moves
+        return found.any(axis=(1, 2))
+
+    def step_async(self, actions):
+        """Store a batch of N actions for step_wait()."""
+        self._actions[:] = actions
+
+    def step_wait(self):
+        """Apply the stored actions and return the observations, rewards, dones and infos of every game."""
+        idx = self.index
+        start = self._actions // 64
+        end = self._actions % 64
+        sx, sy = start // 8 + PAD, start % 8 + PAD
+        ex, ey = end // 8 + PAD, end % 8 + PAD
+
+        piece = self.padded[idx, sx, sy]
+        colour = COLOUR[piece]
+        king = KING[piece]
+        enemy = np.where(colour == RED, BLUE, RED)
+
+        # legal_moves() of the start square: captures if there are any, simple moves otherwise
+        has_capture = np.zeros(self.num_envs, dtype=bool)
+        step_to = np.zeros(self.num_envs, dtype=bool)
+        capture_to = np.zeros(self.num_envs, dtype=bool)
+        for d, (dx, dy) in enumerate(DIRECTIONS):
+            allowed = (colour != EMPTY) & (king | np.where(colour == BLUE, FORWARD[BLUE][d], FORWARD[RED][d]))
+            capture = allowed & (COLOUR[self.padded[idx, sx + dx, sy + dy]] == enemy) & (self.padded[idx, sx + 2 * dx, sy + 2 * dy] == EMPTY)
+            step = allowed & (self.padded[idx, sx + dx, sy + dy] == EMPTY)
+            has_capture |= capture
+            capture_to |= capture & (ex == sx + 2 * dx) & (ey == sy + 2 * dy)
+            step_to |= step & (ex == sx + dx) & (ey == sy + dy)
+        legal = capture_to | (step_to & ~has_capture)
+
+        # a mandatory capture must be played with one of the current player's pieces
+        colours = COLOUR[self.padded]
+        kings = KING[self.padded]
+        mandatory = np.zeros(self.num_envs, dtype=bool)
+        for turn in (BLUE, RED):
+            games = self.turn == turn
+            if games.any():
+                mandatory |= games & self._movers(colours, kings, turn, captures_only=True)
+        refused = mandatory & ~(capture_to & (colour == self.turn))
+        legal &= ~refused
+
+        moved = np.flatnonzero(legal)
+        jumped = moved[np.abs(ex[moved] - sx[moved]) > 1]
+        mover = piece[moved]
+        promote = ((mover == BLUE) & (ey[moved] == PAD)) | ((mover == RED) & (ey[moved] == PAD + 7))
+        self.padded[moved, sx[moved], sy[moved]] = EMPTY
+        self.padded[moved, ex[moved], ey[moved]] = mover + 2 * promote
+        self.padded[jumped, (sx[jumped] + ex[jumped]) // 2, (sy[jumped] + ey[jumped]) // 2] = EMPTY
+        self.turn[moved] = np.where(self.turn[moved] == BLUE, RED, BLUE)
+        self.round[moved] += 0.5
+
+        rewards = np.where(legal, 1, -5).astype(np.float32)
+        rewards[jumped] = 10
+
+        # the player to move has lost if none of its pieces can move
+        colours = COLOUR[self.padded]
+        kings = KING[self.padded]
+        stuck = np.zeros(self.num_envs, dtype=bool)
+        for turn in (BLUE, RED):
+            games = self.turn == turn
+            if games.any():
+                stuck |= games & ~self._movers(colours, kings, turn, captures_only=False)
+        dones = ~refused & stuck
+        rewards[dones] += np.where(self.turn[dones] == BLUE, -20, 20)
+        self.total_reward[~refused] += rewards[~refused]
+
+        infos = {}
+        if dones.any():
+            infos["final_observation"] = self.boards.copy()
+            infos["_final_observation"] = dones.copy()
+            self.boards[dones] = initial_board()
+            self.turn[dones] = BLUE
+            self.round[dones] = 1
+            self.total_reward[dones] = 0
+
+        return self.boards.copy(), rewards, dones, infos
+
+    def legal_actions(self):
+        """Return, for every game, the list of actions that move one of the current player's pieces."""
+        actions = []
+        for e in range(self.num_envs):
+            board = self.padded[e]
+            colour = self.turn[e]
+            enemy = RED if colour == BLUE else BLUE
+            steps, captures = [], []
+            for x in range(8):
+                for y in range(8):
+                    piece = board[x + PAD, y + PAD]
+                    if COLOUR[piece] != colour:
+                        continue
+                    for d, (dx, dy) in enumerate(DIRECTIONS):
+                        if not (KING[piece] or FORWARD[colour][d]):
+                            continue
+                        if COLOUR[board[x + dx + PAD, y + dy + PAD]] == enemy and board[x + 2 * dx + PAD, y + 2 * dy + PAD] == EMPTY:
+                            captures.append((x * 8 + y) * 64 + (x + 2 * dx) * 8 + y + 2 * dy)
+                        elif board[x + dx + PAD, y + dy + PAD] == EMPTY:
+                            steps.append((x * 8 + y) * 64 + (x + dx) * 8 + y + dy)
+            actions.append(captures if captures else steps)
+        return actions
+
+def check_against_scalar(num_envs=8, num_steps=2000, seed=0):
+    """Step VecEnvCheckers and num_envs EnvCheckers with the same actions and assert they agree."""
+    import io
+    import contextlib
+    from gym_checkers import EnvCheckers
+
+    rng = np.random.default_rng(seed)
+    vec_env = VecEnvCheckers(num_envs)
+    with contextlib.redirect_stdout(io.StringIO()):
+        envs = [EnvCheckers() for _ in range(num_envs)]
+
+    for i in range(num_steps):
+        # half of the actions are legal moves, the rest are random (mostly illegal) actions
+        legal = vec_env.legal_actions()
+        actions = rng.integers(0, 64 * 64, size=num_envs)
+        for e in range(num_envs):
+            if legal[e] and rng.random() < 0.5:
+                actions[e] = legal[e][rng.integers(len(legal[e]))]
+
+        obs, rewards, dones, infos = vec_env.step(actions)
+        with contextlib.redirect_stdout(io.StringIO()):
+            for e, env in enumerate(envs):
+                scalar_obs, reward, done, info = env.step(int(actions[e]))
+                final_obs = infos["final_observation"][e] if done else obs[e]
+                assert np.array_equal(scalar_obs, final_obs), (i, e)
+                assert reward == rewards[e] and done == dones[e], (i, e, reward, rewards[e])
+                if done:
+                    assert np.array_equal(env.reset(), obs[e]), (i, e)
+
+def benchmark(num_envs=1024, num_steps=200):
+    """Return the number of env-steps per second with random actions."""
+    env = VecEnvCheckers(num_envs)
+    actions = np.random.randint(0, 64 * 64, size=(num_steps, num_envs))
+    start = time.perf_counter()
+    for i in range(num_steps):
+        env.step(actions[i])
+    return num_envs * num_steps / (time.perf_counter() - start)
+
+if __name__ == "__main__":
+    check_against_scalar()
+    print("VecEnvCheckers matches EnvCheckers")
+    for num_envs in (1, 64, 1024, 4096):
+        print(f"num_envs={num_envs}: {benchmark(num_envs):,.0f} steps/sec")
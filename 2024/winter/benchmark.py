@@ -0,0 +1,227 @@
+"""
+Benchmarks of the ESRGAN generator
+
+python benchmark.py dense: the DenseResidualBlock implementations
+
+concat      torch.cat of all the previous feature maps after every conv (the original forward)
+buffer      one preallocated feature buffer per block, every conv writing into its channel slice
+checkpoint  training only: the buffer under gradient checkpointing, activations recomputed in backward
+
+Every configuration runs in its own process so that peak memories are not shared between them. The peak
+memory is measured above the memory of the model and its input: peak RSS on CPU, max_memory_allocated on GPU.
+
+python benchmark.py optimize: latency of the backends of inference.optimize_for_inference() against the
+eager Generator at several input sizes, and their largest difference from it.
+
+python benchmark.py loading: samples/sec of a DataLoader decoding the JPEGs for every sample like
+ImageDataset, against pack.PackedPatchDataset on the images and on the patches of a shard.
+"""
+
+import os
+import time
+import shutil
+import argparse
+import tempfile
+import resource
+import multiprocessing
+import numpy as np
+import cv2
+import torch
+from esrgan import Generator, DenseResidualBlock, initialize_weights
+from inference import optimize_for_inference
+from pack import pack, downscale, PackedPatchDataset, EXTENSIONS
+
+MODES = {
+    'inference': {'concat': dict(preallocate = False), 'buffer': dict(preallocate = True)},
+    'training': {'concat': dict(preallocate = False), 'checkpoint': dict(preallocate = True, checkpoint = True)},
+}
+
+def rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run(task, mode, args, queue):
+    torch.manual_seed(0)
+    torch.set_num_threads(args.threads)
+    if args.model == 'block':
+        model = DenseResidualBlock(64, **MODES[task][mode]).to(args.device)
+        x = torch.rand(args.batch_size, 64, args.size, args.size, device = args.device)
+    else:
+        model = Generator(num_blocks = args.blocks, **MODES[task][mode]).to(args.device)
+        x = torch.rand(args.batch_size, 3, args.size, args.size, device = args.device)
+    initialize_weights(model)
+    optimizer = torch.optim.Adam(model.parameters(), lr = 1e-4) if task == 'training' else None
+
+    def step():
+        if task == 'inference':
+            model.eval()
+            with torch.inference_mode():
+                return model(x)
+        model.train()
+        optimizer.zero_grad(set_to_none = True)
+        loss = model(x).square().mean()
+        loss.backward()
+        optimizer.step()
+        return loss
+
+    cuda = args.device.startswith('cuda')
+    def sync():
+        if cuda:
+            torch.cuda.synchronize()
+
+    if cuda:
+        torch.cuda.reset_peak_memory_stats()
+        base = torch.cuda.memory_allocated() / 2 ** 20
+    else:
+        base = rss_mb()
+    step()
+    sync()
+    start = time.perf_counter()
+    for _ in range(args.iterations):
+        out = step()
+    sync()
+    elapsed = (time.perf_counter() - start) / args.iterations
+    peak = (torch.cuda.max_memory_allocated() / 2 ** 20 if cuda else rss_mb()) - base
+    queue.put((elapsed * 1000, peak, float(out.detach().float().sum())))
+
+def measure(task, mode, args):
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target = run, args = (task, mode, args, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+def dense(args):
+    if args.model == 'block':
+        print(f'DenseResidualBlock, input {args.batch_size}x64x{args.size}x{args.size} on {args.device}')
+    else:
+        print(f'Generator with {args.blocks} blocks, input {args.batch_size}x3x{args.size}x{args.size} on {args.device}')
+    tasks = ['inference', 'training'] if args.task == 'both' else [args.task]
+    for task in tasks:
+        reference = None
+        for mode in MODES[task]:
+            ms, peak, checksum = measure(task, mode, args)
+            if reference is None:
+                reference = (ms, peak, checksum)
+            print(f'{task:>9} {mode:>10}: {ms:9.1f} ms/iteration ({reference[0] / ms:4.2f}x), '
+                  f'peak memory {peak:8.0f} MB ({peak / reference[1]:4.2f}x), checksum {checksum:.6g}')
+
+def latency_ms(model, x, iterations):
+    with torch.inference_mode():
+        model(x)
+        start = time.perf_counter()
+        for _ in range(iterations):
+            model(x)
+    return (time.perf_counter() - start) / iterations * 1000
+
+def optimize(args):
+    torch.manual_seed(0)
+    torch.set_num_threads(args.threads)
+    generator = Generator(num_blocks = args.blocks)
+    initialize_weights(generator)
+    generator.eval()
+    inputs = {size: torch.rand(args.batch_size, 3, size, size) for size in args.sizes}
+    print(f'Generator with {args.blocks} blocks, batch {args.batch_size} on cpu, ms/iteration')
+    print(f"{'':>16}" + ''.join(f'{size:>10d}px' for size in args.sizes) + '   max error')
+    eager = [latency_ms(generator, inputs[size], args.iterations) for size in args.sizes]
+    print(f"{'eager':>16}" + ''.join(f'{ms:12.1f}' for ms in eager))
+    for backend in args.backends:
+        for channels_last in [False, True]:
+            start = time.perf_counter()
+            try:
+                model = optimize_for_inference(generator, inputs[args.sizes[0]], channels_last, backends = (backend,))
+            except RuntimeError as exception:
+                print(f'{backend:>10} {"NHWC" if channels_last else "NCHW"}: {exception}')
+                continue
+            setup = time.perf_counter() - start
+            with torch.inference_mode():
+                error = max((model(x) - generator(x)).abs().max().item() for x in inputs.values())
+            times = [latency_ms(model, inputs[size], args.iterations) for size in args.sizes]
+            print(f'{backend:>10} {"NHWC" if channels_last else "NCHW"}' +
+                  ''.join(f'{ms:7.1f} ({e / ms:3.1f}x)' for ms, e in zip(times, eager)) + f'   {error:.1e}   setup {setup:.0f}s')
+
+class DecodingDataset(torch.utils.data.Dataset):
+    # the work of ImageDataset.__getitem__: decode a whole image, crop a patch, downscale it
+    def __init__(self, hr_path, size = 128, scale = 4):
+        self.paths = [os.path.join(hr_path, name) for name in sorted(os.listdir(hr_path)) if name.lower().endswith(EXTENSIONS)]
+        self.size = size
+        self.scale = scale
+        self.rng = np.random.default_rng()
+
+    def __len__(self):
+        return len(self.paths)
+
+    def __getitem__(self, idx):
+        image = cv2.cvtColor(cv2.imread(self.paths[idx]), cv2.COLOR_BGR2RGB)
+        y = self.rng.integers(image.shape[0] - self.size + 1)
+        x = self.rng.integers(image.shape[1] - self.size + 1)
+        hr = np.ascontiguousarray(image[y:y + self.size, x:x + self.size])
+        return torch.from_numpy(hr).permute(2, 0, 1), torch.from_numpy(downscale(hr, self.scale)).permute(2, 0, 1)
+
+def samples_per_sec(dataset, args):
+    loader = torch.utils.data.DataLoader(dataset, batch_size = args.batch_size, shuffle = True, num_workers = args.workers,
+                                         persistent_workers = args.workers > 0)
+    count, start = 0, None
+    for epoch in range(args.epochs + 1):
+        for hr, lr in loader:
+            count += len(hr)
+        if start is None:
+            # the first epoch starts the workers and warms the page cache
+            count, start = 0, time.perf_counter()
+    return count / (time.perf_counter() - start)
+
+def loading(args):
+    directory = args.shard or tempfile.mkdtemp()
+    try:
+        start = time.perf_counter()
+        manifest = pack(args.hr_path, directory, args.patches)
+        print(f"packed {manifest['images']} images and {manifest['patches']} patches in {time.perf_counter() - start:.1f}s")
+        decoding = samples_per_sec(DecodingDataset(args.hr_path), args)
+        print(f'batch {args.batch_size}, {args.workers} workers')
+        print(f'{"decoding":>16}: {decoding:9.0f} samples/sec')
+        for name, dataset in [('packed images', PackedPatchDataset(directory, augment = True, use_patches = False)),
+                              ('packed patches', PackedPatchDataset(directory, augment = True))]:
+            rate = samples_per_sec(dataset, args)
+            print(f'{name:>16}: {rate:9.0f} samples/sec ({rate / decoding:5.1f}x)')
+    finally:
+        if args.shard is None:
+            shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Benchmarks of the ESRGAN generator')
+    subparsers = parser.add_subparsers(dest = 'command', required = True)
+
+    parser_dense = subparsers.add_parser('dense', help = 'peak memory and ms/iteration of the DenseResidualBlock implementations')
+    parser_dense.add_argument('--task', choices = ['inference', 'training', 'both'], default = 'both')
+    parser_dense.add_argument('--model', choices = ['generator', 'block'], default = 'generator',
+                              help = 'the whole Generator, or a single DenseResidualBlock on 64-channel feature maps')
+    parser_dense.add_argument('--blocks', type = int, default = 23, help = 'number of StackDRB blocks of the Generator')
+    parser_dense.add_argument('--batch-size', type = int, default = 4)
+    parser_dense.add_argument('--size', type = int, default = 64, help = 'side of the input (low-resolution image or feature maps)')
+    parser_dense.add_argument('--iterations', type = int, default = 5)
+    parser_dense.add_argument('--threads', type = int, default = torch.get_num_threads())
+    parser_dense.add_argument('--device', default = 'cuda' if torch.cuda.is_available() else 'cpu')
+
+    parser_optimize = subparsers.add_parser('optimize', help = 'latency of optimize_for_inference() against the eager Generator')
+    parser_optimize.add_argument('--backends', nargs = '+', default = ['eager', 'script', 'compile'])
+    parser_optimize.add_argument('--sizes', type = int, nargs = '+', default = [32, 64, 128], help = 'sides of the inputs')
+    parser_optimize.add_argument('--blocks', type = int, default = 23, help = 'number of StackDRB blocks of the Generator')
+    parser_optimize.add_argument('--batch-size', type = int, default = 1)
+    parser_optimize.add_argument('--iterations', type = int, default = 5)
+    parser_optimize.add_argument('--threads', type = int, default = torch.get_num_threads())
+    parser_loading = subparsers.add_parser('loading', help = 'samples/sec of ImageDataset-like decoding against packed shards')
+    parser_loading.add_argument('hr_path', help = 'folder of HR images')
+    parser_loading.add_argument('--shard', default = None, help = 'shard directory to keep (default: a temporary one)')
+    parser_loading.add_argument('--patches', type = int, default = 16, help = 'patches packed per image')
+    parser_loading.add_argument('--batch-size', type = int, default = 16)
+    parser_loading.add_argument('--workers', type = int, default = 0)
+    parser_loading.add_argument('--epochs', type = int, default = 2)
+    args = parser.parse_args()
+
+    if args.command == 'dense':
+        dense(args)
+    elif args.command == 'optimize':
+        optimize(args)
+    else:
+        loading(args)
@@ -6,6 +6,7 @@ Author = FOZAME ENDEZOUMOU ARMAND BRYAN
 
 import torch
 from torch import nn
+from torch.utils.checkpoint import checkpoint
 
 class ConvBlock(nn.Module):
     def __init__(self, in_channels, out_channels, act, slope = 2, **kwargs):
@@ -35,9 +36,13 @@ class UpSampleBlock(nn.Module):
         return self.act(self.conv(self.upsample_block(x)))
 
 class DenseResidualBlock(nn.Module):
-    def __init__(self, in_channels, channels = 32, residual_beta = 0.2):
+    def __init__(self, in_channels, channels = 32, residual_beta = 0.2, preallocate = True, checkpoint = False):
         super().__init__()
         self.residual_beta = residual_beta
+        self.in_channels = in_channels
+        self.channels = channels
+        self.preallocate = preallocate
+        self.checkpoint = checkpoint
         self.blocks = nn.ModuleList()
 
         for i in range(5):
@@ -51,28 +56,53 @@ class DenseResidualBlock(nn.Module):
                     padding = 1
                 )
             )
-    
-    def forward(self, x):
+
+    def dense_concat(self, x):
         inputs = x
         for block in self.blocks:
             out = block(inputs)
             inputs = torch.cat([inputs, out], dim = 1)
-        
-        return self.residual_beta * out + x 
+        return out
+
+    def dense_buffer(self, x):
+        # one (B, in + 4 * channels, H, W) buffer, every conv reads a prefix of it and writes its output
+        # in the next slice, instead of a torch.cat copying all the previous feature maps after each conv
+        layout = torch.channels_last if x.is_contiguous(memory_format = torch.channels_last) else torch.contiguous_format
+        features = torch.empty(x.shape[0], self.in_channels + 4 * self.channels, *x.shape[2:],
+                               dtype = x.dtype, device = x.device, memory_format = layout)
+        features[:, :self.in_channels] = x
+        end = self.in_channels
+        for block in self.blocks[:4]:
+            features[:, end:end + self.channels] = block(features[:, :end])
+            end += self.channels
+        return self.blocks[4](features)
+
+    def forward(self, x):
+        recording = torch.is_grad_enabled() and (x.requires_grad or self.blocks[0].conv.weight.requires_grad)
+        if not recording:
+            out = self.dense_buffer(x) if self.preallocate else self.dense_concat(x)
+        elif self.checkpoint:
+            # the writes into the buffer would invalidate the slices saved for the backward pass,
+            # under checkpointing they are recomputed instead of saved
+            out = checkpoint(self.dense_buffer if self.preallocate else self.dense_concat, x, use_reentrant = False)
+        else:
+            out = self.dense_concat(x)
+
+        return torch.add(x, out, alpha = self.residual_beta)
 
 class StackDRB(nn.Module):
-    def __init__(self, in_channels, residual_beta = 0.2):
+    def __init__(self, in_channels, residual_beta = 0.2, preallocate = True, checkpoint = False):
         super().__init__()
         self.residual_beta = residual_beta
         self.stackrdb = nn.Sequential(
-            *[DenseResidualBlock(in_channels) for _ in range(3)]
+            *[DenseResidualBlock(in_channels, preallocate = preallocate, checkpoint = checkpoint) for _ in range(3)]
         )
 
     def forward(self, x):
-        return self.stackrdb(x) * self.residual_beta + x
+        return torch.add(x, self.stackrdb(x), alpha = self.residual_beta)
     
 class Generator(nn.Module):
-    def __init__(self, in_channels = 3, num_channels = 64, num_blocks = 23, slope = 0.2):
+    def __init__(self, in_channels = 3, num_channels = 64, num_blocks = 23, slope = 0.2, preallocate = True, checkpoint = False):
         super().__init__()
         self.initial = nn.Conv2d(
             in_channels, num_channels, kernel_size = 3,
@@ -80,7 +110,7 @@ class Generator(nn.Module):
         )
 
         self.residuals = nn.Sequential(
-            *[StackDRB(num_channels) for _ in range(num_blocks)]
+            *[StackDRB(num_channels, preallocate = preallocate, checkpoint = checkpoint) for _ in range(num_blocks)]
         )
 
         self.conv = nn.Conv2d(
@@ -0,0 +1,219 @@
+"""
+Tiled inference of the ESRGAN generator
+
+The input is cut into tiles of tile x tile pixels overlapping by overlap pixels, which go through
+the Generator batch_size at a time. Upscaled tiles are blended with feathered weights (a linear
+ramp over the overlap) into a buffer of one row of tiles; rows of the output that no later tile
+touches are normalized and written out, so the memory used only depends on the tile size and the
+image width, never on the full-resolution activations.
+
+optimize_for_inference() prepares a Generator for CPU serving: residual scalings folded into the conv
+weights, channels_last layout, then torch.compile or TorchScript, checked against the eager model.
+"""
+
+import copy
+import time
+import warnings
+import argparse
+import resource
+import numpy as np
+import cv2
+import torch
+from torch import nn
+from esrgan import Generator, DenseResidualBlock, initialize_weights
+
+def tile_starts(size, tile, overlap):
+    # first pixel of every tile along one axis, the last tile ending on the border
+    if size <= tile:
+        return [0]
+    stride = tile - overlap
+    starts = list(range(0, size - tile, stride))
+    return starts + [size - tile]
+
+def feather(length, ramp):
+    # weights along one axis of an upscaled tile: a ramp up over the overlap on both sides, never 0
+    weights = np.ones(length, dtype = np.float32)
+    if ramp > 0:
+        edge = (np.arange(min(ramp, length)) + 0.5) / ramp
+        weights[:len(edge)] = np.minimum(weights[:len(edge)], edge)
+        weights[length - len(edge):] = np.minimum(weights[length - len(edge):], edge[::-1])
+    return weights
+
+class TiledUpscaler:
+    def __init__(self, model, scale = 4, tile = 128, overlap = 16, batch_size = 4, device = 'cpu'):
+        if not 0 <= overlap < tile:
+            raise ValueError(f"overlap must be in [0, tile), got {overlap} for tile {tile}")
+        self.model = model.to(device).eval()
+        self.scale = scale
+        self.tile = tile
+        self.overlap = overlap
+        self.batch_size = batch_size
+        self.device = device
+
+    @torch.inference_mode()
+    def run(self, tiles):
+        # (N, h, w, 3) uint8 tiles -> (N, h * scale, w * scale, 3) float32 in [0, 1]
+        x = torch.from_numpy(np.ascontiguousarray(tiles)).to(self.device).permute(0, 3, 1, 2).float() / 255
+        y = self.model(x).clamp_(0, 1)
+        return y.permute(0, 2, 3, 1).cpu().numpy()
+
+    def upscale(self, image, out = None):
+        # image: (H, W, 3) uint8 RGB. out: optional (H * scale, W * scale, 3) uint8 array to write into,
+        # for example a np.memmap for outputs larger than the memory
+        height, width = image.shape[:2]
+        s = self.scale
+        tile_h, tile_w = min(self.tile, height), min(self.tile, width)
+        if out is None:
+            out = np.empty((height * s, width * s, 3), dtype = np.uint8)
+        weights = np.outer(feather(tile_h * s, self.overlap * s), feather(tile_w * s, self.overlap * s))[:, :, None]
+
+        # accumulators for the output rows [base, base + tile_h * s)
+        acc = np.zeros((tile_h * s, width * s, 3), dtype = np.float32)
+        norm = np.zeros((tile_h * s, width * s, 1), dtype = np.float32)
+        base = 0
+
+        rows = tile_starts(height, tile_h, self.overlap)
+        cols = tile_starts(width, tile_w, self.overlap)
+        for r, y0 in enumerate(rows):
+            for k in range(0, len(cols), self.batch_size):
+                batch_cols = cols[k:k + self.batch_size]
+                upscaled = self.run(np.stack([image[y0:y0 + tile_h, x0:x0 + tile_w] for x0 in batch_cols]))
+                # base is y0 * s: the tiles of this row start on the first row of the accumulators
+                for x0, tile in zip(batch_cols, upscaled):
+                    acc[:, x0 * s:(x0 + tile_w) * s] += tile * weights
+                    norm[:, x0 * s:(x0 + tile_w) * s] += weights
+
+            # rows above the next row of tiles are final
+            done = (rows[r + 1] if r + 1 < len(rows) else height) * s
+            n = done - base
+            out[base:done] = np.rint(acc[:n] / norm[:n] * 255).astype(np.uint8)
+            keep = len(acc) - n
+            acc[:keep] = acc[n:]
+            norm[:keep] = norm[n:]
+            acc[keep:] = 0
+            norm[keep:] = 0
+            base = done
+        return out
+
+def fold_residual_scaling(model):
+    # beta * conv(features) + x is conv(features) + x with the weights and bias of the conv scaled by beta.
+    # The beta of StackDRB also scales the input of its last block and stays a torch.add alpha.
+    for module in model.modules():
+        if isinstance(module, DenseResidualBlock) and module.residual_beta != 1:
+            conv = module.blocks[-1].conv
+            conv.weight.data.mul_(module.residual_beta)
+            conv.bias.data.mul_(module.residual_beta)
+            module.residual_beta = 1.0
+    return model
+
+class InferenceGenerator(nn.Module):
+    """A Generator prepared by optimize_for_inference(), backend being 'compile', 'script' or 'eager'."""
+
+    def __init__(self, model, backend, channels_last, error = 0.0):
+        super().__init__()
+        self.model = model
+        self.backend = backend
+        self.channels_last = channels_last
+        self.error = error
+
+    def forward(self, x):
+        if self.channels_last:
+            x = x.contiguous(memory_format = torch.channels_last)
+        with torch.inference_mode():
+            return self.model(x)
+
+def build_backend(model, backend, example):
+    if backend == 'compile':
+        return torch.compile(model)
+    if backend == 'script':
+        # the writes into the preallocated DenseResidualBlock buffer do not survive freezing: trace the concat path
+        model = copy.deepcopy(model)
+        for module in model.modules():
+            if isinstance(module, DenseResidualBlock):
+                module.preallocate = False
+        with torch.no_grad(), warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            # freezing inlines the weights, optimize_for_inference fuses the convs with their activations
+            return torch.jit.optimize_for_inference(torch.jit.freeze(torch.jit.trace(model, example)))
+    if backend == 'eager':
+        return model
+    raise ValueError(f"unknown backend {backend!r}, expected 'compile', 'script' or 'eager'")
+
+def optimize_for_inference(generator, example = None, channels_last = True, backends = ('compile', 'script', 'eager'),
+                           atol = 1e-3, verbose = False):
+    """
+    Return an InferenceGenerator of a copy of generator, with the first of backends whose output on
+    example (default a random 1x3x32x32 image) is within atol of the eager generator.
+    """
+    generator.eval()
+    model = fold_residual_scaling(copy.deepcopy(generator)).requires_grad_(False)
+    if channels_last:
+        model = model.to(memory_format = torch.channels_last)
+    device = next(generator.parameters()).device
+    example = torch.rand(1, 3, 32, 32, device = device) if example is None else example
+    with torch.inference_mode():
+        expected = generator(example)
+
+    for backend in backends:
+        try:
+            optimized = InferenceGenerator(build_backend(model, backend, example.contiguous(
+                memory_format = torch.channels_last) if channels_last else example), backend, channels_last)
+            error = (optimized(example) - expected).abs().max().item()
+        except Exception as exception:
+            if verbose:
+                print(f'{backend}: failed with {type(exception).__name__}: {exception}')
+            continue
+        if error <= atol:
+            optimized.error = error
+            return optimized
+        if verbose:
+            print(f'{backend}: max error {error:.2e} above {atol:.0e}')
+    raise RuntimeError(f'no backend among {backends} matches the eager generator')
+
+def load_generator(weights = None, num_blocks = 23, device = 'cpu'):
+    model = Generator(num_blocks = num_blocks)
+    if weights is not None:
+        model.load_state_dict(torch.load(weights, map_location = device))
+    else:
+        initialize_weights(model)
+    return model
+
+def peak_memory_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Tiled 4x super-resolution of an image with the ESRGAN generator')
+    parser.add_argument('input')
+    parser.add_argument('output', help = '.png/.jpg image, or .npy written as a memory-mapped array')
+    parser.add_argument('--weights', default = None, help = 'state_dict of the Generator (random weights if not given)')
+    parser.add_argument('--blocks', type = int, default = 23, help = 'number of StackDRB blocks of the Generator')
+    parser.add_argument('--tile', type = int, default = 128)
+    parser.add_argument('--overlap', type = int, default = 16)
+    parser.add_argument('--batch-size', type = int, default = 4)
+    parser.add_argument('--optimize', action = 'store_true', help = 'run the generator of optimize_for_inference()')
+    parser.add_argument('--device', default = 'cuda' if torch.cuda.is_available() else 'cpu')
+    args = parser.parse_args()
+
+    image = cv2.cvtColor(cv2.imread(args.input), cv2.COLOR_BGR2RGB)
+    height, width = image.shape[:2]
+    model = load_generator(args.weights, args.blocks, args.device)
+    if args.optimize:
+        model = optimize_for_inference(model, torch.rand(args.batch_size, 3, args.tile, args.tile, device = args.device))
+        print(f'{model.backend} backend, max error {model.error:.2e}')
+    upscaler = TiledUpscaler(model, tile = args.tile,
+                             overlap = args.overlap, batch_size = args.batch_size, device = args.device)
+    out = None
+    if args.output.endswith('.npy'):
+        out = np.lib.format.open_memmap(args.output, mode = 'w+', dtype = np.uint8, shape = (height * 4, width * 4, 3))
+
+    start = time.perf_counter()
+    out = upscaler.upscale(image, out)
+    elapsed = time.perf_counter() - start
+    if args.output.endswith('.npy'):
+        out.flush()
+    else:
+        cv2.imwrite(args.output, cv2.cvtColor(out, cv2.COLOR_RGB2BGR))
+
+    print(f'{width}x{height} -> {width * 4}x{height * 4} in {elapsed:.1f}s: '
+          f'{width * height / elapsed / 1e6:.3f} input megapixels/sec, {16 * width * height / elapsed / 1e6:.2f} output megapixels/sec, '
+          f'peak memory {peak_memory_mb():.0f} MB')
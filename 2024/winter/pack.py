@@ -0,0 +1,157 @@
+"""
+Packed training shards for the ESRGAN
+
+ImageDataset decodes a full-size JPEG for every sample to crop a 128x128 patch out of it. pack() decodes
+every HR image once into a shard directory, and can also cut random HR patches with their 4x bicubic LR
+patches ahead of time:
+
+    manifest.json     sources, number of images and patches, patch size and scale
+    images.bin        the decoded RGB images, uint8, one after the other
+    images_index.npy  (images, 3) int64: offset in images.bin, height, width
+    hr.npy, lr.npy    (patches, size, size, 3) and (patches, size / scale, size / scale, 3) uint8
+    patches_index.npy (patches, 3) int64: image, y, x of every patch
+
+PackedPatchDataset reads a shard memory-mapped, without decoding or copying.
+
+python pack.py <hr folder> <shard directory> --patches 64
+"""
+
+import os
+import json
+import time
+import argparse
+import numpy as np
+import cv2
+import torch
+from tqdm import tqdm
+
+EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+def downscale(hr, scale = 4):
+    return cv2.resize(hr, (hr.shape[1] // scale, hr.shape[0] // scale), interpolation = cv2.INTER_CUBIC)
+
+def pack(hr_path, directory, patches_per_image = 0, size = 128, scale = 4, seed = 0):
+    """Decode the images of hr_path into a shard directory, with patches_per_image random patches of each."""
+    if size % scale:
+        raise ValueError(f'the patch size {size} is not a multiple of the scale {scale}')
+    os.makedirs(directory, exist_ok = True)
+    names = sorted(name for name in os.listdir(hr_path) if name.lower().endswith(EXTENSIONS))
+    rng = np.random.default_rng(seed)
+    count = len(names) * patches_per_image
+    if count:
+        hr = np.lib.format.open_memmap(os.path.join(directory, 'hr.npy'), mode = 'w+', dtype = np.uint8, shape = (count, size, size, 3))
+        lr = np.lib.format.open_memmap(os.path.join(directory, 'lr.npy'), mode = 'w+', dtype = np.uint8,
+                                       shape = (count, size // scale, size // scale, 3))
+    images_index = np.zeros((len(names), 3), dtype = np.int64)
+    patches_index = np.zeros((count, 3), dtype = np.int64)
+
+    offset, k = 0, 0
+    with open(os.path.join(directory, 'images.bin'), 'wb') as f:
+        for i, name in enumerate(tqdm(names, desc = 'Packing')):
+            image = cv2.cvtColor(cv2.imread(os.path.join(hr_path, name)), cv2.COLOR_BGR2RGB)
+            height, width = image.shape[:2]
+            if min(height, width) < size:
+                raise ValueError(f'{name} is {width}x{height}, smaller than the {size}x{size} patches')
+            f.write(image.tobytes())
+            images_index[i] = offset, height, width
+            offset += image.nbytes
+
+            for _ in range(patches_per_image):
+                y, x = rng.integers(height - size + 1), rng.integers(width - size + 1)
+                hr[k] = image[y:y + size, x:x + size]
+                lr[k] = downscale(hr[k], scale)
+                patches_index[k] = i, y, x
+                k += 1
+
+    np.save(os.path.join(directory, 'images_index.npy'), images_index)
+    np.save(os.path.join(directory, 'patches_index.npy'), patches_index)
+    if count:
+        hr.flush()
+        lr.flush()
+    manifest = {'sources': names, 'images': len(names), 'patches': count, 'size': size, 'scale': scale, 'seed': seed}
+    with open(os.path.join(directory, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent = 2)
+    return manifest
+
+class PackedPatchDataset(torch.utils.data.Dataset):
+    """
+    (hr, lr) pairs of a shard made by pack(), as (3, size, size) and (3, size / scale, size / scale) uint8 tensors
+    viewing the memory-mapped files. Shards without patches, or use_patches=False, give a random crop of an image per
+    sample (samples per epoch, default one per image), its LR patch being downscaled on the fly. augment flips and rotates the pairs
+    (a copy). Files are opened, and the random generator seeded, in every process and DataLoader worker rather than
+    pickled or inherited from a fork. The generator combines seed with the torch seed of the process or worker, so that
+    epochs differ and torch.manual_seed() reproduces a run.
+    """
+
+    def __init__(self, directory, augment = False, samples = None, use_patches = True, seed = None):
+        self.directory = directory
+        self.augment = augment
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            self.manifest = json.load(f)
+        self.size = self.manifest['size']
+        self.scale = self.manifest['scale']
+        self.patches = use_patches and self.manifest['patches'] > 0
+        self.samples = samples or (self.manifest['patches'] if self.patches else self.manifest['images'])
+        self.seed = seed
+        self.arrays = None
+        self.owner = None
+
+    def open(self):
+        # copy-on-write mappings: writable for torch.from_numpy, never written back
+        if self.patches:
+            self.arrays = (np.load(os.path.join(self.directory, 'hr.npy'), mmap_mode = 'c'),
+                           np.load(os.path.join(self.directory, 'lr.npy'), mmap_mode = 'c'))
+        else:
+            self.arrays = (np.memmap(os.path.join(self.directory, 'images.bin'), dtype = np.uint8, mode = 'c'),
+                           np.load(os.path.join(self.directory, 'images_index.npy')))
+        worker = torch.utils.data.get_worker_info()
+        self.owner = os.getpid(), worker.id if worker else None
+        # torch draws new worker seeds every epoch, and torch.manual_seed() makes them reproducible
+        torch_seed = worker.seed if worker else torch.initial_seed()
+        self.rng = np.random.default_rng([torch_seed] if self.seed is None else [self.seed, torch_seed])
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state['arrays'] = None
+        return state
+
+    def __len__(self):
+        return self.samples
+
+    def __getitem__(self, idx):
+        # a worker forked after the main process read an item inherits its mappings and random generator
+        worker = torch.utils.data.get_worker_info()
+        if self.arrays is None or self.owner != (os.getpid(), worker.id if worker else None):
+            self.open()
+        if self.patches:
+            hr, lr = self.arrays[0][idx], self.arrays[1][idx]
+        else:
+            images, index = self.arrays
+            offset, height, width = index[idx % len(index)]
+            image = images[offset:offset + height * width * 3].reshape(height, width, 3)
+            y, x = self.rng.integers(height - self.size + 1), self.rng.integers(width - self.size + 1)
+            hr = image[y:y + self.size, x:x + self.size]
+            lr = downscale(hr, self.scale)
+
+        hr, lr = torch.from_numpy(hr).permute(2, 0, 1), torch.from_numpy(lr).permute(2, 0, 1)
+        if self.augment:
+            flip, turns = self.rng.integers(2), self.rng.integers(4)
+            if flip:
+                hr, lr = hr.flip(2), lr.flip(2)
+            hr, lr = hr.rot90(turns, (1, 2)), lr.rot90(turns, (1, 2))
+        return hr, lr
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Pack HR images into a memory-mapped training shard')
+    parser.add_argument('hr_path', help = 'folder of the HR images (the hr_path of ImageDataset)')
+    parser.add_argument('directory', help = 'shard directory')
+    parser.add_argument('--patches', type = int, default = 0, help = 'random patches cut from every image, 0 to only decode them')
+    parser.add_argument('--size', type = int, default = 128, help = 'HR patch side (hr_w of config.py)')
+    parser.add_argument('--scale', type = int, default = 4)
+    parser.add_argument('--seed', type = int, default = 0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    manifest = pack(args.hr_path, args.directory, args.patches, args.size, args.scale, args.seed)
+    print(f"{manifest['images']} images and {manifest['patches']} patches packed into {args.directory} "
+          f'in {time.perf_counter() - start:.1f}s')
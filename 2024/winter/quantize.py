@@ -0,0 +1,196 @@
+"""
+Quantized ESRGAN generator for CPU serving
+
+fp32  the Generator as trained
+bf16  weights and activations in bfloat16, fast on CPUs with AVX512-BF16 or AMX, close to fp32 elsewhere
+int8  post-training static quantization (FX graph mode, per-channel weights), the activation ranges
+      calibrated on low-resolution patches of the images of the ImageDataset folders
+
+python quantize.py <calibration folder> compares the modes with the fp32 model (PSNR and SSIM of the
+upscaled images) and benchmarks their latency, their size and the peak memory of the process while it
+serves (upscaling the evaluation images, then the latency inputs), every mode in its own process.
+"""
+
+import os
+import gc
+import copy
+import time
+import argparse
+import resource
+import warnings
+import multiprocessing
+import numpy as np
+import cv2
+import torch
+from torch import nn
+from torch.ao.quantization import get_default_qconfig_mapping
+from torch.ao.quantization.quantize_fx import prepare_fx, convert_fx
+from esrgan import DenseResidualBlock
+from inference import TiledUpscaler, load_generator
+
+MODES = ('fp32', 'bf16', 'int8')
+EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp')
+
+def load_images(folder, limit = None):
+    # RGB uint8 images of a folder, as ImageDataset reads them
+    names = sorted(name for name in os.listdir(folder) if name.lower().endswith(EXTENSIONS))[:limit]
+    return [cv2.cvtColor(cv2.imread(os.path.join(folder, name)), cv2.COLOR_BGR2RGB) for name in names]
+
+def calibration_patches(images, count = 64, size = 32, seed = 0):
+    # random size x size crops (the lr_w x lr_h patches of config.py), as a (count, 3, size, size) float tensor
+    rng = np.random.default_rng(seed)
+    patches = []
+    for i in range(count):
+        image = images[i % len(images)]
+        if min(image.shape[:2]) < size:
+            image = cv2.resize(image, (max(size, image.shape[1]), max(size, image.shape[0])), interpolation = cv2.INTER_CUBIC)
+        y = rng.integers(image.shape[0] - size + 1)
+        x = rng.integers(image.shape[1] - size + 1)
+        patches.append(image[y:y + size, x:x + size])
+    return torch.from_numpy(np.stack(patches)).permute(0, 3, 1, 2).float() / 255
+
+def float_copy(generator):
+    # a traceable copy: the concat DenseResidualBlock, no in-place activation (quantized ops have none)
+    model = copy.deepcopy(generator).eval()
+    for module in model.modules():
+        if isinstance(module, DenseResidualBlock):
+            module.preallocate = False
+        if isinstance(module, nn.LeakyReLU):
+            module.inplace = False
+    return model
+
+class QuantizedGenerator(nn.Module):
+    """Takes and returns float32 images like the Generator, running model in the precision of mode."""
+
+    def __init__(self, model, mode):
+        super().__init__()
+        self.model = model
+        self.mode = mode
+
+    def forward(self, x):
+        with torch.inference_mode():
+            if self.mode == 'bf16':
+                return self.model(x.to(torch.bfloat16)).float()
+            return self.model(x)
+
+def quantize(generator, mode, calibration = None, engine = 'x86', batch_size = 8):
+    """Return a QuantizedGenerator of generator in mode; int8 needs calibration, a batch of input images."""
+    if mode == 'fp32':
+        return QuantizedGenerator(copy.deepcopy(generator).eval(), mode)
+    if mode == 'bf16':
+        return QuantizedGenerator(copy.deepcopy(generator).eval().to(torch.bfloat16), mode)
+    if mode != 'int8':
+        raise ValueError(f"unknown mode {mode!r}, expected one of {MODES}")
+    if calibration is None:
+        raise ValueError('int8 quantization needs calibration images')
+
+    torch.backends.quantized.engine = engine
+    model = float_copy(generator)
+    with torch.no_grad(), warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        prepared = prepare_fx(model, get_default_qconfig_mapping(engine), example_inputs = (calibration[:1],))
+        # the observers record the range of every activation
+        for start in range(0, len(calibration), batch_size):
+            prepared(calibration[start:start + batch_size])
+        return QuantizedGenerator(convert_fx(prepared), mode)
+
+def model_size_mb(model):
+    # parameters and buffers, the int8 weights and quantization parameters included
+    return sum(value.numel() * value.element_size() for value in model.state_dict().values()) / 2 ** 20
+
+def psnr(reference, image):
+    mse = np.mean((reference.astype(np.float64) - image.astype(np.float64)) ** 2)
+    return float('inf') if mse == 0 else 10 * np.log10(255 ** 2 / mse)
+
+def ssim(reference, image):
+    # mean SSIM over the channels, with the usual 11x11 gaussian window (sigma 1.5)
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    a, b = reference.astype(np.float64), image.astype(np.float64)
+    blur = lambda x: cv2.GaussianBlur(x, (11, 11), 1.5)
+    mu_a, mu_b = blur(a), blur(b)
+    var_a = blur(a * a) - mu_a ** 2
+    var_b = blur(b * b) - mu_b ** 2
+    cov = blur(a * b) - mu_a * mu_b
+    ssim_map = ((2 * mu_a * mu_b + c1) * (2 * cov + c2)) / ((mu_a ** 2 + mu_b ** 2 + c1) * (var_a + var_b + c2))
+    return float(ssim_map.mean())
+
+def reset_peak_rss():
+    # Linux resets the peak RSS of the process (VmHWM) on writing 5 to clear_refs
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+def peak_rss_mb():
+    try:
+        with open('/proc/self/status') as f:
+            return next(int(line.split()[1]) for line in f if line.startswith('VmHWM')) / 1024
+    except (OSError, StopIteration):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+def run(mode, args, images, queue):
+    torch.set_num_threads(args.threads)
+    torch.manual_seed(0)
+    generator = load_generator(args.weights, args.blocks)
+    calibration = calibration_patches(load_images(args.calibration, args.limit), args.calibration_patches) if mode == 'int8' else None
+    start = time.perf_counter()
+    model = quantize(generator, mode, calibration)
+    setup = time.perf_counter() - start
+    del generator, calibration
+
+    # peak memory of serving only, not of the calibration
+    gc.collect()
+    reset_peak_rss()
+    upscaler = TiledUpscaler(model, tile = args.tile, overlap = args.overlap, batch_size = args.batch_size)
+    outputs = [upscaler.upscale(image) for image in images]
+
+    latencies = {}
+    for size in args.sizes:
+        x = torch.rand(1, 3, size, size)
+        model(x)
+        start = time.perf_counter()
+        for _ in range(args.iterations):
+            model(x)
+        latencies[size] = (time.perf_counter() - start) / args.iterations * 1000
+    queue.put((outputs, latencies, model_size_mb(model.model), peak_rss_mb(), setup))
+
+def measure(mode, args, images):
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    process = context.Process(target = run, args = (mode, args, images, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description = 'Quality, latency and memory of the quantized ESRGAN generators')
+    parser.add_argument('calibration', help = 'folder of low-resolution images (the lr_path of ImageDataset)')
+    parser.add_argument('--images', default = None, help = 'folder of the evaluation images (default: the calibration folder)')
+    parser.add_argument('--limit', type = int, default = 8, help = 'images read from every folder')
+    parser.add_argument('--calibration-patches', type = int, default = 64)
+    parser.add_argument('--weights', default = None, help = 'state_dict of the Generator (random weights if not given)')
+    parser.add_argument('--blocks', type = int, default = 23, help = 'number of StackDRB blocks of the Generator')
+    parser.add_argument('--modes', nargs = '+', choices = MODES, default = list(MODES))
+    parser.add_argument('--sizes', type = int, nargs = '+', default = [32, 64, 128], help = 'sides of the latency inputs')
+    parser.add_argument('--iterations', type = int, default = 3)
+    parser.add_argument('--tile', type = int, default = 64)
+    parser.add_argument('--overlap', type = int, default = 8)
+    parser.add_argument('--batch-size', type = int, default = 1)
+    parser.add_argument('--threads', type = int, default = torch.get_num_threads())
+    args = parser.parse_args()
+
+    images = load_images(args.images or args.calibration, args.limit)
+    print(f'Generator with {args.blocks} blocks, {len(images)} evaluation images, {args.threads} threads')
+    print(f"{'mode':>5} {'PSNR':>7} {'SSIM':>7} {'size':>8} {'memory':>8} " + ''.join(f'{size:>7d}px' for size in args.sizes) + '   setup')
+    # the quality of every mode is measured against fp32, run first even when it is not in --modes
+    reference = measure('fp32', args, images)
+    for mode in args.modes:
+        outputs, latencies, size, memory, setup = reference if mode == 'fp32' else measure(mode, args, images)
+        if mode == 'fp32':
+            quality = f"{'-':>7} {'-':>7}"
+        else:
+            quality = f'{np.mean([psnr(a, b) for a, b in zip(reference[0], outputs)]):6.2f}dB {np.mean([ssim(a, b) for a, b in zip(reference[0], outputs)]):7.4f}'
+        print(f'{mode:>5} {quality} {size:6.1f}MB {memory:6.0f}MB ' +
+              ''.join(f'{ms:7.0f}ms' for ms in latencies.values()) + f'   {setup:.1f}s')